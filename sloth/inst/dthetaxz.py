@@ -53,7 +53,9 @@ def mapCase2Num(case):
             'JsFocus' : 7,
             'Berreman' : 8,
             'Jn focusing' : 9,
-            'JnFocus' : 9}
+            'JnFocus' : 9,
+            'Von Hamos' : 10,
+            'VH' : 10}
     try:
         return dc2n[case]
     except:
@@ -69,7 +71,8 @@ def mapNum2Case(case, mode='label'):
                 6 : 'Js45focus',
                 7 : 'JsFocus',
                 8 : 'Berreman',
-                9 : 'JnFocus'}
+                9 : 'JnFocus',
+                10 : 'VH'}
     else:
         dn2c = {1 : 'Johann',
                 2 : 'Johansson',
@@ -79,7 +82,8 @@ def mapNum2Case(case, mode='label'):
                 6 : 'Js 45 deg focusing',
                 7 : 'Js focusing',
                 8 : 'Berreman',
-                9 : 'Jn focusing'}
+                9 : 'Jn focusing',
+                10 : 'Von Hamos'}
     try:
         return dn2c[case]
     except:
@@ -163,71 +167,58 @@ def dThetaXZ(x, z, thetab, case=None):
     planes. This is crucial for converting to real dimensions (mm).
 
     """
-    rthetab = np.deg2rad(thetab)
-    # CASES
-    if (case == 1 or case == 'Johann' or case == 'Jn'):
-        R1 = 1.
-        R1p = 1.
-        R2 = np.inf
-        R2p = np.inf
-    elif (case == 2 or case == 'Johansson' or case == 'Js'):
-        R1 = 0.5
-        R1p = 1.
-        R2 = np.inf
-        R2p = np.inf
-    elif (case == 3 or case == 'Spherical plate' or case == 'Spherical Jn' or case == 'SphJn'):
-        R1 = 1.
-        R1p = 1.
-        R2 = 1.
-        R2p = 1.
-    elif (case == 4 or case == 'Spherical Johansson' or case == 'Spherical Js' or case == 'SphJs'):
-        R1 = 0.5
-        R1p = 1.
-        R2 = 0.5
-        R2p = 1.
-    elif (case == 5 or case == 'Wittry' or case == 'Toroidal Js' or case == 'TorJs'):
-        R1 = 0.5
-        R1p = 1.
-        R2 = 1.
-        R2p = 1.
-    elif (case == 6 or case == 'Js 45 deg focusing' or case == 'Js45focus'):
-        R1 = 0.5
-        R1p = 1.
-        R2 = 0.5
-        R2p = 0.5
-    elif (case == 7 or case == 'Js focusing' or case == 'JsFocus'):
-        R1 = 0.5
-        R1p = 1.
-        R2 = math.sin(rthetab)**2
-        R2p = math.sin(rthetab)**2
-    elif (case == 8 or case == 'Berreman'):
-        R1 = np.inf
-        R1p = 1.
-        R2 = math.sin(rthetab)**2
-        R2p = math.sin(rthetab)**2
-    elif (case == 9 or case == 'Jn focusing' or case == 'JnFocus'):
-        R1 = 1.
-        R1p = 1.
-        R2 = math.sin(rthetab)**2
-        R2p = math.sin(rthetab)**2
-    elif (case == 10 or case == 'Von Hamos' or case == 'VH'):
-        R1 = np.inf
-        R1p = np.inf
-        R2 = 1.
-        R2p = 1.
-    else:
+    A1, A2, A3, A4 = dThetaCoeffs(thetab, case)
+    return A1 * x**2 + A2 * x**3 + A3 * z**2 + A4 * x * z**2
+
+def _caseRadii(case, sin2):
+    """radii (R1, R1p, R2, R2p) of a given case, `sin2` is
+    sin(thetab)**2 (float or array)"""
+    num = case if isinstance(case, (int, np.integer)) else mapCase2Num(case)
+    radii = {1 : (1., 1., np.inf, np.inf),
+             2 : (0.5, 1., np.inf, np.inf),
+             3 : (1., 1., 1., 1.),
+             4 : (0.5, 1., 0.5, 1.),
+             5 : (0.5, 1., 1., 1.),
+             6 : (0.5, 1., 0.5, 0.5),
+             7 : (0.5, 1., sin2, sin2),
+             8 : (np.inf, 1., sin2, sin2),
+             9 : (1., 1., sin2, sin2),
+             10 : (np.inf, np.inf, 1., 1.)}
+    try:
+        return radii[num]
+    except KeyError:
         raise NameError("case '{0}' unknown".format(case))
 
+def dThetaCoeffs(thetab, case, trig=None):
+    """Coefficients (A1, A2, A3, A4) of dThetaXZ() for given Bragg
+    angle(s) [deg] and case
+
+    Parameters
+    ----------
+    thetab : float or array of floats
+             Bragg angle(s) [deg]
+    case : int or str, see dThetaXZ()
+    trig : None or tuple of arrays
+           precomputed (tan, sin, cos) of thetab, as given by
+           _dThetaTrig(), to share between cases [None]
+
+    Returns
+    -------
+    A1, A2, A3, A4 : floats or arrays with the shape of thetab
+    """
+    if trig is None:
+        trig = _dThetaTrig(thetab)
+    tanth, sinth, costh = trig
+    R1, R1p, R2, R2p = _caseRadii(case, sinth**2)
+    R1, R2, R2p = (np.asarray(_r, dtype=float) for _r in (R1, R2, R2p))
     # COEFFICIENTS
-    if (R2p == 1. or R2p == np.inf):
-        A4p = 0.
-    else:
-        A4p = (1. - R2p) / (R2p**2) 
-    A1 = (1./math.tan(rthetab)) * (1. - 1./(2.*R1))
-    A2 = (1./math.tan(rthetab))**2 * (1. - 1./(2.*R1))
-    A3 = (math.tan(rthetab)/2.) * ( (1./R2) - (1./(R2p**2)) ) + ( 1./(2.*math.sin(rthetab)*math.cos(rthetab)) ) * ( (2./R2p) - (1./R2) - 1.)
-    #A4 = (1./(2.*R2)) - (1./(4.*R2p)) + (1/(4.*R2p**2)) + (1./(math.sin(rthetab)**2)) * ((1./R2p) - (1./(2*R2)) - 1.)
-    A4 = (1./(2.*R2)) + (1./(2.*R2p)) - (1/(2.*R2p**2)) + (1./(math.sin(rthetab)**2)) * ((1./R2p) - (1./(2*R2)) - 1.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A4p = np.where((R2p == 1.) | (R2p == np.inf), 0., (1. - R2p) / (R2p**2))
+        A1 = (1./tanth) * (1. - 1./(2.*R1))
+        A2 = (1./tanth)**2 * (1. - 1./(2.*R1))
+        A3 = (tanth/2.) * ( (1./R2) - (1./(R2p**2)) ) + ( 1./(2.*sinth*costh) ) * ( (2./R2p) - (1./R2) - 1.)
+        #A4 = (1./(2.*R2)) - (1./(4.*R2p)) + (1/(4.*R2p**2)) + (1./(sinth**2)) * ((1./R2p) - (1./(2*R2)) - 1.)
+        A4 = (1./(2.*R2)) + (1./(2.*R2p)) - (1/(2.*R2p**2)) + (1./(sinth**2)) * ((1./R2p) - (1./(2*R2)) - 1.)
 
     if DEBUG:
         print('Analytical DeltaTheta(x,z) for {0}'.format(case))
@@ -238,10 +229,69 @@ def dThetaXZ(x, z, thetab, case=None):
         print('A3 = {0}'.format(A3))
         print('A4p = {0}'.format(A4p))
         print('A4 = {0}'.format(A4))
-    
+
+    if np.ndim(thetab) == 0:
+        return float(A1), float(A2), float(A3), float(A4)
+    return A1, A2, A3, A4
+
+def _dThetaTrig(thetab):
+    """(tan, sin, cos) of the Bragg angle(s) thetab [deg]"""
+    rthetab = np.deg2rad(np.asarray(thetab, dtype=float))
+    return np.tan(rthetab), np.sin(rthetab), np.cos(rthetab)
+
+def dThetaXZStack(x, z, angles, cases):
+    """dThetaXZ() broadcast over cases and Bragg angles
+
+    Parameters
+    ----------
+    x, z : arrays of floats (same shape)
+    angles : list of floats, Bragg angles [deg]
+    cases : list of int/str, see dThetaXZ()
+
+    Returns
+    -------
+    dth : array of shape (len(cases), len(angles)) + x.shape
+
+    .. note:: the output size is len(cases)*len(angles)*x.size, use
+              getDthetaSummary() for large grids
+    """
+    x, z = np.asarray(x), np.asarray(z)
+    coeffs = _dThetaCoeffsStack(angles, cases)
+    expand = (Ellipsis,) + (np.newaxis,) * x.ndim
+    A1, A2, A3, A4 = (_a[expand] for _a in coeffs)
     return A1 * x**2 + A2 * x**3 + A3 * z**2 + A4 * x * z**2
 
-def getMeshMasked(mask='circular', r1p=1000., cryst_x=50., cryst_z=10., csteps=1000j):
+def _dThetaCoeffsStack(angles, cases):
+    """coefficients arrays of shape (len(cases), len(angles)), the
+    trigonometric functions of the angles are shared by the cases"""
+    trig = _dThetaTrig(np.atleast_1d(angles))
+    coeffs = [np.broadcast_arrays(*dThetaCoeffs(trig[0], cs, trig=trig)) for cs in cases]
+    return tuple(np.array([_c[ia] for _c in coeffs]) for ia in range(4))
+
+def _meshAxes(r1p, cryst_x, csteps, mgrid=False):
+    """1D grid coordinates (x, z) of the crystal surface, as
+    np.linspace() or np.mgrid[] if `mgrid`"""
+    zmin, zmax =  -1*cryst_x/r1p, cryst_x/r1p
+    xmin, xmax = -1.*cryst_x/r1p, cryst_x/r1p
+    if mgrid:
+        return np.mgrid[xmin:xmax:csteps], np.mgrid[zmin:zmax:csteps]
+    nsteps = int(abs(csteps.imag))
+    return np.linspace(xmin, xmax, nsteps), np.linspace(zmin, zmax, nsteps)
+
+def _meshMask(mask, x0, z0, r1p, cryst_x, cryst_z):
+    """boolean mask (True: out of the crystal) on the (z0, x0) grid,
+    computed from broadcast (sparse) coordinates"""
+    zs, xs = np.meshgrid(z0, x0, sparse=True, indexing='ij')
+    if ('circ' in mask.lower()):
+        # using a circular crystal of given 'cryst_x'
+        return xs**2 + zs**2 >= (cryst_x/r1p)**2
+    elif ('rect' in mask.lower()):
+        # using a rectangular crystal of given ('cryst_x', 'cryst_z')
+        return np.broadcast_to((zs <= -cryst_z/r1p) | (zs >= cryst_z/r1p), (len(z0), len(x0)))
+    else:
+        return None
+
+def getMeshMasked(mask='circular', r1p=1000., cryst_x=50., cryst_z=10., csteps=1000j, dtype=np.float64):
     """returns two 2D masked arrays representing a (flat) grid of the
     crystal surface
     
@@ -264,35 +314,194 @@ def getMeshMasked(mask='circular', r1p=1000., cryst_x=50., cryst_z=10., csteps=1
 
     csteps  : grid steps (given as imaginary number!) [1000j]
 
+    dtype : data type of the mesh [np.float64]
+
+    .. note:: for large grids, getMeshCompressed() stores only the
+              in-mask points
+
     """
-    zmin, zmax =  -1*cryst_x/r1p, cryst_x/r1p
-    xmin, xmax = -1.*cryst_x/r1p, cryst_x/r1p
-    x0 = np.linspace(xmin, xmax, csteps.imag)
-    z0 = np.linspace(zmin, zmax, csteps.imag)
-    xx0, zz0 = np.meshgrid(x0, z0)
-    # using a circular crystal of given 'cryst_x'
-    xx1, zz1 = np.mgrid[xmin:xmax:csteps, zmin:zmax:csteps]
-    cmask = xx1**2 + zz1**2 >= (cryst_x/r1p)**2
-    mxx1 = ma.array(xx0, mask=cmask)
-    mzz1 = ma.array(zz0, mask=cmask)
-    # using a rectangular crystal of given ('cryst_x', 'cryst_z')
-    rmask1 = zz1 <= -cryst_z/r1p
-    rmask2 = zz1 >= cryst_z/r1p
-    mxx2 = ma.array(xx1, mask=ma.mask_or(rmask1, rmask2))
-    mzz2 = ma.array(zz1, mask=ma.mask_or(rmask1, rmask2))
-    # returns
     if ('circ' in mask.lower()):
-        return mxx1, mzz1
+        x0, z0 = _meshAxes(r1p, cryst_x, csteps)
+        cmask = _meshMask(mask, x0, z0, r1p, cryst_x, cryst_z)
+        xx, zz = np.meshgrid(x0.astype(dtype), z0.astype(dtype))
     elif ('rect' in mask.lower()):
-        return mxx2, mzz2
+        # as mgrid[x, z]
+        x0, z0 = _meshAxes(r1p, cryst_x, csteps, mgrid=True)
+        cmask = _meshMask(mask, x0, z0, r1p, cryst_x, cryst_z).T
+        zz, xx = np.meshgrid(z0.astype(dtype), x0.astype(dtype))
     else:
         return 0
+    return ma.array(xx, mask=cmask), ma.array(zz, mask=cmask)
+
+def getMeshCompressed(mask='circular', r1p=1000., cryst_x=50., cryst_z=10., csteps=1000j, dtype=np.float64):
+    """as getMeshMasked() but returns only the in-mask points as 1D arrays
+
+    The mask is computed from broadcast (sparse) coordinates, so that
+    the dense meshgrids are never allocated.
+
+    Returns
+    -------
+    x, z : 1D arrays of dtype, (X,Z) coordinates of the in-mask points
+           (the mask is computed in float64)
+    area : float, area of a grid pixel
+
+    """
+    x0, z0 = _meshAxes(r1p, cryst_x, csteps, mgrid=('rect' in mask.lower()))
+    outmask = _meshMask(mask, x0, z0, r1p, cryst_x, cryst_z)
+    if outmask is None:
+        return 0
+    inmask = ~outmask
+    x = np.broadcast_to(x0.astype(dtype)[np.newaxis, :], inmask.shape)[inmask]
+    z = np.broadcast_to(z0.astype(dtype)[:, np.newaxis], inmask.shape)[inmask]
+    area = (x0[1]-x0[0])**2
+    return x, z, area
+
+def _meshPoints(mxx, mzz):
+    """in-mask points of 2D masked meshgrids as 1D arrays and the area
+    of a grid pixel (0 if the grid step is 0)"""
+    gridSizeXX = (mxx.data[0][1]-mxx.data[0][0])**2
+    gridSizeZZ = (mzz.data[0][1]-mzz.data[0][0])**2
+    if not (gridSizeXX == 0.):
+        area = gridSizeXX
+    else:
+        area = gridSizeZZ
+    inmask = ~ma.getmaskarray(mxx)
+    return mxx.data[inmask], mzz.data[inmask], area
+
+def getDthetaSummary(mxx, mzz, wrc=1.25E-4, cases=['Johann', 'Johansson', 'Spherical plate', 'Wittry'],
+                     angles=[15, 45, 75], chunk=8, area=None, block=2**20):
+    """effective solid angle and energy resolution for all cases and
+    angles
+
+    dThetaXZ() is evaluated on the in-mask points only, with the
+    coefficients of all (case, angle) pairs computed at once (sharing
+    the trigonometric functions of the angles). As dThetaXZ() is linear
+    in the coefficients, each chunk of pairs is a matrix product with
+    the (x**2, x**3, z**2, x*z**2) terms, streaming the pairs in chunks
+    to limit the memory used (and the points in blocks).
+
+    Parameters
+    ----------
+    mxx, mzz : 2D masked meshgrids, (X,Z) mapping of the analyzer,
+               or 1D in-mask points if `area` is given
+    wrc : width of the analyzer rocking curve in rad [1.25E-4]
+    cases : list of str, see cases in dThetaXZ()
+    angles : list of int/floats, Bragg angles
+    chunk : int, number of (case, angle) pairs evaluated at once [8]
+    area : None or float, area of a grid pixel, as returned by
+           getMeshCompressed() with the points (mxx, mzz) [None]
+    block : int, number of points evaluated at once [2**20]
+
+    Returns
+    -------
+    sa, eres : 2D arrays (len(cases), len(angles))
+        sa : effective (|dTheta| <= wrc) solid angle
+        eres : energy resolution
+    """
+    if area is None:
+        x, z, area = _meshPoints(mxx, mzz)
+    else:
+        x, z = np.asarray(mxx), np.asarray(mzz)
+    angles = np.atleast_1d(np.asarray(angles, dtype=float))
+    ncases, nangles = len(cases), len(angles)
+    if area == 0.:
+        raise ValueError('0 grid size in solid angle')
+    coeffs = np.stack([_a.ravel() for _a in _dThetaCoeffsStack(angles, cases)], axis=1)
+    stats = getDthetaStats(x, z, coeffs, wrc=wrc, chunk=chunk, block=block)
+    neff, dthmin, dthmax = (stats[key].reshape(ncases, nangles) for key in ('neff', 'min', 'max'))
+    rthetab = np.deg2rad(angles)
+    sa = neff * area / np.sin(rthetab)
+    eres = np.sqrt((dthmax-dthmin)**2 + wrc**2) / np.tan(rthetab)
+    return sa, eres
+
+def dThetaCoeffsPairs(cases, angles):
+    """coefficients of dThetaXZ() for paired lists of cases and Bragg
+    angles, as a (npairs, 4) array (see getDthetaStats())"""
+    cases = np.asarray(cases, dtype=object)
+    angles = np.asarray(angles, dtype=float)
+    trig = _dThetaTrig(angles)
+    coeffs = np.empty((len(angles), 4))
+    for cs in set(cases.tolist()):
+        sel = (cases == cs)
+        strig = tuple(_t[sel] for _t in trig)
+        coeffs[sel] = np.stack(np.broadcast_arrays(*dThetaCoeffs(angles[sel], cs, trig=strig)), axis=1)
+    return coeffs
+
+def getDthetaStats(x, z, coeffs, wrc=1.25E-4, chunk=8, block=2**20, nbins=None):
+    """statistics of dThetaXZ() over the points (x, z) for many sets of
+    coefficients
+
+    Parameters
+    ----------
+    x, z : 1D arrays, in-mask points (see getMeshCompressed())
+    coeffs : 2D array (npairs, 4), (A1, A2, A3, A4) for each (case,
+             angle) pair, see dThetaCoeffsPairs()
+    wrc : width of the analyzer rocking curve in rad [1.25E-4]
+    chunk : int, number of pairs evaluated at once [8]
+    block : int, number of points evaluated at once [2**20]
+    nbins : int or None, number of bins of the dTheta histogram between
+            min and max, for the FWHM (second pass over the points) [None]
+
+    Returns
+    -------
+    dict of 1D arrays (npairs,)
+        'neff' : number of points with |dTheta| <= wrc
+        'min', 'max', 'mean', 'std' : of dTheta
+        'fwhm' : FWHM of the dTheta histogram (only if nbins is given)
+    """
+    x, z = np.asarray(x), np.asarray(z)
+    coeffs = np.asarray(coeffs).astype(np.result_type(x.dtype, np.float32))
+    npairs = len(coeffs)
+    neff = np.zeros(npairs)
+    dthmin = np.full(npairs, np.inf)
+    dthmax = np.full(npairs, -np.inf)
+    dthsum = np.zeros(npairs)
+    dthsum2 = np.zeros(npairs)
+    for ipt in range(0, len(x), block):
+        xb, zb = x[ipt:ipt+block], z[ipt:ipt+block]
+        terms = np.stack((xb**2, xb**3, zb**2, xb * zb**2)).astype(coeffs.dtype, copy=False)
+        for ich in range(0, npairs, chunk):
+            sl = slice(ich, ich+chunk)
+            dth = np.dot(coeffs[sl], terms)
+            neff[sl] += np.count_nonzero(np.abs(dth) <= wrc, axis=1)
+            dthmin[sl] = np.minimum(dthmin[sl], dth.min(axis=1))
+            dthmax[sl] = np.maximum(dthmax[sl], dth.max(axis=1))
+            dthsum[sl] += dth.sum(axis=1, dtype=np.float64)
+            dthsum2[sl] += np.einsum('ij,ij->i', dth, dth, dtype=np.float64)
+    npts = max(len(x), 1)
+    mean = dthsum / npts
+    std = np.sqrt(np.maximum(dthsum2 / npts - mean**2, 0.))
+    stats = {'neff': neff, 'min': dthmin, 'max': dthmax, 'mean': mean, 'std': std}
+    if nbins:
+        stats['fwhm'] = _dthetaFwhm(x, z, coeffs, dthmin, dthmax, nbins, chunk=chunk, block=block)
+    return stats
+
+def _dthetaFwhm(x, z, coeffs, dthmin, dthmax, nbins, chunk=8, block=2**20):
+    """FWHM of the dTheta histograms (nbins between dthmin and dthmax)"""
+    npairs = len(coeffs)
+    binw = (dthmax - dthmin) / nbins
+    scale = np.where(binw > 0, 1. / np.where(binw > 0, binw, 1.), 0.)
+    hist = np.zeros((npairs, nbins))
+    for ipt in range(0, len(x), block):
+        xb, zb = x[ipt:ipt+block], z[ipt:ipt+block]
+        terms = np.stack((xb**2, xb**3, zb**2, xb * zb**2)).astype(coeffs.dtype, copy=False)
+        for ich in range(0, npairs, chunk):
+            sl = slice(ich, ich+chunk)
+            dth = np.dot(coeffs[sl], terms)
+            ibin = ((dth - dthmin[sl, None]) * scale[sl, None]).astype(np.int64)
+            ibin = np.clip(ibin, 0, nbins - 1) + np.arange(dth.shape[0])[:, None] * nbins
+            hist[sl] += np.bincount(ibin.ravel(), minlength=dth.shape[0] * nbins).reshape(-1, nbins)
+    above = hist >= 0.5 * hist.max(axis=1, keepdims=True)
+    first = np.argmax(above, axis=1)
+    last = nbins - 1 - np.argmax(above[:, ::-1], axis=1)
+    return (last - first + 1) * binw
 
 def getDthetaDats(mxx, mzz, wrc=1.25E-4,
                   cases=['Johann', 'Johansson', 'Spherical plate', 'Wittry'],
                   angles=[15, 45, 75]):
-    """calculates data (see returns for details) in given loops
-    
+    """calculates data (see returns for details) for all cases and angles
+    (see getDthetaSummary())
+
     Parameters
     ----------
     mxx, mzz : 2D masked meshgrids, (X,Z) mapping of the analyzer
@@ -305,47 +514,22 @@ def getDthetaDats(mxx, mzz, wrc=1.25E-4,
     dd: dictionary of dictionaries, for each case in cases
     Lists:
         dd[case]['thetaB'] : angles
-        #dd[case]['dth'] : $\Delta \theta$(x,z)
-        #dd[case]['mdth'] : effective $\Delta \theta$(x,z)
         dd[case]['sa'] : solid angle
         dd[case]['eres'] : energy resolution
 
-    NOTE: dth, mdth not stored (too much space in memory!)
+    NOTE: $\Delta \theta$(x,z) not stored (too much space in memory!)
     """
     dd = {} #container dictonary to store results
-    for cs in cases:
+    try:
+        sa, eres = getDthetaSummary(mxx, mzz, wrc=wrc, cases=cases, angles=angles)
+    except ValueError:
+        print('Error: 0 grid size in solid angle')
+        sa = eres = np.empty((len(cases), 0))
+    for ics, cs in enumerate(cases):
         dd[cs] = {}
         dd[cs]['thetaB'] = angles
-        dd[cs]['dth'] = []
-        dd[cs]['mdth'] = []
-        dd[cs]['sa'] = []
-        dd[cs]['eres'] = []
-        print('Angle loop for {0}...'.format(cs))
-        for th in angles:
-            dth = dThetaXZ(mxx, mzz, th, case=cs)
-            # calc effective (< wrc) solid angle and energy resolution
-            mdth = ma.masked_where(np.abs(dth) > wrc, dth)
-            gridSizeXX = (mxx.data[0][1]-mxx.data[0][0])**2
-            gridSizeZZ = (mzz.data[0][1]-mzz.data[0][0])**2
-            if not (gridSizeXX == 0.):
-                mm = ma.ones(mxx.shape)
-                mm = mm * gridSizeXX
-            elif not (gridSizeZZ == 0.):
-                mm = ma.ones(mzz.shape)
-                mm = mm * gridSizeZZ
-            else:
-                print('Error: 0 grid size in solid angle for {0} at {1} deg'.format(cs, th))
-                continue
-            mm.mask = mdth.mask
-            #eff_area = (mm.sum()/(mm.shape[0]*mm.shape[1]))*(np.pi*(r_cryst**2))
-            eff_sa = mm.sum()/math.sin(np.deg2rad(th))
-            #eres = math.sqrt((mdth.max()-mdth.min())**2 + wrc**2)/math.tan(np.deg2rad(th))
-            eres = math.sqrt((dth.max()-dth.min())**2 + wrc**2)/math.tan(np.deg2rad(th))
-            # append to output
-            dd[cs]['dth'].append(dth)
-            dd[cs]['mdth'].append(mdth)
-            dd[cs]['sa'].append(eff_sa)
-            dd[cs]['eres'].append(eres)
+        dd[cs]['sa'] = sa[ics].tolist()
+        dd[cs]['eres'] = eres[ics].tolist()
     #
     return dd
 
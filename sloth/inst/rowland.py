@@ -76,9 +76,13 @@ __email__ = "mauro.rovezzi@gmail.com"
 __license__ = "BSD license <http://opensource.org/licenses/BSD-3-Clause>"
 
 import sys, os, math
+import copy
 import numpy as np
 
-from ..math.rotmatrix import rotate
+from ..math.rotmatrix import rotate, rotation_matrices
+from ..utils.logging import getLogger
+
+_logger = getLogger("sloth.inst.rowland")
 
 try:
     xrange
@@ -93,17 +97,42 @@ ED0 = 1e-4 # minimum energy step (eV) considered as 0
 AZ0 = 1e-4 # minimum Z step (mm) considered as 0
 
 ### UTILITIES ###
+def _fmt(val, fmt='.5f'):
+    """format a scalar or an array (range) for the log messages"""
+    if np.ndim(val) == 0:
+        return format(val, fmt)
+    val = np.asarray(val)
+    return '[{0} .. {1}] ({2} points)'.format(format(val.min(), fmt), format(val.max(), fmt), val.size)
+
+def _rotate(vect, axis, theta):
+    """rotate vect(s) around axis by theta [rad], as rotate() for
+    scalars, broadcast over (..., 3) arrays otherwise"""
+    if (np.ndim(vect) == 1) and (np.ndim(axis) == 1) and (np.ndim(theta) == 0):
+        return rotate(vect, axis, theta)
+    mats = rotation_matrices(axis, theta)
+    return np.einsum('...ij,...j->...i', mats, vect)
+
+def _vec3(x, y, z):
+    """[X,Y,Z] vector, or (N, 3) array if any coordinate is an array"""
+    if np.ndim(x) == np.ndim(y) == np.ndim(z) == 0:
+        return np.array([x, y, z])
+    return np.stack(np.broadcast_arrays(x, y, z), axis=-1)
+
 def cs_h(c, R):
     """Height of the circular segment, given its radius R and chord
     length c See: [http://en.wikipedia.org/wiki/Circular_segment]
 
+    (c and R can be arrays)
     """
-    if c >= 2*R:
-        print('WARNING: the chord is greater than the diameter!')
-        print('WARNING: returning maximum height, the radius')
-        return R
-    else:
+    full = np.asarray(c >= 2*R)
+    if full.any():
+        _logger.warning('the chord is greater than the diameter!')
+        _logger.warning('returning maximum height, the radius')
+    if np.ndim(full) == 0:
+        if full:
+            return R
         return R - math.sqrt( R**2 - (c**2/4) )
+    return np.where(full, R, R - np.sqrt(np.maximum(R**2 - (c**2/4), 0.)))
 
 def acenx(n, asx=25., agx=5.):
     """n-th analyser center (starting from 0!) in x, given its size (asx)
@@ -135,23 +164,32 @@ def det_pos_rotated(dxyz, drot=35., doffsets=[0,0]):
     [dy, dz] : numpy array of floats
                absolute positions of the detector stages
                NOTE: the (dy, dz) sign here is given as the convention setted during the commissioning in Aug 2017
+               (N, 2) array for (N, 3) dxyz
 
     """
-    x, y, z = dxyz[0], dxyz[1], dxyz[2]
-    dr = math.sqrt(y**2 + z**2)
-    if y == 0.:
-        alpha = math.pi/2. - math.radians(drot)
-    else:
-        alpha = math.atan(z/y) - math.radians(drot)
-    if DEBUG: print('DEBUG(det_pos_rotated): alpha is {0} deg'.format(math.degrees(alpha)))
-    dpar = dr * math.cos(alpha)
-    dper = dr * math.sin(alpha)
+    dxyz = np.asarray(dxyz, dtype=float)
+    x, y, z = dxyz[..., 0], dxyz[..., 1], dxyz[..., 2]
+    dr = np.sqrt(y**2 + z**2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha = np.where(y == 0., np.pi/2., np.arctan(z/y)) - np.radians(drot)
+    if DEBUG: _logger.debug('(det_pos_rotated): alpha is {0} deg'.format(_fmt(np.degrees(alpha))))
+    dpar = dr * np.cos(alpha)
+    dper = dr * np.sin(alpha)
     #insert offset of the detector origin
     dy = dpar - doffsets[0]
     dz = -(doffsets[1] - dper)
     
-    return np.array([dy, dz])
+    return np.stack((dy, dz), axis=-1)
     
+def save_bender_calib(fname, calib):
+    """save a bender calibration table (see RowlandCircle.get_bender_calib) to .npz"""
+    np.savez(fname, **calib)
+
+def load_bender_calib(fname):
+    """load a bender calibration table saved with save_bender_calib"""
+    with np.load(fname) as npz:
+        return {key: npz[key] for key in npz.files}
+
 ### CLASS ###
 class RowlandCircle(object):
     """Rowland circle geometry"""
@@ -271,7 +309,7 @@ class RowlandCircle(object):
             self.sampPos = np.array([0,0,0])
         elif (('int' in str(type(inCircle))) or ('float' in str(type(inCircle)))):
             self.sampPos = np.array([0,inCircle,0])
-            print('WARNING: inCircle not tested/implementd yet, REVERTED to 0 position!')
+            _logger.warning('inCircle not tested/implementd yet, REVERTED to 0 position!')
             self.sampPos = np.array([0,0,0])
         else:
             raise NameError('Sample inside the Rowland circle: y offset is required')
@@ -302,38 +340,38 @@ class RowlandCircle(object):
         """
         if showInfos is None: showInfos = self.showInfos
         self.theta0 = theta0
-        self.rtheta0 = math.radians(self.theta0)       
-        self.sd = 2. * self.Rm * math.sin(2. * self.rtheta0)
-        self.p0 = 2. * self.Rm * math.sin(self.rtheta0 - self.ralpha)
+        self.rtheta0 = np.radians(self.theta0)
+        self.sd = 2. * self.Rm * np.sin(2. * self.rtheta0)
+        self.p0 = 2. * self.Rm * np.sin(self.rtheta0 - self.ralpha)
         #self.p = self.p0 - self.sampPos[1] #not fully tested yet
         self.p = self.p0
-        self.q0 = 2. * self.Rm * math.sin(self.rtheta0 + self.ralpha)
+        self.q0 = 2. * self.Rm * np.sin(self.rtheta0 + self.ralpha)
         self.q = self.q0 # TODO: generic case!
-        if self.p == self.p0:
+        if np.all(self.p == self.p0):
             if self.alpha == 0:
-                if self.showInfos: print('INFO: sagittal focusing, symmetric formula')
-                self.Rs = 2 * self.Rm * (math.sin(self.rtheta0))**2 # no miscut
+                if self.showInfos: _logger.info('sagittal focusing, symmetric formula')
+                self.Rs = 2 * self.Rm * (np.sin(self.rtheta0))**2 # no miscut
             else :
-                print('WARNING: sagittal focusing with miscut (CHECK FORMULA!)')
+                _logger.warning('sagittal focusing with miscut (CHECK FORMULA!)')
                 #self.Rs = self.Rm * (math.cos(2*self.ralpha) - math.cos(2*self.theta0)) # TODO: check this
-                self.Rs = 2 * self.Rm * math.sin(self.rtheta0 - self.ralpha) * math.sin(self.rtheta0 + self.ralpha) #this one should be correct: TO TEST!
+                self.Rs = 2 * self.Rm * np.sin(self.rtheta0 - self.ralpha) * np.sin(self.rtheta0 + self.ralpha) #this one should be correct: TO TEST!
         else :
             # generic sagittal focusing # TODO: check this!!!
-            print('WARNING: sagittal focusing generic (CHECK FORMULA!)')
-            self.Rs = ( 2. * math.sin(self.rtheta0) * self.p * self.q ) / (self.p + self.q)
+            _logger.warning('sagittal focusing generic (CHECK FORMULA!)')
+            self.Rs = ( 2. * np.sin(self.rtheta0) * self.p * self.q ) / (self.p + self.q)
         if showInfos:
-            print("INFO: theta0 = {0:.3f} deg".format(self.theta0))
-            print("INFO: alpha = {0:.3f} deg".format(self.alpha))
+            _logger.info("theta0 = {0} deg".format(_fmt(self.theta0, '.3f')))
+            _logger.info("alpha = {0:.3f} deg".format(self.alpha))
             if self.d is not None:
-                print("INFO: ene0 = {0:.2f} eV".format(self.get_ene()))
-                print("INFO: d = {0:.3f} $\AA$".format(self.d))
-            print("INFO: p = {0:.3f} {1}".format(self.p, self.uDist))
-            print("INFO: q = {0:.3f} {1}".format(self.q, self.uDist))
-            print("INFO: Rm = {0:.3f} {1}".format(self.Rm, self.uDist))
-            print("INFO: Rs = {0:.3f} {1}".format(self.Rs, self.uDist))
-            print("INFO: aW = {0:.3f} {1}".format(self.aW, self.uDist))
-            print("INFO: aWext = {0:.3f} {1}".format(self.aWext, self.uDist))
-            print("INFO: aL = {0:.3f} {1}".format(self.aL, self.uDist))
+                _logger.info("ene0 = {0} eV".format(_fmt(self.get_ene(), '.2f')))
+                _logger.info("d = {0:.3f} $\AA$".format(self.d))
+            _logger.info("p = {0} {1}".format(_fmt(self.p, '.3f'), self.uDist))
+            _logger.info("q = {0} {1}".format(_fmt(self.q, '.3f'), self.uDist))
+            _logger.info("Rm = {0:.3f} {1}".format(self.Rm, self.uDist))
+            _logger.info("Rs = {0} {1}".format(_fmt(self.Rs, '.3f'), self.uDist))
+            _logger.info("aW = {0:.3f} {1}".format(self.aW, self.uDist))
+            _logger.info("aWext = {0:.3f} {1}".format(self.aWext, self.uDist))
+            _logger.info("aL = {0:.3f} {1}".format(self.aL, self.uDist))
         return self
 
     def get_infos(self):
@@ -360,7 +398,7 @@ class RowlandCircle(object):
             theta0 = self.get_theta(ene0, d=d, isDeg=True)
             self.set_theta0(theta0)
         except:
-            print("ERROR: energy not setted!")
+            _logger.error("energy not setted!")
 
     def get_theta(self, ene=None, d=None, isDeg=True):
         """get theta angle (deg or rad, controlled by isDeg var) for a
@@ -369,10 +407,10 @@ class RowlandCircle(object):
             d = self.d
         if ene is None:
             ene = self.get_ene(theta=None, d=d, isDeg=isDeg)
-        if (d is not None) and not (self.d == 0) and not (ene == 0):
+        if (d is not None) and not (self.d == 0) and np.all(ene != 0):
             wlen = ( HC / ene ) * 1e10
-            theta = math.asin( wlen / (2*d) )
-            if isDeg: theta = math.degrees(theta)
+            theta = np.arcsin( wlen / (2*d) )
+            if isDeg: theta = np.degrees(theta)
             return theta
         else:
             raise NameError("wrong d-spacing or energy")
@@ -385,21 +423,23 @@ class RowlandCircle(object):
         if d is None:
             d = self.d
         if isDeg:
-            rtheta = math.radians(theta)
+            rtheta = np.radians(theta)
         else:
             rtheta = theta
         if d is not None:
-            wlen = 2 * d * math.sin(rtheta)
+            wlen = 2 * d * np.sin(rtheta)
             return ( HC / wlen ) * 1e10
         else:
             raise NameError("give d-spacing (\AA)")
 
     def get_dth(self, eDelta):
         """Delta\theta using differential Bragg law"""
-        if abs(eDelta) <= ED0:
+        if np.ndim(eDelta) == 0 and abs(eDelta) <= ED0:
             return 0
         ene = self.get_ene(theta=self.rtheta0, isDeg=False)
-        return -1 * ( eDelta / ene ) * math.tan(self.rtheta0)
+        dth = -1 * ( eDelta / ene ) * np.tan(self.rtheta0)
+        dth = np.where(np.abs(eDelta) <= ED0, 0., dth)
+        return float(dth) if dth.ndim == 0 else dth
             
     def get_chi(self, aXoff, Rs=None, aL=None, inDeg=True):
         """get \chi angle in sagittal focusing using offset from
@@ -407,7 +447,7 @@ class RowlandCircle(object):
         if Rs is None: Rs = self.Rs
         if aL is None: aL = self.aL
         Rs2 = Rs + aL
-        rchi = math.atan( aXoff / math.sqrt(Rs2**2 - aXoff**2) )
+        rchi = np.arctan( aXoff / np.sqrt(Rs2**2 - aXoff**2) )
         if (inDeg is True):
             return np.rad2deg(rchi)
         else:
@@ -434,9 +474,9 @@ class RowlandCircle(object):
         if Rs is None: Rs = self.Rs
         if rSext is None: rSext = self.rSext
         Rsp = Rs + rSext
-        rchi = ( 2 * math.atan((aWext/2)/Rsp) ) * aN
+        rchi = ( 2 * np.arctan((aWext/2)/Rsp) ) * aN
         if (inDeg is True):
-            return math.degrees(rchi)
+            return np.degrees(rchi)
         else:
             return rchi
 
@@ -446,20 +486,20 @@ class RowlandCircle(object):
         if Rs is None: Rs = self.Rs
         if not (aN == 0): chi = chi/aN
         if inDeg:
-            chihalf = math.radians(chi/2.)
+            chihalf = np.radians(chi/2.)
         else:
             chihalf = chi/2.
-        aDist = 2 * Rs * math.sin(chihalf) - aW * math.cos(chihalf)
+        aDist = 2 * Rs * np.sin(chihalf) - aW * np.cos(chihalf)
         if self.showInfos:
-            print('INFO: analyser #{0:.0f}-#{1:.0f} (edge-to-edge) = {2:.4f} {3}'.format(aN, aN-1, aDist, self.uDist))
-            print('INFO: delta chi = {0:.4f} deg'.format(chi))
+            _logger.info('analyser #{0:.0f}-#{1:.0f} (edge-to-edge) = {2} {3}'.format(aN, aN-1, _fmt(aDist, '.4f'), self.uDist))
+            _logger.info('delta chi = {0} deg'.format(_fmt(chi, '.4f')))
         return aDist
 
     def get_axoff(self, chi, Rs=None, aL=None):
         """get aXoff for the pivot point when chi is known (simple case)"""
         if Rs is None: Rs = self.Rs
         if aL is None: aL = self.aL
-        return (Rs + aL) * math.sin(math.radians(chi))
+        return (Rs + aL) * np.sin(np.radians(chi))
 
     def get_axoff0(self, chi, Rs=None):
         """get aXoff at the surface of the analyser"""
@@ -510,38 +550,38 @@ class RowlandCircle(object):
 
         Returns
         -------
-        aXoff1 : float
+        aXoff1 : float (or array if any argument or self.Rs is an array)
         """
         if Rs is None: Rs = self.Rs
         if aL is None: aL = self.aL
         y0 = aXoffMin
         x0 = SagOffMin
-        phi = math.radians(degRot)
-        if (phi == 0):
+        phi = np.radians(degRot)
+        if np.all(phi == 0):
             if self.showInfos:
-                print('INFO: simple case where aXoff is constant at aXoffMin')
-                print('INFO: aXoffMin = {0:.5f}'.format(aXoffMin))
-            return aXoffMin
-        sinphi = math.sin(phi)
-        cosphi = math.cos(phi)
+                _logger.info('simple case where aXoff is constant at aXoffMin')
+                _logger.info('aXoffMin = {0}'.format(_fmt(aXoffMin)))
+            return aXoffMin + np.zeros(np.broadcast(Rs, aL, aXoffMin, SagOffMin, phi).shape) if np.ndim(Rs) else aXoffMin
+        sinphi = np.sin(phi)
+        cosphi = np.cos(phi)
         a = 1 #sinphi**2 + cosphi**2
         b = -2*x0*cosphi + 2*Rs*cosphi + 2*y0*sinphi + 2*aL*cosphi
         c = x0**2 + y0**2 - 2*Rs*x0 - 2*aL*x0
         #solutions to: a*y**2 + b*y + c = 0
-        y1 = (-b + math.sqrt(b**2 - 4*a*c)) / (2*a) #good solution!
-        y2 = (-b - math.sqrt(b**2 - 4*a*c)) / (2*a)
+        y1 = (-b + np.sqrt(b**2 - 4*a*c)) / (2*a) #good solution!
+        y2 = (-b - np.sqrt(b**2 - 4*a*c)) / (2*a)
         if self.showInfos:
-            print('INFO: two solutions for polar distance d:')
-            print('INFO: 1 = {0:.5f} (good)'.format(y1))
-            print('INFO: 2 = {0:.5f} (bad)'.format(y2))
+            _logger.info('two solutions for polar distance d:')
+            _logger.info('1 = {0} (good)'.format(_fmt(y1)))
+            _logger.info('2 = {0} (bad)'.format(_fmt(y2)))
         aXoff1 = y1*sinphi + aXoffMin
         SagOff1 = SagOffMin - y1*cosphi
         aXoff2 = y2*sinphi + aXoffMin
         SagOff2 = SagOffMin - y2*cosphi
         if self.showInfos:
-            print('INFO: aXoffMin = {0:.5f}, SagOffMin = {1:.5f}, degRot = {2:.3f}'.format(aXoffMin, SagOffMin, degRot))
-            print('INFO: aXoff1 = {0:.5f}, SagOff1 = {1:.5f}'.format(aXoff1, SagOff1))
-            print('INFO: aXoff2 = {0:.5f}, SagOff2 = {1:.5f}'.format(aXoff2, SagOff2))
+            _logger.info('aXoffMin = {0}, SagOffMin = {1}, degRot = {2}'.format(_fmt(aXoffMin), _fmt(SagOffMin), _fmt(degRot, '.3f')))
+            _logger.info('aXoff1 = {0}, SagOff1 = {1}'.format(_fmt(aXoff1), _fmt(SagOff1)))
+            _logger.info('aXoff2 = {0}, SagOff2 = {1}'.format(_fmt(aXoff2), _fmt(SagOff2)))
         return aXoff1
 
     def get_sag_off(self, aXoff, Rs=None, aL=None, retAll=False):
@@ -574,20 +614,18 @@ class RowlandCircle(object):
         if Rs is None: Rs = self.Rs
         if aL is None: aL = self.aL
         rchi = self.get_chi(aXoff, Rs=Rs, aL=aL, inDeg=False)
-        aXoff0 = aXoff - aL*math.sin(rchi)
+        aXoff0 = aXoff - aL*np.sin(rchi)
         rchi0 = self.get_chi(aXoff0, Rs=Rs, aL=0, inDeg=False) #to check this is equal to rchi!
         SagOff0 = cs_h(aXoff0*2, Rs)
-        SagOff = SagOff0 - aL*math.cos(rchi) + aL
+        SagOff = SagOff0 - aL*np.cos(rchi) + aL
         if self.showInfos:
-            print("INFO: === surface (0) vs pivot (aL={0:.0f}) ===".format(aL))
-            _tmpl_ihead = "INFO: {0:=^10} {1:=^12} {2:=^13}"
-            _tmpl_idata = "INFO: {0:^ 10.5f} {1:^ 12.5f} {2:^ 13.5f}"
-            print(_tmpl_ihead.format('Chi', 'aXoff', 'SagOff'))
-            print(_tmpl_idata.format(math.degrees(rchi), aXoff, SagOff))
-            print(_tmpl_ihead.format('Chi0', 'aXoff0', 'SagOff0'))
-            print(_tmpl_idata.format(math.degrees(rchi0), aXoff0, SagOff0))
+            _logger.info("=== surface (0) vs pivot (aL={0:.0f}) ===".format(aL))
+            _tmpl_info = "{0:<8} {1}"
+            for _lab, _val in (('Chi', np.degrees(rchi)), ('aXoff', aXoff), ('SagOff', SagOff),
+                               ('Chi0', np.degrees(rchi0)), ('aXoff0', aXoff0), ('SagOff0', SagOff0)):
+                _logger.info(_tmpl_info.format(_lab, _fmt(_val)))
         if retAll:
-            return [math.degrees(rchi), aXoff, SagOff, math.degrees(rchi0), aXoff0, SagOff0]
+            return [np.degrees(rchi), aXoff, SagOff, np.degrees(rchi0), aXoff0, SagOff0]
         else:
             return SagOff
 
@@ -600,7 +638,7 @@ class RowlandCircle(object):
         """motors positions for sagittal offset
         TODO: not working yet, sagoff also negative
         """
-        print('WARNING: deprecated/broken method!!!')
+        _logger.warning('deprecated/broken method!!!')
         return 0, 0
     
         # sagoffs = self.get_sag_off(aXoff, Rs=Rs, aL=aL, retAll=True)
@@ -612,11 +650,28 @@ class RowlandCircle(object):
         #     print('Pivot side ({0}): +/- {1}'.format(pivotSide, tPS))
         # return tS + tPS, tS - tPS
 
-    def get_bender_pos(self, aN=5, bender=None, Rs=None, aL=None, rSext=None, bender_version=None):
-        """get the position (aXoff, SagOff) of the bender point (B)"""
+    def get_bender_pos(self, aN=5, bender=None, Rs=None, aL=None, rSext=None, bender_version=None, retOk=False):
+        """get the position (aXoff, SagOff) of the bender point (B)
+
+        Closed form solution of the bender geometry; Rs can be an array
+        of sagittal radii (e.g. after set_theta0 with an array of angles)
+
+        Parameters
+        ----------
+        aN : int, 5
+             last analyser (>=3)
+        bender, Rs, aL, rSext, bender_version : see __init__ [None -> self.*]
+        retOk : boolean, False
+                return also a boolean (array) True where the bender
+                geometry has a solution
+
+        Returns
+        -------
+        (pb_axoff, pb_sagoff) [, ok] : floats or arrays (NaN where no solution)
+        """
         if aN < 3:
-            print('ERROR: this method works only for aN>=3')
-            return (0., 0.)
+            _logger.error('this method works only for aN>=3')
+            return (0., 0., False) if retOk else (0., 0.)
         if bender is None: bender = self.bender
         if Rs is None: Rs = self.Rs
         if aL is None: aL = self.aL
@@ -624,49 +679,55 @@ class RowlandCircle(object):
         if bender_version is None: bender_version = self.bender_version
 
         #map last 3 pivot points positions
-        _c2 = [self.get_chi2(_n) for _n in xrange( int(aN-2), int(aN+1) )] #CHIs
+        _c2 = [self.get_chi2(_n, Rs=Rs, rSext=rSext) for _n in xrange( int(aN-2), int(aN+1) )] #CHIs
         dchi = _c2[2]-_c2[0]
         if self.showInfos:
-            print('INFO: == CHI ==')
-            print('INFO: \chi{0:.0f} = {1:.5f}'.format(aN, _c2[2]))
-            print('INFO: \Delta\chi{0}{1} = {2:.5f} deg'.format(aN, aN-2, dchi))
-        _p = [self.get_sag_off(self.get_axoff(_cn), retAll=True) for _cn in _c2] #SagOffs
-            
+            _logger.info('== CHI ==')
+            _logger.info('\\chi{0:.0f} = {1}'.format(aN, _fmt(_c2[2])))
+            _logger.info('\\Delta\\chi{0}{1} = {2} deg'.format(aN, aN-2, _fmt(dchi)))
+        _p = [self.get_sag_off(self.get_axoff(_cn, Rs=Rs, aL=aL), Rs=Rs, aL=aL, retAll=True) for _cn in _c2] #SagOffs
+
         #find the angle between the last pivot point _p[-1] and the bender point (B)
         #we use for this the position of the end point of bender[1] (C)
         _R = Rs + aL
-        rdch = math.radians(dchi/2.)
-        h = _R * (1 - math.cos(rdch)) #chord between pivots 0 and -2
-        chalf = _R * math.sin(rdch) #half the chord length from circular segment formula
-        #find coordinates of point B (pb) of the bender (anchor point with actuator[1])
-        ra = math.acos(chalf/bender[1])
-        dc = bender[1] * math.sin(ra) - h #aperture of the pantograph along radius
-        if bender_version == 0:
-            sc = self.get_axoff(_c2[1], Rs=Rs+dc) #aXoff_point_C
-            #pc = self.get_sag_off(sc, retAll=True)
-            axlp = _p[2][1] #aXoff last pivot point
-            rb = math.acos( (axlp-sc) / bender[1])
-            rc = math.pi - math.radians(bender[2]) - rb
-            pb_axoff = axlp + bender[0] * math.cos(rc) #aXoff_bender_point(B)
-            pb_sagoff = axlp - bender[0] * math.sin(rc) #SagOff_bender_point(B)
-        elif bender_version == 1:
-            adc = math.asin( (dc/2) / bender[0] ) #angle opposite to dc
-            pdc = bender[0] * math.cos(adc) #perpendicular to dc
-            pb_ang = math.atan(pdc / (Rs + aL + dc/2)) #angle between last analyzer and point B
-            pb_h = _R * (1 - math.cos(pb_ang)) #chord for the anchoring point
-            pb_chalf = _R * math.sin(pb_ang) #from circular segment formula
-            pb_ra = math.acos(pb_chalf / bender[0])
-            pb_dc = bender[0] * math.sin(pb_ra) - pb_h
-            pb_chi = pb_ang + self.get_chi2(aN, inDeg=False) #radians
-            pb_rs = Rs + aL + pb_dc
-            pb_axoff = pb_rs * math.sin(pb_chi)
-            pb_sagoff = _R - (pb_rs * math.cos(pb_chi))
-            print(pb_axoff, pb_sagoff)
-        else:
-            raise NameError("ERROR with bender_version")
+        with np.errstate(invalid='ignore'):
+            rdch = np.radians(dchi/2.)
+            h = _R * (1 - np.cos(rdch)) #chord between pivots 0 and -2
+            chalf = _R * np.sin(rdch) #half the chord length from circular segment formula
+            #find coordinates of point B (pb) of the bender (anchor point with actuator[1])
+            ra = np.arccos(chalf/bender[1])
+            dc = bender[1] * np.sin(ra) - h #aperture of the pantograph along radius
+            if bender_version == 0:
+                sc = self.get_axoff(_c2[1], Rs=Rs+dc, aL=aL) #aXoff_point_C
+                #pc = self.get_sag_off(sc, retAll=True)
+                axlp = _p[2][1] #aXoff last pivot point
+                rb = np.arccos( (axlp-sc) / bender[1])
+                rc = np.pi - np.radians(bender[2]) - rb
+                pb_axoff = axlp + bender[0] * np.cos(rc) #aXoff_bender_point(B)
+                pb_sagoff = axlp - bender[0] * np.sin(rc) #SagOff_bender_point(B)
+            elif bender_version == 1:
+                adc = np.arcsin( (dc/2) / bender[0] ) #angle opposite to dc
+                pdc = bender[0] * np.cos(adc) #perpendicular to dc
+                pb_ang = np.arctan(pdc / (Rs + aL + dc/2)) #angle between last analyzer and point B
+                pb_h = _R * (1 - np.cos(pb_ang)) #chord for the anchoring point
+                pb_chalf = _R * np.sin(pb_ang) #from circular segment formula
+                pb_ra = np.arccos(pb_chalf / bender[0])
+                pb_dc = bender[0] * np.sin(pb_ra) - pb_h
+                pb_chi = pb_ang + self.get_chi2(aN, Rs=Rs, rSext=rSext, inDeg=False) #radians
+                pb_rs = Rs + aL + pb_dc
+                pb_axoff = pb_rs * np.sin(pb_chi)
+                pb_sagoff = _R - (pb_rs * np.cos(pb_chi))
+                _logger.debug('pb_axoff={0}, pb_sagoff={1}'.format(_fmt(pb_axoff), _fmt(pb_sagoff)))
+            else:
+                raise NameError("ERROR with bender_version")
+        ok = np.isfinite(pb_axoff) & np.isfinite(pb_sagoff)
+        if not np.all(ok):
+            _logger.warning('bender geometry without solution for {0} radii'.format(np.size(ok) - np.count_nonzero(ok)))
         if self.showInfos:
-                print('INFO: bender point (B) coordinates (local sagittal reference)')
-                print('INFO: aXoff={0:.5f}, SagOff={1:.5f}'.format(pb_axoff, pb_sagoff)) 
+                _logger.info('bender point (B) coordinates (local sagittal reference)')
+                _logger.info('aXoff={0}, SagOff={1}'.format(_fmt(pb_axoff), _fmt(pb_sagoff)))
+        if retOk:
+            return (pb_axoff, pb_sagoff, ok)
         return (pb_axoff, pb_sagoff)
 
     def get_bender_mot(self, bender_pos, actuator=None, bender_version=None):
@@ -675,7 +736,7 @@ class RowlandCircle(object):
 
         Parameters
         ----------
-        bender_pos : tuple of floats
+        bender_pos : tuple of floats (or arrays)
                      (bender_axoff_mm, bender_sagoff_mm)
 
         actuator : tuple of floats, None
@@ -685,25 +746,128 @@ class RowlandCircle(object):
                          0 -> prototype
                          1 -> pantograph 2017
 
+        Returns
+        -------
+        mot_sagoff : float or array, 0. where the actuator cannot reach
+                     the bender point (B)
+
         """
+        mot_sagoff = self._bender_mot(bender_pos, actuator=actuator, bender_version=bender_version)
+        ok = np.isfinite(mot_sagoff)
+        if not np.all(ok):
+            _logger.error('with bender actuator position')
+        if np.ndim(mot_sagoff) == 0:
+            return float(mot_sagoff) if ok else 0.
+        return np.where(ok, mot_sagoff, 0.)
+
+    def _bender_mot(self, bender_pos, actuator=None, bender_version=None):
+        """get_bender_mot() with NaN where the actuator cannot reach (B)"""
         if actuator is None: actuator = self.actuator
         if bender_version is None:  bender_version = self.bender_version
+        if bender_version == 0:
+            sinrd = (actuator[0] - bender_pos[0]) / actuator[1]
+        elif bender_version == 1:
+            sinrd = (actuator[0] - self.bender[2] - bender_pos[0]) / actuator[1]
+        else:
+            raise NameError("ERROR with bender_version")
+        with np.errstate(invalid='ignore'):
+            return actuator[1] * np.cos(np.arcsin(sinrd)) + bender_pos[1]
+
+    def get_bender_rs(self, mot_sagoff, Rs0=None, aN=5, tol=1e-9, maxiter=50, retAll=False):
+        """get the sagittal radius for a given bender motor position
+        (inverse of get_bender_mot(get_bender_pos(Rs=Rs))) with a
+        vectorised Newton iteration
+
+        Parameters
+        ----------
+        mot_sagoff : float or array, bender motor position(s)
+        Rs0 : float or array, None
+              starting sagittal radius [None -> self.Rs]
+        aN : int, 5
+             see get_bender_pos()
+        tol : float, 1e-9
+              absolute tolerance on Rs (same unit)
+        maxiter : int, 50
+                  maximum number of iterations
+        retAll : boolean, False
+                 return also the convergence flag and the number of
+                 iterations of each element
+
+        Returns
+        -------
+        Rs [, converged, niter] : floats or arrays (Rs is NaN where not converged)
+        """
+        if Rs0 is None: Rs0 = self.Rs
+        shape = np.broadcast(mot_sagoff, Rs0).shape
+        mot = np.broadcast_to(np.asarray(mot_sagoff, dtype=float), shape).ravel()
+        Rs = np.array(np.broadcast_to(Rs0, shape), dtype=float).ravel()
+        converged = np.zeros(Rs.shape, dtype=bool)
+        active = np.ones(Rs.shape, dtype=bool)
+        niter = np.zeros(Rs.shape, dtype=int)
+        showInfos, self.showInfos = self.showInfos, False
         try:
-            if bender_version == 0:
-                rd = math.asin( (actuator[0] - bender_pos[0]) / actuator[1] )
-            elif bender_version == 1:
-                rd = math.asin((actuator[0] - self.bender[2] - bender_pos[0]) / actuator[1])
-            else:
-                raise NameError("ERROR with bender_version")
-            mot_sagoff = actuator[1] * math.cos(rd) + bender_pos[1]
-            return mot_sagoff
-        except:
-            print('ERROR with bender actuator position')
-            return 0.
+            for _ in range(maxiter):
+                iact = np.flatnonzero(active)
+                if len(iact) == 0:
+                    break
+                _rs = Rs[iact]
+                _step = 1e-6 * np.maximum(np.abs(_rs), 1.)
+                _f = self._bender_mot(self.get_bender_pos(aN=aN, Rs=_rs)) - mot[iact]
+                _fp = self._bender_mot(self.get_bender_pos(aN=aN, Rs=_rs+_step))
+                _fm = self._bender_mot(self.get_bender_pos(aN=aN, Rs=_rs-_step))
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    _delta = _f / ((_fp - _fm) / (2 * _step))
+                _bad = ~np.isfinite(_delta)
+                _done = np.abs(_delta) <= tol
+                Rs[iact] = _rs - _delta
+                niter[iact] += 1
+                converged[iact] = _done & ~_bad
+                active[iact] = ~(_done | _bad)
+        finally:
+            self.showInfos = showInfos
+        Rs[~converged] = np.nan
+        if not converged.all():
+            _logger.warning('get_bender_rs: {0} elements not converged'.format(np.count_nonzero(~converged)))
+        if shape == ():
+            Rs, converged, niter = float(Rs[0]), bool(converged[0]), int(niter[0])
+        else:
+            Rs, converged, niter = Rs.reshape(shape), converged.reshape(shape), niter.reshape(shape)
+        if retAll:
+            return Rs, converged, niter
+        return Rs
+
+    def get_bender_calib(self, theta, aN=5):
+        """bender calibration table for an array of Bragg angles
+
+        The geometry of this Rowland circle is not changed
+
+        Parameters
+        ----------
+        theta : float or array, Bragg angles [deg]
+        aN : int, 5
+             see get_bender_pos()
+
+        Returns
+        -------
+        dict of arrays, see save_bender_calib()
+            'theta', 'ene' (NaN if d is None), 'Rs', 'bender_axoff',
+            'bender_sagoff', 'mot_sagoff' (NaN where no solution), 'ok'
+        """
+        rc = copy.copy(self)
+        rc.showInfos = False
+        theta = np.atleast_1d(np.asarray(theta, dtype=float))
+        rc.set_theta0(theta, showInfos=False)
+        Rs = np.broadcast_to(rc.Rs, theta.shape)
+        pb_axoff, pb_sagoff, ok = rc.get_bender_pos(aN=aN, Rs=Rs, retOk=True)
+        mot = rc._bender_mot((pb_axoff, pb_sagoff))
+        ok = ok & np.isfinite(mot)
+        ene = rc.get_ene() if rc.d is not None else np.full(theta.shape, np.nan)
+        return {'theta': theta, 'ene': ene, 'Rs': np.array(Rs), 'bender_axoff': pb_axoff,
+                'bender_sagoff': pb_sagoff, 'mot_sagoff': mot, 'ok': ok}
 
     def get_az_off(self, eDelta, rtheta0=None, d=None, Rm=None):
         """get analyser Z offset for a given energy delta (eV)"""
-        if abs(eDelta) <= ED0:
+        if np.ndim(eDelta) == 0 and abs(eDelta) <= ED0:
             return 0.
         if rtheta0 is None:
             rtheta0 = self.rtheta0
@@ -715,14 +879,14 @@ class RowlandCircle(object):
             Rm = self.Rm
         _dth = self.get_dth(eDelta)
         if self.showInfos:
-            print('INFO: dth = {0:.1f} urad ({1:.5f} deg)'.format(_dth*1e6, math.degrees(_dth)))
-            print('INFO: daz [tan(dth) ~ dth] = {0}'.format(_dth * 2 * Rm * math.sin(rtheta0) ))
-            print('INFO: daz [tan(dth) ~ dth and sin(th) ~ 1 = {0}'.format(_dth * 2 * Rm) )
-        return 2 * Rm * math.sin(rtheta0) * math.tan(_dth)
+            _logger.info('dth = {0} urad ({1} deg)'.format(_fmt(_dth*1e6, '.1f'), _fmt(np.degrees(_dth))))
+            _logger.info('daz [tan(dth) ~ dth] = {0}'.format(_fmt(_dth * 2 * Rm * np.sin(rtheta0))))
+            _logger.info('daz [tan(dth) ~ dth and sin(th) ~ 1 = {0}'.format(_fmt(_dth * 2 * Rm)))
+        return 2 * Rm * np.sin(rtheta0) * np.tan(_dth)
 
     def get_ay_off(self, eDelta, rtheta0=None, d=None, Rm=None):
         """get analyser Y offset for a given energy delta (eV)"""
-        if abs(eDelta) <= ED0:
+        if np.ndim(eDelta) == 0 and abs(eDelta) <= ED0:
             return 0.
         if rtheta0 is None:
             rtheta0 = self.rtheta0
@@ -734,12 +898,12 @@ class RowlandCircle(object):
             Rm = self.Rm
         _dth = self.get_dth(eDelta)
         if self.showInfos:
-            print('INFO: dth = {0:.1f} urad ({1:.5f} deg)'.format(_dth*1e6, math.degrees(_dth)))
-        return 2 * Rm * math.tan(rtheta0) * math.tan(_dth)
+            _logger.info('dth = {0} urad ({1} deg)'.format(_fmt(_dth*1e6, '.1f'), _fmt(np.degrees(_dth))))
+        return 2 * Rm * np.tan(rtheta0) * np.tan(_dth)
         
     def get_ene_off(self, aZoff, rtheta0=None, d=None, Rm=None):
         """get analyser delta E for a given Z offset """
-        if abs(aZoff) <= AZ0:
+        if np.ndim(aZoff) == 0 and abs(aZoff) <= AZ0:
             return 0.
         if rtheta0 is None:
             rtheta0 = self.rtheta0
@@ -750,12 +914,13 @@ class RowlandCircle(object):
         if Rm is None:
             Rm = self.Rm
         #
-        _dth = math.atan( aZoff /  (2 * Rm * math.sin(rtheta0)) )
+        _dth = np.arctan( aZoff /  (2 * Rm * np.sin(rtheta0)) )
         if self.showInfos:
-            print('INFO: dth = {0:.1f} urad ({1:.5f} deg)'.format(_dth*1e6, math.degrees(_dth)))
+            _logger.info('dth = {0} urad ({1} deg)'.format(_fmt(_dth*1e6, '.1f'), _fmt(np.degrees(_dth))))
         _ene = self.get_ene(theta=rtheta0, d=d, isDeg=False)
-        _de = _ene * _dth / math.tan(rtheta0)
-        return _de
+        _de = _ene * _dth / np.tan(rtheta0)
+        _de = np.where(np.abs(aZoff) <= AZ0, 0., _de)
+        return float(_de) if _de.ndim == 0 else _de
 
             
 class RcVert(RowlandCircle):
@@ -780,14 +945,14 @@ class RcVert(RowlandCircle):
     def get_pos(self, vect):
         """utility method: return 'vect' or its rotated form if self.rotHor"""
         if self.rotHor:
-            return rotate(vect, np.array([1,0,0]), (math.pi/2.-self.rtheta0))
+            return _rotate(vect, np.array([1,0,0]), (np.pi/2.-self.rtheta0))
         else:
             return vect
 
     def get_det_pos(self):
-        """detector center position [X,Y,Z]"""
-        zDet = 4 * self.Rm * math.sin(self.rtheta0) * math.cos(self.rtheta0)
-        vDet = np.array([0, 0, zDet])
+        """detector center position [X,Y,Z] ((N, 3) array for an array of theta0)"""
+        zDet = 4 * self.Rm * np.sin(self.rtheta0) * np.cos(self.rtheta0)
+        vDet = _vec3(0, 0, zDet)
         return self.get_pos(vDet)
 
     def get_ana_pos(self, chi=0.):
@@ -796,17 +961,22 @@ class RcVert(RowlandCircle):
         Parameters
         ==========
         
-        chi : float, 0. [deg]
+        chi : float or array, 0. [deg]
               rotation angle on the sagittal plane (hor plane here)
 
+        Returns
+        =======
+
+        [X,Y,Z] or (N, 3) array if chi or theta0 are arrays
+
         """
-        yAcen = 2 * self.Rm * math.sin(self.rtheta0)**2
-        zAcen = 2 * self.Rm * math.sin(self.rtheta0) * math.cos(self.rtheta0)
-        Acen = np.array([0, yAcen, zAcen])
-        if (chi == 0.):
+        yAcen = 2 * self.Rm * np.sin(self.rtheta0)**2
+        zAcen = 2 * self.Rm * np.sin(self.rtheta0) * np.cos(self.rtheta0)
+        Acen = _vec3(0, yAcen, zAcen)
+        if np.ndim(chi) == 0 and (chi == 0.):
             return self.get_pos(Acen)
         else:
-            Aside = rotate(Acen, np.array([0,0,1]), math.radians(chi))
+            Aside = _rotate(Acen, np.array([0,0,1]), np.radians(chi))
             return self.get_pos(Aside)
 
     def get_miscut_off(self, alpha=None, Rm=None):
@@ -816,7 +986,7 @@ class RcVert(RowlandCircle):
         if (alpha is None) or (Rm is None):
             ralpha = self.ralpha
             Rm = self.Rm
-        return - Rm * (1-math.cos(ralpha)), - Rm * math.sin(ralpha)
+        return - Rm * (1-np.cos(ralpha)), - Rm * np.sin(ralpha)
 
 class RcHoriz(RowlandCircle):
     """Rowland circle horizontal frame: sample-analyser on XY plane along
@@ -829,10 +999,10 @@ Y axis
         RowlandCircle.__init__(self, *args, **kws)
 
     def get_det_pos(self):
-        """detector position [X,Y,Z]"""
-        yDet = self.p + self.q * math.cos(2 * self.rtheta0)
-        zDet = self.q * math.sin(2 * self.rtheta0)
-        return np.array([0, yDet, zDet])
+        """detector position [X,Y,Z] ((N, 3) array for an array of theta0)"""
+        yDet = self.p + self.q * np.cos(2 * self.rtheta0)
+        zDet = self.q * np.sin(2 * self.rtheta0)
+        return _vec3(0, yDet, zDet)
 
     def get_ana_pos(self, chi=0.):
         """analyser XYZ center position for a given chi
@@ -840,16 +1010,21 @@ Y axis
         Parameters
         ==========
         
-        chi : float, 0. [deg]
+        chi : float or array, 0. [deg]
               rotation angle on the sagittal plane (around sample-detector axis)
-        
+
+        Returns
+        =======
+
+        [X,Y,Z] or (N, 3) array if chi or theta0 are arrays
+
         """
-        Acen = np.array([0, self.q, 0])
-        if (chi == 0.):
+        Acen = _vec3(0, self.q, 0)
+        if np.ndim(chi) == 0 and (chi == 0.):
             return Acen
         else:
             SDax = self.get_det_pos() - self.sampPos
-            Aside = rotate(Acen, SDax, math.radians(chi))
+            Aside = _rotate(Acen, SDax, np.radians(chi))
             return Aside
         
     def get_miscut_off(self, alpha=None, p=None):
@@ -859,7 +1034,7 @@ Y axis
         if (alpha is None) or (p is None):
             ralpha = self.ralpha
             p = self.p
-        return - p * math.cos(ralpha/2.), - p * math.sin(ralpha/2.)
+        return - p * np.cos(ralpha/2.), - p * np.sin(ralpha/2.)
 
 
 if __name__ == "__main__":
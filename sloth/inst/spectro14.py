@@ -10,6 +10,7 @@ spectro14: FAME-UHD (ESRF/BM16) X-ray emission spectrometer
 import math
 import numpy as np
 
+from sloth.math.rotmatrix import rotation_matrices
 from sloth.utils.bragg import (
     HC,
     SI_ALAT,
@@ -54,7 +55,7 @@ def calc_pos_com(emi, d=0, r=0, dz=0, sz=0):
 
     Parameters
     ----------
-    emi  : emission energy [keV]
+    emi  : emission energy [keV], float or array
     d    : analyser d-spacing [nm]
     r    : crystal bending radius (=diameter Rowland circle) [mm]
     dz   : offset in z from the central row [mm]
@@ -74,26 +75,32 @@ def calc_pos_com(emi, d=0, r=0, dz=0, sz=0):
         "thetab" : float  #theta correction bottom row     [deg]
      }
 
+    (arrays with the shape of emi if emi is an array; the corrections
+    are 0 where the top/bottom rows cannot be reached)
+
     """
     _rtheta = kev2ang(emi, d, deg=False)
-    _xs = r * math.sin(_rtheta) * math.sin(_rtheta)
-    _zeq = r * math.sin(_rtheta) * math.cos(_rtheta)
+    _xs = r * np.sin(_rtheta) * np.sin(_rtheta)
+    _zeq = r * np.sin(_rtheta) * np.cos(_rtheta)
     _zd = 2 * _zeq  # detector
-    _rsth = r * math.sin(_rtheta)
-    try:
-        _xh = math.sqrt(_rsth ** 2 - (_zeq + dz) ** 2) - _xs
-        _xb = math.sqrt(_rsth ** 2 - (_zeq - dz) ** 2) - _xs
-        _thetah = math.degrees(
-            math.atan((_zeq + dz) / (_xh + _xs)) + _rtheta - (math.pi / 2.0)
+    _rsth = r * np.sin(_rtheta)
+    _argh = _rsth ** 2 - (_zeq + dz) ** 2
+    _argb = _rsth ** 2 - (_zeq - dz) ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        _xh = np.sqrt(_argh) - _xs
+        _xb = np.sqrt(_argb) - _xs
+        _thetah = np.degrees(
+            np.arctan((_zeq + dz) / (_xh + _xs)) + _rtheta - (np.pi / 2.0)
+        )
+        _thetab = np.degrees(
+            np.arctan((_zeq - dz) / (_xb + _xs)) + _rtheta - (np.pi / 2.0)
         )
-        _thetab = math.degrees(
-            math.atan((_zeq - dz) / (_xb + _xs)) + _rtheta - (math.pi / 2.0)
+    _fail = (_argh < 0) | (_argb < 0) | (_xh + _xs == 0) | (_xb + _xs == 0)
+    _xh, _xb, _thetah, _thetab = (np.where(_fail, 0.0, _val) for _val in (_xh, _xb, _thetah, _thetab))
+    if np.ndim(emi) == 0:
+        _xs, _zeq, _zd, _xh, _xb, _thetah, _thetab = (
+            float(_val) for _val in (_xs, _zeq, _zd, _xh, _xb, _thetah, _thetab)
         )
-    except Exception:
-        _xh = 0.0
-        _xb = 0.0
-        _thetah = 0.0
-        _thetab = 0.0
 
     _com_dict = {
         "xs": _xs,
@@ -115,36 +122,41 @@ def calc_pos_mod(nmodule):
     pass
 
 
-def show_spectro_overview(theta, d=None, r=1000.0, dz=82.0, sz=500.0, retdict=False):
-    """show an overview of the spectrometer geometry calculations"""
+def show_spectro_overview(theta, d=None, r=1000.0, dz=82.0, sz=500.0, retdict=False, plot=False):
+    """show an overview of the spectrometer geometry calculations
+
+    theta can be an array of Bragg angles (deg): the returned dictionary
+    contains then arrays and an overview is printed per angle; with
+    plot=True the whole analysers bank (AnalyserBankBM16) is plotted
+    """
 
     if d is not None:
         ene = ang2kev(theta, d)
     else:
         ene = "no dspacing"
-    rtheta = math.radians(theta)
+    rtheta = np.radians(theta)
 
-    p = r * math.sin(rtheta)
-    xs = r * math.sin(rtheta) ** 2
-    zeq = r * math.sin(rtheta) * math.cos(rtheta)
-    xsh = math.sqrt(p ** 2 - (zeq + dz) ** 2)
-    xsb = math.sqrt(p ** 2 - (zeq - dz) ** 2)
+    p = r * np.sin(rtheta)
+    xs = r * np.sin(rtheta) ** 2
+    zeq = r * np.sin(rtheta) * np.cos(rtheta)
+    xsh = np.sqrt(p ** 2 - (zeq + dz) ** 2)
+    xsb = np.sqrt(p ** 2 - (zeq - dz) ** 2)
     xh = xsh - xs
     xb = xsb - xs
-    rth = math.acos(xsh / p) + rtheta - math.pi / 2.0
-    rtb = math.acos(xsb / p) + rtheta - math.pi / 2.0
-    th = math.degrees(rth)
-    tb = math.degrees(rtb)
+    rth = np.arccos(xsh / p) + rtheta - np.pi / 2.0
+    rtb = np.arccos(xsb / p) + rtheta - np.pi / 2.0
+    th = np.degrees(rth)
+    tb = np.degrees(rtb)
 
     #: using SolidWorks model v1804 (TODO: check!!!)
-    xdb = 2 * zeq * math.sin(abs(rtb))
-    zdb = xdb / math.tan(rtheta + rtb)
+    xdb = 2 * zeq * np.sin(np.abs(rtb))
+    zdb = xdb / np.tan(rtheta + rtb)
 
     dzh = calc_det_dzh(theta)
     dzb = calc_det_dzb(theta)
 
-    dxh = dzh / math.tan(math.pi / 2.0 - rtheta)
-    dxb = dzb / math.tan(math.pi / 2.0 - rtheta)
+    dxh = dzh / np.tan(np.pi / 2.0 - rtheta)
+    dxb = dzb / np.tan(np.pi / 2.0 - rtheta)
 
     # ADD SAMPLE Z OFFSET
     zd = zeq * 2 + sz
@@ -198,10 +210,54 @@ dxh = {dxh:>10.3f} | dxb = {dxb:>10.3f}{nl}\
 (dyb = {xdb:>10.3f}){nl}\
 (dzb = {zdb:>10.3f}){nl}\
 "
+    if plot:
+        plot_spectro_bank(theta, AnalyserBankBM16(dz_abs=dz, R=r, sz=sz))
     if retdict:
         return outdict
-    else:
+    elif np.ndim(theta) == 0:
         print(outstr.format(**outdict))
+    else:
+        for ith in range(np.size(theta)):
+            print(outstr.format(**{key: (val[ith] if np.ndim(val) else val) for key, val in outdict.items()}))
+
+
+def plot_spectro_bank(theta, bank=None, fig=None):
+    """plot the analysers (flag=1) and detector positions of the bank for
+    one or more Bragg angles (side view Z vs. radial distance and top
+    view Y vs. X)
+
+    Parameters
+    ----------
+    theta : float or 1D array, Bragg angles (deg)
+    bank : AnalyserBankBM16, None -> default bank
+    fig : matplotlib figure, None -> new figure
+
+    Returns
+    -------
+    fig
+    """
+    import matplotlib.pyplot as plt
+
+    if bank is None:
+        bank = AnalyserBankBM16()
+    geo = bank.geometry(np.atleast_1d(theta))
+    act = bank.flag == 1
+    if fig is None:
+        fig = plt.figure()
+    side, top = fig.subplots(nrows=1, ncols=2)
+    for ith, th in enumerate(np.atleast_1d(theta)):
+        pos = geo["position"][ith][act]
+        lines = side.plot(geo["xs"][ith][act], pos[:, 2], "o", label=f"{th:.2f} deg")
+        side.plot(0, geo["zd"][ith], "s", color=lines[0].get_color())
+        top.plot(pos[:, 0], pos[:, 1], "o", color=lines[0].get_color())
+    side.plot(0, bank.sz, "k*")
+    top.plot(0, 0, "k*")
+    side.set_xlabel("radial distance xs (mm)")
+    side.set_ylabel("Z (mm)")
+    top.set_xlabel("X (mm)")
+    top.set_ylabel("Y (mm)")
+    side.legend()
+    return fig
 
 
 # === NUMERICAL APPROACH ===
@@ -568,12 +624,111 @@ class AnalyserBM16:
 
     
     
+class AnalyserBankBM16:
+    """Analysers bank of the BM16 spectrometer as a structure of arrays
+
+    One entry per analyser (bottom, top and central rows, in this
+    order) in 1D arrays: the positions and orientations of the whole
+    bank for an array of Bragg angles are computed at once (same
+    geometry as AnalyserBM16).
+    """
+
+    def __init__(self, dz_abs=82, beta=8, R=1000, pos_cen=4, sz=500, miscut=0, npos=7, flags=(1, 1, 0)):
+        """constructor
+
+        Parameters
+        ----------
+        dz_abs : float
+            vertical distance of the top/bottom rows from the central row in mm [82]
+        beta, R, pos_cen, sz, miscut : see AnalyserBM16
+        npos : int
+            number of analysers per row [7]
+        flags : tuple of int
+            use (1) or not (0) the rows (bottom, top, central) [(1, 1, 0)]
+        """
+        self.R = R
+        self.sz = sz
+        self.miscut = miscut
+        self.pos_cen = pos_cen
+        rows = ("b", "h", "c")
+        dzs = (-1 * dz_abs, dz_abs, 0)
+        self.row = np.repeat(rows, npos)
+        self.pos = np.tile(np.arange(1, npos + 1), len(rows))
+        self.dz = np.repeat(np.array(dzs, dtype=float), npos)
+        self.flag = np.repeat(np.array(flags, dtype=int), npos)
+        self.beta = beta * (pos_cen - self.pos).astype(float)
+        self.names = np.array([f"{row}{pos}" for row, pos in zip(self.row, self.pos)])
+        self._rz_beta = rotation_matrices(np.array([0, 0, 1]), -np.deg2rad(self.beta))
+
+    def __len__(self):
+        return len(self.names)
+
+    def index(self, name):
+        """index of the analyser '{row}{position}' in the arrays"""
+        return int(np.flatnonzero(self.names == name)[0])
+
+    def geometry(self, theta):
+        """positions and orientations of all the analysers
+
+        Parameters
+        ----------
+        theta : float or array
+            Bragg angle(s) in degrees
+
+        Returns
+        -------
+        dict of arrays, shape theta.shape + (nanalysers,) [+ (3,)]
+            'gamma' : rotation around Y (deg), see AnalyserBM16.gamma
+            'position' : XYZ position (..., nanalysers, 3)
+            'normal' : normal to the analyser (..., nanalysers, 3)
+            'x', 'y', 'z', 'xs' : coordinates and radial distance from the sample
+            'pitch', 'yaw' : orientation (deg)
+            'geo_bragg' : Bragg angle from the incident and normal vectors (deg)
+            'x0', 'z0', 'zd' : virtual central analyser and detector
+                               positions, shape theta.shape
+        """
+        theta = np.asarray(theta, dtype=float)
+        rtheta = np.deg2rad(theta)[..., np.newaxis]
+        sth, cth = np.sin(rtheta), np.cos(rtheta)
+        with np.errstate(invalid="ignore"):
+            gamma = -(np.rad2deg(np.arcsin(cth + self.dz / (self.R * sth))) - 90 + theta[..., np.newaxis])
+        virt_cen_pos = np.stack((self.R * sth ** 2, np.zeros_like(sth), self.R * sth * cth), axis=-1)
+        mats = np.matmul(rotation_matrices(np.array([0, 1, 0]), -np.deg2rad(gamma)), self._rz_beta)
+        position = np.einsum("...ij,...j->...i", mats, virt_cen_pos)
+        position[..., 2] += self.sz
+        normal = mats[..., :, 0]
+        incident = position - np.array([0, 0, self.sz])
+        incident /= -np.linalg.norm(incident, axis=-1, keepdims=True)
+        sign = np.where(normal[..., 2] >= incident[..., 2], 1, -1)
+        cosb = np.clip(np.einsum("...i,...i->...", incident, normal), -1, 1)
+        geo_bragg = np.round(90 - sign * np.rad2deg(np.arccos(cosb)) + self.miscut, DIGITS_TOLERANCE)
+        pitch = np.rad2deg(np.arccos(np.clip(normal[..., 0] / np.linalg.norm(normal, axis=-1), -1, 1)))
+        x0 = virt_cen_pos[..., 0, 0]
+        zeq = virt_cen_pos[..., 0, 2]
+        return {
+            "gamma": gamma,
+            "position": position,
+            "normal": normal,
+            "x": position[..., 0],
+            "y": position[..., 1],
+            "z": position[..., 2],
+            "xs": np.hypot(position[..., 0], position[..., 1]),
+            "pitch": pitch,
+            "yaw": np.zeros_like(pitch),
+            "geo_bragg": geo_bragg,
+            "x0": x0,
+            "z0": zeq + self.sz,
+            "zd": 2 * zeq + self.sz,
+        }
+
+
 class SpectrometerBM16:
     """BM16 spectrometer, a.k.a. spectro14"""
     
     def __init__(self, theta, dz_abs=82, beta=8, R=1000, pos_cen=4, sz=500):
         
         self.theta = theta
+        self.bank = AnalyserBankBM16(dz_abs=dz_abs, beta=beta, R=R, pos_cen=pos_cen, sz=sz)
         
         self._anas = {}
     
@@ -592,6 +747,20 @@ class SpectrometerBM16:
             name = f"c{idx}"
             self._anas[name] = AnalyserBM16(self.theta, pos=idx, dz=0, beta=beta, pos_cen=pos_cen, sz=sz, R=R, flag=0)
 
+    def get_positions(self, theta=None, ene=None, d=None):
+        """positions of all the analysers for one or more Bragg angles
+        (or emission energies), see AnalyserBankBM16.geometry()
+
+        Parameters
+        ----------
+        theta : float or array, Bragg angles (deg) [None -> self.theta]
+        ene : float or array, emission energies (keV), used if theta is None
+        d : float, analyser d-spacing, required with ene
+        """
+        if theta is None:
+            theta = self.theta if ene is None else kev2ang(ene, d)
+        return self.bank.geometry(theta)
+
     def get_analysers(self):
         analysers = []
         for name, ana in self._anas.items():
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Parameter sweeps for analysers design studies
+================================================
+
+A declarative grid of parameters (cartesian product) is evaluated in
+chunks, optionally on a pool of processes, and the results are streamed
+to a chunked HDF5 file. The chunks already written are skipped when the
+sweep is run again (resume on restart).
+
+Example
+-------
+
+>>> from sloth.inst.sweep import ParameterSweep, sweep_grid
+>>> grid = sweep_grid(r1p=[500., 1000.], theta=np.linspace(35, 85, 51),
+...                   cryst_x=[25., 50.], case=['Jn', 'Js', 'SphJn', 'TorJs'])
+>>> sw = ParameterSweep('sweep.h5', grid, csteps=201j)
+>>> sw.run()
+>>> theta, eff = sw.summary('eff', by='theta')
+
+"""
+
+import functools
+import itertools
+import os
+
+import numpy as np
+
+from sloth.inst.dthetaxz import mapCase2Num, getMeshCompressed, dThetaCoeffsPairs, getDthetaStats
+from sloth.utils.logging import getLogger
+
+_logger = getLogger("sloth.inst.sweep")
+
+#: sweep parameters and their default values (see eval_dthetaxz)
+SWEEP_PARAMS = {
+    "r1p": 1000.0,  #: bending radius of the crystal planes (mm), 2*Rm
+    "theta": 75.0,  #: Bragg angle (deg)
+    "cryst_x": 50.0,  #: crystal radius or half side in x (mm)
+    "cryst_z": 10.0,  #: crystal half side in z (mm), rectangular mask
+    "case": 1,  #: bending case number, see dthetaxz.mapCase2Num
+    "alpha": 0.0,  #: asymmetry (miscut) angle (deg)
+}
+
+
+def sweep_grid(**params):
+    """Cartesian product of the given parameters
+
+    Parameters
+    ----------
+    **params : lists of values for the keys in SWEEP_PARAMS (or any
+               other numeric parameter); cases can be given by name
+
+    Returns
+    -------
+    dict of 1D arrays, one value per parameter point
+    """
+    grid = {}
+    for key, values in params.items():
+        values = np.atleast_1d(values)
+        if key == "case":
+            values = np.array([val if isinstance(val, (int, np.integer)) else mapCase2Num(val) for val in values])
+            if (values == 0).any():
+                raise NameError("unknown case in {0}".format(params[key]))
+        grid[key] = values
+    mesh = np.meshgrid(*grid.values(), indexing="ij")
+    return {key: val.ravel() for key, val in zip(grid.keys(), mesh)}
+
+
+def eval_dthetaxz(params, mask="circular", csteps=201j, wrc=1.25e-4, dtype=np.float64, nbins=200):
+    """Evaluate a chunk of parameter points with dthetaxz and the
+    Rowland circle geometry
+
+    The points sharing the same crystal mesh (r1p, cryst_x, cryst_z) are
+    evaluated together with dthetaxz.getDthetaStats().
+
+    .. note:: dthetaxz.dThetaXZ() is for symmetric reflections; the
+              asymmetry angle (alpha) enters only the Rowland circle
+              distances (p, q) and the sagittal radius (Rs), as in
+              rowland.RowlandCircle.set_theta0()
+
+    Parameters
+    ----------
+    params : dict of 1D arrays, see SWEEP_PARAMS
+    mask, csteps : see dthetaxz.getMeshCompressed()
+    wrc : width of the analyzer rocking curve in rad [1.25E-4]
+    dtype : data type of the mesh [np.float64]
+    nbins : number of bins of the dTheta histogram for the FWHM [200],
+            None: no FWHM (one pass less over the crystal mesh)
+
+    Returns
+    -------
+    dict of 1D arrays
+        'sa' : effective (|dTheta| <= wrc) solid angle
+        'eff' : solid-angle efficiency, fraction of the crystal with |dTheta| <= wrc
+        'eres' : energy resolution (dE/E)
+        'dth_mean', 'dth_std', 'dth_range' : statistics of dTheta (rad)
+        'dth_fwhm' : FWHM of the dTheta histogram (rad), if nbins is given
+        'p', 'q', 'Rs' : sample-analyser, analyser-detector distances and
+                         sagittal radius (mm)
+    """
+    npts = len(next(iter(params.values())))
+    pars = {key: np.broadcast_to(params.get(key, val), (npts,)) for key, val in SWEEP_PARAMS.items()}
+    keys = ("sa", "eff", "eres", "dth_mean", "dth_std", "dth_range") + (("dth_fwhm",) if nbins else ())
+    out = {key: np.full(npts, np.nan) for key in keys}
+    meshes = np.stack((pars["r1p"], pars["cryst_x"], pars["cryst_z"]), axis=1)
+    umeshes, imesh = np.unique(meshes, axis=0, return_inverse=True)
+    for iu, (r1p, cryst_x, cryst_z) in enumerate(umeshes):
+        sel = np.flatnonzero(imesh.ravel() == iu)
+        x, z, area = getMeshCompressed(mask, r1p=r1p, cryst_x=cryst_x, cryst_z=cryst_z, csteps=csteps, dtype=dtype)
+        coeffs = dThetaCoeffsPairs(pars["case"][sel], pars["theta"][sel])
+        stats = getDthetaStats(x, z, coeffs, wrc=wrc, nbins=nbins)
+        rthetab = np.deg2rad(pars["theta"][sel])
+        out["sa"][sel] = stats["neff"] * area / np.sin(rthetab)
+        out["eff"][sel] = stats["neff"] / len(x)
+        out["eres"][sel] = np.sqrt((stats["max"] - stats["min"]) ** 2 + wrc ** 2) / np.tan(rthetab)
+        out["dth_mean"][sel] = stats["mean"]
+        out["dth_std"][sel] = stats["std"]
+        out["dth_range"][sel] = stats["max"] - stats["min"]
+        if nbins:
+            out["dth_fwhm"][sel] = stats["fwhm"]
+    #: Rowland circle, Rm = r1p/2
+    rtheta = np.deg2rad(pars["theta"])
+    ralpha = np.deg2rad(pars["alpha"])
+    out["p"] = pars["r1p"] * np.sin(rtheta - ralpha)
+    out["q"] = pars["r1p"] * np.sin(rtheta + ralpha)
+    out["Rs"] = pars["r1p"] * np.sin(rtheta - ralpha) * np.sin(rtheta + ralpha)
+    return out
+
+
+def _eval_chunk(evaluator, params, ichunk):
+    """run the evaluator in a worker process"""
+    return ichunk, evaluator(params)
+
+
+class ParameterSweep(object):
+    """Parameter sweep streamed to a chunked HDF5 file"""
+
+    def __init__(self, fname, grid, evaluator=eval_dthetaxz, chunk_size=256, **eval_kws):
+        """
+        Parameters
+        ----------
+        fname : str
+            HDF5 file name (created or resumed)
+        grid : dict of 1D arrays
+            parameter points, see sweep_grid()
+        evaluator : callable, eval_dthetaxz
+            function(params, **eval_kws) -> dict of 1D arrays, it must be
+            picklable (module-level function) to run on a process pool
+        chunk_size : int, 256
+            number of parameter points per chunk (and HDF5 chunk size)
+        **eval_kws : keyword arguments for the evaluator
+        """
+        self.fname = fname
+        self.grid = {key: np.asarray(val) for key, val in grid.items()}
+        self.npts = len(next(iter(self.grid.values())))
+        self.chunk_size = int(chunk_size)
+        self.nchunks = -(-self.npts // self.chunk_size)
+        self.evaluator = functools.partial(evaluator, **eval_kws) if eval_kws else evaluator
+
+    def _chunk_params(self, ichunk):
+        sl = slice(ichunk * self.chunk_size, (ichunk + 1) * self.chunk_size)
+        return {key: val[sl] for key, val in self.grid.items()}
+
+    def _open(self):
+        """open/initialize the HDF5 file and check the grid when resuming"""
+        import h5py
+
+        h5 = h5py.File(self.fname, "a")
+        if "params" not in h5:
+            grp = h5.create_group("params")
+            for key, val in self.grid.items():
+                grp.create_dataset(key, data=val, chunks=(min(self.chunk_size, self.npts),))
+            h5.create_group("results")
+            h5.create_dataset("done", data=np.zeros(self.nchunks, dtype=bool))
+            h5.attrs["chunk_size"] = self.chunk_size
+        else:
+            same = (h5.attrs["chunk_size"] == self.chunk_size) and (set(h5["params"]) == set(self.grid))
+            same = same and all(np.array_equal(h5["params"][key][()], val) for key, val in self.grid.items())
+            if not same:
+                h5.close()
+                raise ValueError("{0} contains a different sweep".format(self.fname))
+        return h5
+
+    def _write(self, h5, ichunk, res):
+        sl = slice(ichunk * self.chunk_size, (ichunk + 1) * self.chunk_size)
+        grp = h5["results"]
+        for key, val in res.items():
+            if key not in grp:
+                grp.create_dataset(key, shape=(self.npts,), dtype=np.asarray(val).dtype,
+                                   chunks=(min(self.chunk_size, self.npts),), fillvalue=np.nan)
+            grp[key][sl] = val
+        h5["done"][ichunk] = True
+        h5.flush()
+
+    def run(self, nproc=None):
+        """evaluate the chunks not done yet
+
+        Parameters
+        ----------
+        nproc : int or None
+            number of processes, 1: run in this process [None -> all cores]
+        """
+        if nproc is None:
+            nproc = os.cpu_count() or 1
+        with self._open() as h5:
+            todo = [ich for ich in range(self.nchunks) if not h5["done"][ich]]
+            _logger.info("%d/%d chunks to evaluate", len(todo), self.nchunks)
+            if nproc == 1 or len(todo) <= 1:
+                results = (_eval_chunk(self.evaluator, self._chunk_params(ich), ich) for ich in todo)
+                for ichunk, res in results:
+                    self._write(h5, ichunk, res)
+                return
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+
+            with ProcessPoolExecutor(max_workers=nproc) as pool:
+                #: submit a bounded number of chunks at once
+                ichunks = iter(todo)
+                futures = set()
+                for ich in itertools.islice(ichunks, 4 * nproc):
+                    futures.add(pool.submit(_eval_chunk, self.evaluator, self._chunk_params(ich), ich))
+                while futures:
+                    fut = next(as_completed(futures))
+                    futures.remove(fut)
+                    ichunk, res = fut.result()
+                    self._write(h5, ichunk, res)
+                    for ich in itertools.islice(ichunks, 1):
+                        futures.add(pool.submit(_eval_chunk, self.evaluator, self._chunk_params(ich), ich))
+
+    def results(self):
+        """parameters and results as a dict of 1D arrays (NaN where not done)"""
+        import h5py
+
+        with h5py.File(self.fname, "r") as h5:
+            out = {key: h5["params"][key][()] for key in h5["params"]}
+            out.update({key: h5["results"][key][()] for key in h5["results"]})
+        return out
+
+    def summary(self, key, by, reduce=np.nanmean):
+        """reduce a result over all the points with the same value of a
+        parameter
+
+        Parameters
+        ----------
+        key : str, result name (e.g. 'eff', 'eres', 'dth_mean')
+        by : str, parameter name (e.g. 'theta')
+        reduce : callable, reduction function [np.nanmean]
+
+        Returns
+        -------
+        values, reduced : 1D arrays
+        """
+        res = self.results()
+        values, inverse = np.unique(res[by], return_inverse=True)
+        inverse = inverse.ravel()
+        return values, np.array([reduce(res[key][inverse == iv]) for iv in range(len(values))])
+
+
+if __name__ == "__main__":
+    pass
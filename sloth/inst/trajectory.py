@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Motor trajectories lookup tables for Rowland circle spectrometers
+=====================================================================
+
+The Rowland circle geometry (:mod:`sloth.inst.rowland`) is evaluated
+once on a dense energy grid and stored in a table; the positions at any
+energy of the grid range are then obtained by (cubic or linear)
+interpolation, with an estimate of the interpolation error. The tables
+are keyed by the spectrometer parameters, stored as .npz (one table per
+file) or HDF5 (one group per table) and exported as plain text columns
+for the motion controllers.
+
+Example
+-------
+
+>>> from sloth.inst.trajectory import TrajectoryTable, reflection_trajectories
+>>> tab = TrajectoryTable.build(7950., 8100., d=0.7839, Rm=500., chis=[0., 10.])
+>>> pos, err = tab.interp(np.linspace(7960, 8090, 10001), retErr=True)
+>>> tab.export_txt('Si444_Rm500.txt', columns=['theta', 'det_y', 'det_z'])
+>>> tabs = reflection_trajectories(crystal='Si', thetamin=35., thetamax=85.)
+
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from sloth.inst.rowland import RcHoriz, RcVert, det_pos_rotated
+from sloth.utils.bragg import bragg_ev, hkl_table, HKL_MAX
+from sloth.utils.logging import getLogger
+
+_logger = getLogger("sloth.inst.trajectory")
+
+#: default directory of the cached tables, see trajectory_table()
+TRAJECTORY_DIR = os.path.join(os.path.expanduser("~"), ".sloth", "trajectories")
+
+#: spectrometer parameters and their default values (see trajectory_columns)
+TRAJECTORY_PARAMS = {
+    "d": None,  #: crystal d-spacing (\AA)
+    "Rm": 500.0,  #: Rowland circle radius (mm)
+    "frame": "horizontal",  #: 'horizontal' (RcHoriz) or 'vertical' (RcVert)
+    "rotHor": False,  #: RcVert only, see RcVert
+    "alpha": 0.0,  #: miscut angle (deg)
+    "aL": 0.0,  #: distance of the analyser center from the chi rotation (mm)
+    "chis": (0.0,),  #: chi angles of the analysers (deg)
+    "drot": None,  #: rotation of the detector stages (deg), see det_pos_rotated
+}
+
+_HDF5_EXTS = (".h5", ".hdf5", ".hdf", ".nxs")
+
+
+def trajectory_params(**params):
+    """complete the spectrometer parameters with the defaults (TRAJECTORY_PARAMS)"""
+    unknown = set(params) - set(TRAJECTORY_PARAMS)
+    if unknown:
+        raise KeyError("unknown spectrometer parameters: {0}".format(sorted(unknown)))
+    pars = dict(TRAJECTORY_PARAMS, **params)
+    if pars["d"] is None:
+        raise ValueError("the crystal d-spacing (d) is required")
+    if pars["frame"] not in ("horizontal", "vertical"):
+        raise NameError("frame is 'horizontal' or 'vertical'")
+    pars["chis"] = [float(chi) for chi in np.atleast_1d(pars["chis"])]
+    for key in ("d", "Rm", "alpha", "aL"):
+        pars[key] = float(pars[key])
+    if pars["drot"] is not None:
+        pars["drot"] = float(pars["drot"])
+    pars["rotHor"] = bool(pars["rotHor"])
+    return pars
+
+
+def trajectory_key(emin, emax, npts, **params):
+    """unique key (str) of a table, given the energy grid and the
+    spectrometer parameters"""
+    pars = trajectory_params(**params)
+    pars.update({"emin": float(emin), "emax": float(emax), "npts": int(npts)})
+    digest = hashlib.sha1(json.dumps(pars, sort_keys=True).encode()).hexdigest()
+    return "traj_{0}".format(digest[:16])
+
+
+def trajectory_columns(energy, **params):
+    """Rowland circle positions on an energy grid (one vectorised call)
+
+    Parameters
+    ----------
+    energy : 1D array
+        energy grid (eV)
+    **params : spectrometer parameters, see TRAJECTORY_PARAMS
+
+    Returns
+    -------
+    dict of 1D arrays (mm and deg)
+        'theta' : Bragg angle
+        'p', 'q', 'Rs' : sample-analyser, analyser-detector distances and
+                         sagittal radius
+        'det_x', 'det_y', 'det_z' : detector position
+        'det_dy', 'det_dz' : detector stages (only if drot is given)
+        'ana{i}_x', 'ana{i}_y', 'ana{i}_z' : position of the i-th analyser (chis[i])
+        'sagoff{i}' : sagittal offset of the i-th analyser
+    """
+    pars = trajectory_params(**params)
+    energy = np.asarray(energy, dtype=float)
+    rc_kws = dict(Rm=pars["Rm"], alpha=pars["alpha"], d=pars["d"], aL=pars["aL"], showInfos=False)
+    if pars["frame"] == "horizontal":
+        rc = RcHoriz(**rc_kws)
+    else:
+        rc = RcVert(rotHor=pars["rotHor"], **rc_kws)
+    theta = rc.get_theta(energy)
+    if np.isnan(theta).any():
+        raise ValueError("energy out of the d-spacing range")
+    rc.set_theta0(theta, showInfos=False)
+    cols = {"theta": theta}
+    for key in ("p", "q", "Rs"):
+        cols[key] = np.broadcast_to(getattr(rc, key), energy.shape).copy()
+    det = rc.get_det_pos()
+    for iax, ax in enumerate("xyz"):
+        cols["det_{0}".format(ax)] = det[:, iax]
+    if pars["drot"] is not None:
+        dstg = det_pos_rotated(det, drot=pars["drot"])
+        cols["det_dy"], cols["det_dz"] = dstg[:, 0], dstg[:, 1]
+    for ichi, chi in enumerate(pars["chis"]):
+        ana = np.broadcast_to(rc.get_ana_pos(chi), energy.shape + (3,))
+        for iax, ax in enumerate("xyz"):
+            cols["ana{0}_{1}".format(ichi, ax)] = ana[:, iax]
+        cols["sagoff{0}".format(ichi)] = np.broadcast_to(rc.get_sag_off(rc.get_axoff(chi)), energy.shape).copy()
+    return cols
+
+
+class TrajectoryTable(object):
+    """Lookup table of the spectrometer positions on an energy grid"""
+
+    def __init__(self, energy, columns, params):
+        """
+        Parameters
+        ----------
+        energy : 1D array
+            energy grid (eV), strictly increasing
+        columns : dict of 1D arrays
+            positions on the energy grid, see trajectory_columns()
+        params : dict
+            spectrometer parameters, see TRAJECTORY_PARAMS
+        """
+        self.energy = np.asarray(energy, dtype=float)
+        if (self.energy.ndim != 1) or (np.diff(self.energy) <= 0).any():
+            raise ValueError("the energy grid must be 1D and strictly increasing")
+        self.columns = {key: np.asarray(val, dtype=float) for key, val in columns.items()}
+        self.params = trajectory_params(**params)
+        self.key = trajectory_key(self.energy[0], self.energy[-1], len(self.energy), **self.params)
+        self._splines = {}
+        self._errors = {}
+
+    @classmethod
+    def build(cls, emin, emax, npts=1001, **params):
+        """evaluate the geometry on a regular energy grid
+
+        Parameters
+        ----------
+        emin, emax : float
+            energy range (eV)
+        npts : int
+            number of points of the grid [1001]
+        **params : spectrometer parameters, see TRAJECTORY_PARAMS
+        """
+        energy = np.linspace(emin, emax, int(npts))
+        return cls(energy, trajectory_columns(energy, **params), params)
+
+    def __len__(self):
+        return len(self.energy)
+
+    def _interp(self, energy, kind, energy_grid=None, columns=None):
+        """interpolate the columns at energy (no range check)"""
+        if columns is None:
+            columns = list(self.columns)
+        if energy_grid is None:
+            energy_grid = self.energy
+            sl = slice(None)
+        else:
+            sl = slice(None, None, 2)
+        if kind == "linear":
+            return {key: np.interp(energy, energy_grid, self.columns[key][sl]) for key in columns}
+        if kind == "cubic":
+            from scipy.interpolate import CubicSpline
+
+            skey = (energy_grid is self.energy, tuple(columns))
+            if skey not in self._splines:
+                values = np.stack([self.columns[key][sl] for key in columns], axis=-1)
+                self._splines[skey] = CubicSpline(energy_grid, values, axis=0)
+            values = self._splines[skey](energy)
+            return {key: values[..., icol] for icol, key in enumerate(columns)}
+        raise NameError("interpolation kind is 'cubic' or 'linear'")
+
+    def error_bound(self, kind="cubic"):
+        """estimated maximum interpolation error of each column
+
+        The table is interpolated on a grid twice coarser (every second
+        point) and compared with the left-out points; the error of the
+        full grid is lower than this estimate (error ~ h^4 for cubic,
+        h^2 for linear).
+
+        Returns
+        -------
+        dict of floats, same units of the columns
+        """
+        if kind not in self._errors:
+            if len(self.energy) < 5:
+                raise ValueError("at least 5 energy points are required")
+            coarse = self.energy[::2]
+            test = self.energy[1:-1:2]
+            values = self._interp(test, kind, energy_grid=coarse)
+            self._errors[kind] = {key: float(np.max(np.abs(values[key] - self.columns[key][1:-1:2])))
+                                  for key in self.columns}
+        return self._errors[kind]
+
+    def interp(self, energy, kind="cubic", columns=None, retErr=False):
+        """positions at the given energies
+
+        Parameters
+        ----------
+        energy : float or array
+            energies (eV) within the table range
+        kind : str
+            'cubic' or 'linear' ['cubic']
+        columns : list of str, None
+            columns to interpolate [None -> all]
+        retErr : boolean
+            return also the error bound of each column, see error_bound() [False]
+
+        Returns
+        -------
+        dict of arrays (, dict of floats)
+        """
+        energy = np.asarray(energy, dtype=float)
+        if (energy.min() < self.energy[0]) or (energy.max() > self.energy[-1]):
+            raise ValueError("energy out of the table range [{0}, {1}] eV".format(self.energy[0], self.energy[-1]))
+        if columns is None:
+            columns = list(self.columns)
+        out = self._interp(energy, kind, columns=list(columns))
+        if retErr:
+            err = self.error_bound(kind)
+            return out, {key: err[key] for key in columns}
+        return out
+
+    def save(self, fname):
+        """save the table to .npz (one table per file) or HDF5 (group named
+        after the table key, see trajectory_key())"""
+        params = json.dumps(self.params, sort_keys=True)
+        if os.path.splitext(fname)[1].lower() in _HDF5_EXTS:
+            import h5py
+
+            with h5py.File(fname, "a") as h5:
+                if self.key in h5:
+                    del h5[self.key]
+                grp = h5.create_group(self.key)
+                grp.attrs["params"] = params
+                grp.create_dataset("energy", data=self.energy)
+                for key, val in self.columns.items():
+                    grp.create_dataset(key, data=val)
+        else:
+            np.savez(fname, energy=self.energy, params=np.array(params), **self.columns)
+
+    @classmethod
+    def load(cls, fname, key=None):
+        """load a table saved with save()
+
+        Parameters
+        ----------
+        fname : str
+            .npz or HDF5 file name
+        key : str, None
+            HDF5 group name, see trajectory_key() [None -> the only table in the file]
+        """
+        if os.path.splitext(fname)[1].lower() in _HDF5_EXTS:
+            import h5py
+
+            with h5py.File(fname, "r") as h5:
+                if key is None:
+                    if len(h5) != 1:
+                        raise KeyError("{0} contains {1} tables, give the key".format(fname, len(h5)))
+                    key = list(h5)[0]
+                grp = h5[key]
+                data = {name: grp[name][()] for name in grp}
+                params = grp.attrs["params"]
+        else:
+            with np.load(fname) as npz:
+                data = {name: npz[name] for name in npz.files}
+            params = str(data.pop("params"))
+        energy = data.pop("energy")
+        return cls(energy, data, json.loads(params))
+
+    def export_txt(self, fname, columns=None, energy=None, kind="cubic", fmt="%.6f", delimiter=" ", header=True):
+        """export the table as plain text columns (energy first), as read
+        by motion controllers (e.g. position tables for continuous scans)
+
+        Parameters
+        ----------
+        fname : str
+            output file name
+        columns : list of str, None
+            columns to export [None -> all]
+        energy : array, None
+            energies where to interpolate the table [None -> table grid]
+        kind : str
+            interpolation kind, see interp() ['cubic']
+        fmt, delimiter : see numpy.savetxt()
+        header : boolean
+            write the columns names in a first line starting with '#' [True]
+        """
+        if columns is None:
+            columns = list(self.columns)
+        if energy is None:
+            energy = self.energy
+            values = self.columns
+        else:
+            energy = np.asarray(energy, dtype=float)
+            values = self.interp(energy, kind=kind, columns=columns)
+        data = np.column_stack([energy] + [values[key] for key in columns])
+        head = delimiter.join(["energy"] + list(columns)) if header else ""
+        np.savetxt(fname, data, fmt=fmt, delimiter=delimiter, header=head)
+
+
+def trajectory_table(emin, emax, npts=1001, cache_dir=TRAJECTORY_DIR, rebuild=False, **params):
+    """Trajectory table (cached in `cache_dir`, file named after the table key)
+
+    Parameters
+    ----------
+    emin, emax, npts : energy grid, see TrajectoryTable.build()
+    cache_dir : str, None
+        directory of the .npz cache files [TRAJECTORY_DIR], None: no cache
+    rebuild : boolean
+        force the evaluation of the geometry [False]
+    **params : spectrometer parameters, see TRAJECTORY_PARAMS
+
+    Returns
+    -------
+    TrajectoryTable
+    """
+    if cache_dir is None:
+        return TrajectoryTable.build(emin, emax, npts=npts, **params)
+    key = trajectory_key(emin, emax, npts, **params)
+    cache_file = os.path.join(cache_dir, "{0}.npz".format(key))
+    if (not rebuild) and os.path.isfile(cache_file):
+        try:
+            return TrajectoryTable.load(cache_file)
+        except Exception:
+            _logger.warning(f"cannot read {cache_file}")
+    table = TrajectoryTable.build(emin, emax, npts=npts, **params)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        table.save(cache_file)
+    except Exception:
+        _logger.warning(f"cannot write {cache_file}")
+    return table
+
+
+def reflection_trajectories(crystal="all", thetamin=35.0, thetamax=85.0, npts=1001, hkl_max=HKL_MAX, **params):
+    """Trajectory tables for all the reflections of a set of crystals
+
+    The energy grid of each reflection covers the Bragg angle range
+    [thetamin, thetamax].
+
+    Parameters
+    ----------
+    crystal : str or list of str
+        crystal(s) known by :func:`sloth.utils.bragg.hkl_table`, 'all' -> ['Si', 'Ge'] ['all']
+    thetamin, thetamax : float
+        Bragg angle range (deg) [35, 85]
+    npts : int
+        number of points of each energy grid [1001]
+    hkl_max : int
+        see :func:`sloth.utils.bragg.hkl_table`
+    **params : spectrometer parameters but d, see TRAJECTORY_PARAMS
+
+    Returns
+    -------
+    dict
+        reflection label (e.g. 'Si(4,4,4)') -> TrajectoryTable
+    """
+    if crystal == "all":
+        crystal = ["Si", "Ge"]
+    elif isinstance(crystal, str):
+        crystal = [crystal]
+    tables = {}
+    for crys in crystal:
+        tab = hkl_table(crys, hkl_max=hkl_max)
+        emins = bragg_ev(thetamax, tab["d"])
+        emaxs = bragg_ev(thetamin, tab["d"])
+        for label, d, emin, emax in zip(tab["crys_lab"], tab["d"], emins, emaxs):
+            tables[str(label)] = TrajectoryTable.build(emin, emax, npts=npts, d=d, **params)
+    _logger.info("%d trajectory tables", len(tables))
+    return tables
+
+
+if __name__ == "__main__":
+    pass
@@ -7,6 +7,7 @@ Utility for reading "CANB" files at ESRF/BM30 (FAME beamline)
 import os
 import logging
 import tempfile
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import cm
 
@@ -16,13 +17,17 @@ import plotly.graph_objects as go
 from larch import Group
 from larch.io import AthenaProject
 from larch.io.specfile_reader import DataSourceSpecH5
-from larch.xafs import pre_edge, autobk
+from larch.xafs import autobk, find_e0
 
+from sloth.math.normalization import pre_edge_matrix
 from sloth.utils.strings import str2rng
 from sloth.utils.matplotlib import get_colors
 
 def canb2athena(fname, scans=None, datadir=None, save=True, bad_channels=[], **kws):
-    '''convert ESRF-BM30 multi-element fluorescence channels Spec file (aka 'canb') to an Athena project''' 
+    '''convert ESRF-BM30 multi-element fluorescence channels Spec file (aka 'canb') to an Athena project
+
+    all channels of a scan are normalized at once with a shared e0 (-> sloth.math.normalization.pre_edge_matrix)
+    '''
 
     sx_logger = logging.getLogger("silx")
     sx_logger.setLevel(logging.ERROR)
@@ -74,7 +79,8 @@ def canb2athena(fname, scans=None, datadir=None, save=True, bad_channels=[], **k
 
         ene = d.get_array("Energy") * 1000
         norm = d.get_array("I0")
-            
+
+        cnts, mus = [], []
         for cnt in d.get_counters():
             if 't' in cnt:
                 continue
@@ -86,16 +92,36 @@ def canb2athena(fname, scans=None, datadir=None, save=True, bad_channels=[], **k
                 continue
 
             mu = d.get_array(cnt) / norm
-            g = Group(id=f"{scan_label}_{cnt}", datatype='xas', energy=ene, mu=mu, i0=norm, scan_idx=iscan, scan_no=scan_no)
-            try:
-                pre_edge(g)
-                #autobk(g) #slow
-                apj.add_group(g)
-                apj.info['cnts'].append(cnt)
-            except:
+            if not np.all(np.isfinite(mu)):
                 #print(f"skipped {cnt} (-> bad_channels)")
                 bad_channels.append(cnt)
-                pass
+                continue
+            cnts.append(cnt)
+            mus.append(mu)
+
+        if len(cnts) == 0:
+            continue
+
+        #normalize all channels at once on the shared energy grid
+        mus = np.array(mus)
+        try:
+            e0 = find_e0(ene, mus.sum(axis=0))
+            pre = pre_edge_matrix(ene, mus, e0=e0)
+        except Exception:
+            #print(f"skipped scan {scan_no} (-> pre_edge failed)")
+            bad_channels.extend(cnts)
+            continue
+
+        for icnt, cnt in enumerate(cnts):
+            g = Group(id=f"{scan_label}_{cnt}", datatype='xas', energy=ene, mu=mus[icnt], i0=norm, scan_idx=iscan, scan_no=scan_no)
+            g.e0 = pre['e0']
+            g.edge_step = pre['edge_step'][icnt]
+            for attr in ('norm', 'flat', 'pre_edge', 'post_edge'):
+                setattr(g, attr, pre[attr][icnt])
+            g.pre_edge_details = Group(**{attr: pre[attr] for attr in ('pre1', 'pre2', 'norm1', 'norm2', 'nnorm', 'nvict', 'npre')})
+            #autobk(g) #slow
+            apj.add_group(g)
+            apj.info['cnts'].append(cnt)
               
     if save:
         apj.save()
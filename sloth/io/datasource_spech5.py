@@ -32,6 +32,7 @@ from larch import Group
 from larch.utils.strutils import bytes2str
 from larch.math.normalization import norm1D
 from larch.math.deglitch import remove_spikes_medfilt1d
+from sloth.math.normalization import norm1D_stack
 
 #: Python 3.8+ compatibility
 try:
@@ -896,7 +897,13 @@ class DataSourceSpecH5(object):
         signals : tuple or list of str
             names of the signals (=counters)
         **kws :
-            keyword arguments passed to self.get_signal_data()
+            keyword arguments passed to self.get_signal_data(), the
+            normalization ("norm") is applied to all signals at once,
+            with the same result of self.get_signal_data() for each
+            signal; "edge-step" uses the axis data as x, while the other
+            methods use unit spacing as norm1D; the other keys of the
+            "norm" dictionary are passed to norm1D_stack (e.g. "e0" for
+            "edge-step")
 
         Returns
         -------
@@ -906,10 +913,31 @@ class DataSourceSpecH5(object):
                 ...
             ]
         """
+        norm = kws.pop("norm", None)
         curves = []
         for signal in signals:
             curve = self.get_curve(signal, **kws)
             curves.append(curve)
+        if (norm is None) or (norm["method"] is None) or (len(curves) == 0):
+            return curves
+        #: (opt) normalization of all signals at once
+        norm_meth = norm["method"]
+        norm_kws = {key: val for key, val in norm.items() if key != "method"}
+        if norm_meth == "edge-step":
+            norm_kws["x"] = np.array([curve[0] for curve in curves])
+        sigs_data, _ = norm1D_stack(
+            np.array([curve[1] for curve in curves]),
+            norm=norm_meth,
+            logger=self._logger,
+            **norm_kws,
+        )
+        for curve, sig_data in zip(curves, sigs_data):
+            attrs = curve[3]
+            attrs["sig_label"] += f"_norm({norm_meth})"
+            attrs["ylabel"] = attrs["sig_label"]
+            attrs["label"] = f"S{self._scan_n}_X({attrs['ax_label']})_Y{attrs['sig_label']}"
+            curve[1] = sig_data
+            curve[2] = attrs["label"]
         return curves
 
     def get_stack(self, *args, **kwargs):
@@ -30,6 +30,7 @@ __license__ = 'MIT'
 __date__ = '04/10/2017'
 
 import numpy as np
+from scipy.fft import next_fast_len
 
 MIN_KERNEL_SUM = 1e-8
 
@@ -62,65 +63,138 @@ def gaussian_kernel2d(sigma=None, truncate=(6, 6)):
     return kernel
 
 
-def convolve_fft(array, kernel):
+#: cache of the Gaussian kernel spectra (-> gaussian_kernel_rfft)
+_KERNEL_RFFT_CACHE = {}
+_KERNEL_RFFT_CACHE_SIZE = 32
+
+
+def _fft_shape(array_shape, kernel_shape):
+    """Padded FFT shape for a linear (not circular) convolution."""
+    return tuple(next_fast_len(n + k - 1, real=True)
+                 for (n, k) in zip(array_shape, kernel_shape))
+
+
+def kernel_rfft(kernel, fft_shape):
+    """Real FFT of a kernel, centered at the origin of a `fft_shape` grid."""
+    kernel = np.asarray(kernel, dtype=float)
+    big_kernel = np.zeros(fft_shape)
+    big_kernel[tuple(slice(0, k) for k in kernel.shape)] = kernel
+    shifts = tuple(-(k // 2) for k in kernel.shape)
+    big_kernel = np.roll(big_kernel, shifts, axis=tuple(range(kernel.ndim)))
+    return np.fft.rfftn(big_kernel)
+
+
+def gaussian_kernel_rfft(sigma, fft_shape, truncate=6):
+    """Cached real FFT of a Gaussian kernel (sigma in pixels, one per axis)."""
+    sigma = tuple(float(sig) for sig in np.atleast_1d(sigma))
+    key = (sigma, tuple(fft_shape), truncate)
+    try:
+        return _KERNEL_RFFT_CACHE[key]
+    except KeyError:
+        pass
+    if len(sigma) == 1:
+        kernel = gaussian_kernel1d(sigma[0], truncate)
+    else:
+        kernel = gaussian_kernel2d(np.array(sigma), (truncate, truncate))
+    kernel_fft = kernel_rfft(kernel, fft_shape)
+    if len(_KERNEL_RFFT_CACHE) >= _KERNEL_RFFT_CACHE_SIZE:
+        _KERNEL_RFFT_CACHE.pop(next(iter(_KERNEL_RFFT_CACHE)))
+    _KERNEL_RFFT_CACHE[key] = kernel_fft
+    return kernel_fft
+
+
+def _gaussian_kernel_shape(sigma, truncate=6):
+    """Shape of the kernel given by gaussian_kernel1d/2d."""
+    shape = []
+    for sig in np.atleast_1d(sigma)[::-1]:
+        size = int(2 * truncate * sig)
+        shape.append(size + 1 if size % 2 == 0 else size)
+    return tuple(shape)
+
+
+def _move_axes(array, axes):
+    """Move the convolution axes at the end, returns the inverse permutation."""
+    axes = tuple(ax % array.ndim for ax in axes)
+    others = tuple(ax for ax in range(array.ndim) if ax not in axes)
+    order = others + axes
+    return np.transpose(array, order), np.argsort(order)
+
+
+def convolve_fft(array, kernel, axes=None, kernel_fft=None):
     """
-    Convolve an array with a kernel using FFT.
+    Convolve an array with a kernel using real FFTs.
     Implemntation based on the convolve_fft function from astropy.
 
     https://github.com/astropy/astropy/blob/master/astropy/convolution/convolve.py
+
+    The array is zero-padded to fast FFT lengths and the output has the
+    same shape of the input. If the array has more dimensions than the
+    kernel, the convolution is done along `axes` for all the other
+    dimensions at once (e.g. a stack of RIXS planes).
+
+    Parameters
+    ----------
+    array : N-D array
+    kernel : M-D array (M <= N), or the shape of the kernel if `kernel_fft`
+             is given
+    axes : tuple of M ints or None, axes of `array` to convolve
+           [None -> the last M axes]
+    kernel_fft : array or None, precomputed `kernel_rfft(kernel, fft_shape)`
     """
 
-    array = np.asarray(array, dtype=np.complex)
-    kernel = np.asarray(kernel, dtype=np.complex)
-
-    if array.ndim != kernel.ndim:
-        raise ValueError("Image and kernel must have same number of "
-                         "dimensions")
-
-    array_shape = array.shape
-    kernel_shape = kernel.shape
-    new_shape = np.array(array_shape) + np.array(kernel_shape)
-
-    array_slices = []
-    kernel_slices = []
-    for (new_dimsize, array_dimsize, kernel_dimsize) in zip(
-            new_shape, array_shape, kernel_shape):
-        center = new_dimsize - (new_dimsize + 1) // 2
-        array_slices += [slice(center - array_dimsize // 2,
-                         center + (array_dimsize + 1) // 2)]
-        kernel_slices += [slice(center - kernel_dimsize // 2,
-                          center + (kernel_dimsize + 1) // 2)]
-
-    if not np.all(new_shape == array_shape):
-        big_array = np.zeros(new_shape, dtype=np.complex)
-        big_array[array_slices] = array
-    else:
-        big_array = array
+    array = np.asarray(array, dtype=float)
+    kernel_shape = np.shape(kernel) if kernel_fft is None else tuple(kernel)
 
-    if not np.all(new_shape == kernel_shape):
-        big_kernel = np.zeros(new_shape, dtype=np.complex)
-        big_kernel[kernel_slices] = kernel
-    else:
-        big_kernel = kernel
+    if array.ndim < len(kernel_shape):
+        raise ValueError("Image must have at least the number of dimensions "
+                         "of the kernel")
+    if axes is None:
+        axes = tuple(range(array.ndim - len(kernel_shape), array.ndim))
+    if len(axes) != len(kernel_shape):
+        raise ValueError("Kernel must have one dimension per axis")
 
-    array_fft = np.fft.fftn(big_array)
-    kernel_fft = np.fft.fftn(np.fft.ifftshift(big_kernel))
+    array, inverse = _move_axes(array, axes)
+    array_shape = array.shape[-len(kernel_shape):]
+    fft_shape = _fft_shape(array_shape, kernel_shape)
+    if kernel_fft is None:
+        kernel_fft = kernel_rfft(kernel, fft_shape)
 
-    rifft = np.fft.ifftn(array_fft * kernel_fft)
+    fft_axes = tuple(range(-len(kernel_shape), 0))
+    array_fft = np.fft.rfftn(array, s=fft_shape, axes=fft_axes)
+    array_fft *= kernel_fft
+    rifft = np.fft.irfftn(array_fft, s=fft_shape, axes=fft_axes)
 
-    return rifft[array_slices].real
+    rifft = rifft[(Ellipsis,) + tuple(slice(0, n) for n in array_shape)]
+    return np.transpose(rifft, inverse)
 
 
-def broaden(array, fwhm=None, kind='gaussian'):
-    fwhm = np.array(fwhm)
+def broaden(array, fwhm=None, kind='gaussian', spacing=1, axes=None):
+    """
+    Broaden 1D/2D data (or a stack of them) with a Gaussian.
+
+    Parameters
+    ----------
+    array : N-D array
+    fwhm : float (1D) or 2 floats (2D, (x, y) for the last two axes)
+    spacing : float or 2 floats (x, y), step of the grid in the units of `fwhm`
+              [1 -> `fwhm` in pixels]
+    axes : tuple or None, axes to broaden (-> convolve_fft)
+    """
+    fwhm = np.array(fwhm, dtype=float)
     if kind == 'gaussian':
-        sigma = fwhm / (2 * np.sqrt(2 * np.log(2)))
+        sigma = fwhm / (2 * np.sqrt(2 * np.log(2))) / np.asarray(spacing)
         if fwhm.size == 1:
-            kernel = gaussian_kernel1d(sigma)
-        elif fwhm.size == 2:
-            kernel = gaussian_kernel2d(sigma)
+            sigma = np.atleast_1d(sigma).ravel()[:1]
+        elif fwhm.size != 2:
+            raise Exception('Only 1D and 2D broadening is available.')
     else:
         print('Unvailable type of broadening.')
         return array
 
-    return convolve_fft(array, kernel)
+    array = np.asarray(array, dtype=float)
+    kernel_shape = _gaussian_kernel_shape(sigma)
+    if axes is None:
+        axes = tuple(range(array.ndim - len(kernel_shape), array.ndim))
+    array_shape = tuple(array.shape[ax] for ax in axes)
+    kernel_fft = gaussian_kernel_rfft(sigma, _fft_shape(array_shape, kernel_shape))
+    return convolve_fft(array, kernel_shape, axes=axes, kernel_fft=kernel_fft)
@@ -6,8 +6,8 @@ Generic discrete convolution
 Description
 -----------
 
- This is a manual (not optimized!) implementation of discrete 1D
- convolution intended for spectroscopy analysis. The difference with
+ This is a manual implementation of discrete 1D convolution intended
+ for spectroscopy analysis, vectorised with (cached) sparse matrices. The difference with
  commonly used methods is the possibility to adapt the convolution
  kernel for each convolution point, e.g. change the FWHM of the
  Gaussian kernel as a function of the energy scale.
@@ -150,9 +150,194 @@ def atan_gamma(ene, gamma_hole, gamma_max=15.0, e0=0, eslope=1.0):
     return gamma_hole + gamma_max * ((np.arctan((ene - e0) / eslope) / np.pi) + 0.5)
 
 
+#: FDMNES default Fermi level (eV), used when the 'Efermi' card is not given
+FDMNES_EFERMI = -5.36
+
+#: maximum number of elements of the Lorentzian kernel block in conv_fdmnes
+_CONV_FDMNES_BLOCK = 2 ** 22
+
+
+def fdmnes_gamma(ene, gamma_hole=0.5, ecent=30.0, elarg=30.0, gamma_max=15.0, efermi=0.0):
+    """returns the arctangent broadening used by FDMNES 'Convolution' card
+
+    ..math
+
+    \Gamma(E) = \Gamma_{hole} + \Gamma_{max} * ( 1/2 + 1/\pi * \arctan( \pi/3 * \Gamma_{max}/E_{larg} * (e - 1/e^2) ) ), e = (E - E_{F})/E_{cent}
+
+    and $\Gamma_{hole}$ below the Fermi level. `efermi=None` is the
+    FDMNES default (FDMNES_EFERMI).
+
+    All parameters (but `ene`) can be arrays of the same shape: the
+    result then has shape (*param.shape, ene.size), one row per parameter set.
+    """
+    ene = np.asarray(ene, dtype=float)
+    if efermi is None:
+        efermi = FDMNES_EFERMI
+    pars = np.broadcast_arrays(*[np.asarray(par, dtype=float)[..., np.newaxis]
+                                 for par in (gamma_hole, ecent, elarg, gamma_max, efermi)])
+    gamma_hole, ecent, elarg, gamma_max, efermi = pars
+    erel = (ene - efermi) / ecent
+    with np.errstate(divide="ignore", invalid="ignore"):
+        arg = np.pi / 3 * gamma_max / elarg * (erel - 1.0 / erel ** 2)
+        gamma = gamma_hole + gamma_max * (0.5 + np.arctan(arg) / np.pi)
+    return np.where(erel > 0, gamma, gamma_hole + 0 * gamma_max)
+
+
 def conv(e, mu, kernel="gaussian", fwhm_e=None, efermi=None):
     """ linear broadening
 
+    Parameters
+    ----------
+    e : x-axis (energy)
+    mu : f(x) to convolve with g(x) kernel, mu(energy), or a 2D array
+         (nspectra, len(e)) to convolve many spectra at once
+    kernel : convolution kernel, g(x)
+             'gaussian'
+             'lorentzian'
+             'pvoigt' (-> 50% 'gaussian' + 50% 'lorentzian')
+    fwhm_e: the full width half maximum in eV for the kernel
+            broadening. It is an array of size 'e' with constants or
+            an energy-dependent values determined by a function as
+            'lin_gamma()' or 'atan_gamma()'
+    """
+    if e.shape != fwhm_e.shape:
+        print("Error: 'fwhm_e' does not have the same shape of 'e'")
+        return 0
+    return conv_sparse(e, mu, kernel=kernel, fwhm_e=fwhm_e, efermi=efermi)
+
+
+#: cache of the convolution matrices (-> conv_matrix)
+_CONV_MATRIX_CACHE = {}
+_CONV_MATRIX_CACHE_SIZE = 16
+
+
+def _conv_kernel(kx, cen, hwhm, kernel="gaussian", eta=0.5):
+    """kernel values (not normalized) for the variable-width convolution
+
+    Returns
+    -------
+    list of (weight, values) pairs, each part is normalized separately
+    and the kernel is the weighted sum, e.g. 'pvoigt' ->
+    eta * L / sum(L) + (1 - eta) * G / sum(G)
+    """
+    kname = kernel.lower()
+    if "voigt" in kname:
+        return [(eta, lorentzian(kx, cen=cen, gamma=hwhm, peak=1.0)),
+                (1 - eta, gaussian(kx, cen=cen, sigma=hwhm, peak=1.0))]
+    elif "gauss" in kname:
+        return [(1.0, gaussian(kx, cen=cen, sigma=hwhm))]
+    elif "lor" in kname:
+        return [(1.0, lorentzian(kx, cen=cen, gamma=hwhm))]
+    else:
+        raise ValueError("convolution kernel '{0}' not implemented".format(kernel))
+
+
+def conv_matrix(e, fwhm_e, kernel="gaussian", cutoff=1.5, eta=0.5):
+    """ banded sparse matrix of the variable-width convolution (cached)
+
+    The kernels are the same as in the original loop implementation
+    (`_conv_loop`): for each point, the kernel is sampled on an odd number
+    of points within +/- `cutoff` * fwhm_e and normalized to unit sum. The
+    part of the kernel falling above the last point is returned separately,
+    as it is applied to the linear extrapolation of the spectrum.
+
+    Parameters
+    ----------
+    e : 1D array, sorted x-axis (energy)
+    fwhm_e : 1D array, kernel FWHM at each point of `e`
+    kernel : 'gaussian', 'lorentzian' or 'pvoigt'
+    cutoff : float, kernel truncation in units of FWHM [1.5]
+    eta : float, Lorentzian fraction of the 'pvoigt' kernel [0.5]
+
+    Returns
+    -------
+    kmat : scipy.sparse.csr_matrix (len(e), len(e))
+    kext : 2D array (2, len(e)), weights applied to the slope and intercept
+           of the linear extrapolation above the last point
+    """
+    from scipy.sparse import csr_matrix
+
+    e = np.ascontiguousarray(e, dtype=float)
+    fwhm_e = np.ascontiguousarray(fwhm_e, dtype=float)
+    key = (e.tobytes(), fwhm_e.tobytes(), kernel.lower(), float(cutoff), float(eta))
+    try:
+        return _CONV_MATRIX_CACHE[key]
+    except KeyError:
+        pass
+    npts = len(e)
+    # extend upper energy border to 3*fhwm_e[-1]
+    estep = e[-1] - e[-2]
+    eup = np.append(e, np.arange(e[-1] + estep, e[-1] + 3 * fwhm_e[-1], estep))
+    # kernel ranges, as get_ene_index()
+    hw = cutoff * fwhm_e
+    eimin = np.searchsorted(eup, e - hw, side="left") - 1
+    eimin[(e - hw) <= eup[0]] = 0
+    eimax = np.searchsorted(eup, e + hw, side="right")
+    eimax[(e + hw) >= eup[-1]] = len(eup) - 1
+    lk = eimax - eimin
+    lk = np.where(lk % 2 == 0, lk + 1, lk)  # odd range centered at the convolution point
+    # flattened (row, kernel point) pairs
+    rows = np.repeat(np.arange(npts), lk)
+    ik = np.arange(rows.size) - np.repeat(np.cumsum(lk) - lk, lk)
+    cols = rows - np.repeat(lk // 2, lk) + ik
+    parts = _conv_kernel(eup[eimin[rows] + ik], e[rows], fwhm_e[rows] / 2.0,
+                         kernel=kernel, eta=eta)
+    vals = np.zeros(rows.size)
+    for weight, part in parts:
+        if weight != 0:
+            vals += weight * part / np.bincount(rows, weights=part, minlength=npts)[rows]
+    vals /= np.bincount(rows, weights=vals, minlength=npts)[rows]  #: unit sum per row
+    # drop the points below the first one, extrapolate above the last one
+    inside = (cols >= 0) & (cols < npts)
+    kmat = csr_matrix((vals[inside], (rows[inside], cols[inside])), shape=(npts, npts))
+    above = cols >= npts
+    cext = cols[above]
+    xext = np.where(cext < len(eup), eup[np.minimum(cext, len(eup) - 1)],
+                    eup[-1] + (cext - len(eup) + 1) * estep)
+    kext = np.array([np.bincount(rows[above], weights=vals[above] * xext, minlength=npts),
+                     np.bincount(rows[above], weights=vals[above], minlength=npts)])
+    if len(_CONV_MATRIX_CACHE) >= _CONV_MATRIX_CACHE_SIZE:
+        _CONV_MATRIX_CACHE.pop(next(iter(_CONV_MATRIX_CACHE)))
+    _CONV_MATRIX_CACHE[key] = (kmat, kext)
+    return kmat, kext
+
+
+def conv_sparse(e, mu, kernel="gaussian", fwhm_e=None, efermi=None, cutoff=1.5, eta=0.5):
+    """ linear broadening with a (cached) sparse convolution matrix
+
+    Vectorised equivalent of the original loop implementation (`_conv_loop`),
+    for one spectrum or a batch of spectra sharing the same x-axis
+
+    Parameters
+    ----------
+    e : 1D array, x-axis (energy)
+    mu : 1D array (len(e)) or 2D array (nspectra, len(e))
+    kernel, cutoff, eta : -> conv_matrix
+    fwhm_e : 1D array, kernel FWHM at each point of `e`
+    efermi : float or None, `mu` is set to zero below efermi
+
+    Returns
+    -------
+    z : array with the same shape of `mu`
+    """
+    f = np.array(mu, dtype=float)
+    if f.shape[-1] != len(e) or e.shape != fwhm_e.shape:
+        raise ValueError("'mu' and 'fwhm_e' must have the shape of 'e' on the last axis")
+    if efermi is not None:
+        ief = np.argmin(np.abs(e - efermi))
+        f[..., 0:ief] *= 0
+    kmat, kext = conv_matrix(e, fwhm_e, kernel=kernel, cutoff=cutoff, eta=eta)
+    # linear fit of the upper part of the spectrum to avoid border effects
+    lpf = int(len(e) / 2)
+    vander = np.vstack((e[-lpf:], np.ones(lpf))).T
+    cpf = np.linalg.lstsq(vander, f.reshape(-1, len(e))[:, -lpf:].T, rcond=None)[0]
+    z = (kmat @ f.reshape(-1, len(e)).T) + kext.T.dot(cpf)
+    return z.T.reshape(f.shape)
+
+
+def _conv_loop(e, mu, kernel="gaussian", fwhm_e=None, efermi=None):
+    """ linear broadening (reference pure-Python loop, slow -> use conv)
+
     Parameters
     ----------
     e : x-axis (energy)
@@ -221,6 +406,97 @@ def glinbroad(e, mu, fwhm_e=None, efermi=None, _larch=None):
 
 glinbroad.__doc__ = conv.__doc__
 
+
+def _bin_edges(e):
+    """edges of the bins centered at the points of a (sorted) grid"""
+    mid = 0.5 * (e[1:] + e[:-1])
+    return np.concatenate(([e[0] - (mid[0] - e[0])], mid, [e[-1] + (e[-1] - mid[-1])]))
+
+
+def conv_fdmnes(e, mu, gamma_hole=0.5, ecent=30.0, elarg=30.0, gamma_max=15.0,
+                efermi=FDMNES_EFERMI, gaussian=0.9, gamma_type="Gamma_fix", fwhm_e=None,
+                chunk=32):
+    """in-process version of the FDMNES convolution (no external run)
+
+    The absorption below the Fermi level is cut, the spectrum is broadened
+    by a Lorentzian of energy-dependent FWHM, $\Gamma(E)$, and then
+    convolved with a Gaussian for the experimental resolution. As in
+    FDMNES, the kernels are integrated over the bins of the energy grid and
+    the spectrum is extended as a constant above its last point.
+
+    Parameters
+    ----------
+    e : 1D array, energy grid (sorted)
+    mu : 1D array, absorption on `e`
+    gamma_hole, ecent, elarg, gamma_max, efermi : floats or arrays
+        parameters of the 'Convolution' card (-> fdmnes_gamma), defaults
+        for ecent, elarg and gamma_max are those of FDMNES. If arrays,
+        they are broadcasted together and each combination is a parameter
+        set, e.g. for a grid search:
+        `gamma_max=gm[:, np.newaxis], ecent=ec[np.newaxis, :]`
+        efermi=None is the FDMNES default (FDMNES_EFERMI)
+    gaussian : float, FWHM of the experimental resolution [0.9]
+               (None or 0 -> no Gaussian convolution)
+    gamma_type : 'Gamma_fix' -> width taken at the convolution point [default]
+                 'Gamma_var' -> width taken at the broadened state
+    fwhm_e : array or None, broadening widths to use instead of
+             'fdmnes_gamma()', e.g. from 'lin_gamma()' or 'atan_gamma()',
+             with shape (e.size) or (*sets, e.size)
+    chunk : int, number of parameter sets convolved at once [32], the
+            Lorentzian kernels are computed in blocks of rows bounded to
+            _CONV_FDMNES_BLOCK elements
+
+    Returns
+    -------
+    mu_conv : array of shape (*sets, e.size), (e.size) for scalar parameters
+    """
+    e = np.asarray(e, dtype=float)
+    f = np.asarray(mu, dtype=float)
+    if e.shape != f.shape:
+        raise ValueError("'mu' does not have the same shape of 'e'")
+    if gamma_type not in ("Gamma_fix", "Gamma_var"):
+        raise ValueError('gamma_type="Gamma_fix"/"Gamma_var"')
+    if efermi is None:
+        efermi = FDMNES_EFERMI
+    if fwhm_e is None:
+        fwhm_e = fdmnes_gamma(e, gamma_hole=gamma_hole, ecent=ecent, elarg=elarg,
+                              gamma_max=gamma_max, efermi=efermi)
+    fwhm_e = np.asarray(fwhm_e, dtype=float)
+    efermi = np.broadcast_to(np.asarray(efermi, dtype=float), fwhm_e.shape[:-1])
+    outshape = np.broadcast_shapes(fwhm_e.shape, efermi.shape + (e.size,))
+    widths = np.broadcast_to(fwhm_e, outshape).reshape(-1, e.size)
+    efermi = np.broadcast_to(efermi, outshape[:-1]).reshape(-1, 1)
+    # distances (convolution point, state) to the bin edges of the states
+    edges = _bin_edges(e)
+    edges[-1] = np.inf
+    dlow = edges[np.newaxis, :-1] - e[:, np.newaxis]
+    dhigh = edges[np.newaxis, 1:] - e[:, np.newaxis]
+    if gaussian:
+        from scipy.special import erf
+
+        sig2 = math.sqrt(2) * gaussian / (2 * math.sqrt(2 * math.log(2)))
+        gkern = 0.5 * (erf(dhigh / sig2) - erf(dlow / sig2))
+        gkern /= gkern.sum(axis=1)[:, np.newaxis]
+    out = np.empty_like(widths)
+    for i0 in range(0, widths.shape[0], chunk):
+        hws = 0.5 * widths[i0:i0 + chunk]
+        fs = np.where(e < efermi[i0:i0 + chunk], 0, f)
+        zs = np.empty_like(fs)
+        nrow = max(1, _CONV_FDMNES_BLOCK // (hws.shape[0] * e.size))
+        for j0 in range(0, e.size, nrow):
+            rows = slice(j0, j0 + nrow)
+            if gamma_type == "Gamma_fix":
+                hw = hws[:, rows, np.newaxis]
+            else:
+                hw = hws[:, np.newaxis, :]
+            lkern = (np.arctan(dhigh[rows] / hw) - np.arctan(dlow[rows] / hw)) / np.pi
+            zs[:, rows] = np.einsum("kij,kj->ki", lkern, fs)
+        if gaussian:
+            zs = zs.dot(gkern.T)
+        out[i0:i0 + chunk] = zs
+    return out.reshape(outshape)
+
+
 # CONVOLUTION WITH FDMNES VIA SYSTEM CALL #
 
 
@@ -382,6 +658,43 @@ ${gauss_sel}${gaussian} !Gaussian conv for experimental res\n\
         except OSError:
             print("check 'fdmnes' executable exists!")
 
+    def _optfloat(self, opt, default):
+        """float value of an option, default if disabled ('!')"""
+        if self.opts.get("{0}_sel".format(opt)) == "!" or self.opts[opt] == "!":
+            return default
+        return float(self.opts[opt])
+
+    def convolve(self, data=None, **pars):
+        """ runs the convolution in-process (-> conv_fdmnes), without fdmnes
+
+        Parameters
+        ----------
+        data : 2D array or None, energy in the first column, absorption
+               in the others [None -> loaded from opts['fn_in']]
+        **pars : overwrite the parameters taken from the options, they may
+                 be arrays for batches of parameter sets (-> conv_fdmnes)
+
+        Returns
+        -------
+        ene : 1D array
+        mu_conv : array of shape (ncols, *sets, ene.size)
+        """
+        if data is None:
+            data = np.loadtxt(self.opts["fn_in"])
+        data = np.asarray(data, dtype=float)
+        kws = dict(gamma_hole=self._optfloat("hole", 0.0),
+                   efermi=self._optfloat("efermi", FDMNES_EFERMI),
+                   gaussian=self._optfloat("gaussian", None),
+                   gamma_type=self.opts["gamma_type"])
+        if self.opts["conv_sel"] != "!":
+            kws.update(ecent=float(self.opts["ecent"]),
+                       elarg=float(self.opts["elarg"]),
+                       gamma_max=float(self.opts["gamma_max"]))
+        kws.update(pars)
+        ene = data[:, 0]
+        mu_conv = np.array([conv_fdmnes(ene, mu, **kws) for mu in data[:, 1:].T])
+        return ene, mu_conv
+
 
 # LARCH PLUGIN #
 
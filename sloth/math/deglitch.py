@@ -24,7 +24,7 @@ def remove_spikes_medfilt1d(y_spiky, backend="silx", kernel_size=3, threshold=0.
         library to use as backend
         - 'silx' -> from silx.math.medianfilter import medfilt1d
         - 'pymca' -> from PyMca5.PyMcaMath.PyMcaSciPy.signal import medfilt1d
-        - 'pandas' : TODO
+        - 'pandas' -> rolling median from pandas
 
     kernel_size : int, optional
         kernel size where to calculate median, must be odd [3]
@@ -125,9 +125,7 @@ def remove_spikes_pandas(y, window=3, threshold=3):
 
     Taken from `https://ocefpaf.github.io/python4oceanographers/blog/2015/03/16/outlier_detection/`_
 
-    .. note:: this will not work in pandas > 0.17 one could simply do
-              `df.rolling(3, center=True).median()`; also
-              df.as_matrix() is deprecated, use df.values instead
+    .. note:: uses `df.rolling(window, center=True).median()` (pandas > 0.17)
 
     Parameters
     ----------
@@ -148,30 +146,78 @@ def remove_spikes_pandas(y, window=3, threshold=3):
         _logger.error("pandas not found! -> returning zeros")
         return ynew
     df = pd.DataFrame(y)
-    try:
-        yf = (
-            pd.rolling_median(df, window=window, center=True)
-            .fillna(method="bfill")
-            .fillna(method="ffill")
-        )
-        diff = yf.as_matrix() - y
-        mean = diff.mean()
-        sigma = (y - mean) ** 2
-        sigma = np.sqrt(sigma.sum() / float(len(sigma)))
-        ynew = np.where(abs(diff) > threshold * sigma, yf.as_matrix(), y)
-    except Exception:
-        yf = (
-            df.rolling(window, center=True)
-            .median()
-            .fillna(method="bfill")
-            .fillna(method="ffill")
-        )
-
-        diff = yf.values - y
-        mean = diff.mean()
-        sigma = (y - mean) ** 2
-        sigma = np.sqrt(sigma.sum() / float(len(sigma)))
-        ynew = np.where(abs(diff) > threshold * sigma, yf.values, y)
-
-        # ynew = np.array(yf.values).reshape(len(x))
+    yf = df.rolling(window, center=True).median().bfill().ffill()
+    yf = yf.values.reshape(np.shape(y))
+    diff = yf - y
+    mean = diff.mean()
+    sigma = (y - mean) ** 2
+    sigma = np.sqrt(sigma.sum() / float(len(sigma)))
+    ynew = np.where(abs(diff) > threshold * sigma, yf, y)
     return ynew
+
+
+#: scale factor from the median absolute deviation to sigma (normal distribution)
+MAD2SIGMA = 1.4826
+
+
+def remove_spikes_stack(ys, kernel_size=5, threshold=6.0, mode="rolling", axis=-1):
+    """Remove spikes in a stack of spectra with one vectorised call
+
+    Parameters
+    ----------
+    ys : array 2D (nspectra, npts)
+        spiky data, one spectrum per row (or along `axis`)
+
+    kernel_size : int, optional
+        window of the rolling median/MAD along the energy axis, must be odd [5]
+
+    threshold : float, optional
+        deviation from the median flagged as glitch, in robust sigma units
+        (MAD * 1.4826) [6.0]; in 'rolling' mode, the noise sigma of each
+        spectrum is estimated from the MAD of its first differences
+        (divided by sqrt(2)), as the MAD over the few points of the window
+        underestimates it
+
+    mode : str, optional
+        - 'rolling' -> deviation from the rolling median of each spectrum
+        - 'repeats' -> deviation from the median of the repeated scans
+          at each point (the rows must share the same energy grid)
+
+    axis : int, optional
+        energy axis [-1]
+
+    Returns
+    -------
+    ynew : array like ys
+        filtered array, the glitches replaced by the median
+    mask : boolean array like ys
+        True where a glitch was found
+    """
+    ys = np.asarray(ys, dtype=float)
+    if not (kernel_size % 2):
+        kernel_size += 1
+        _logger.warning("'kernel_size' must be odd -> adjusted to %d", kernel_size)
+    ys2d = np.moveaxis(ys, axis, -1).reshape(-1, ys.shape[axis])
+    if mode == "rolling":
+        from scipy.ndimage import median_filter
+
+        y_filtered = median_filter(ys2d, size=(1, kernel_size), mode="nearest")
+        absdev = np.abs(ys2d - y_filtered)
+        dys = np.diff(ys2d, axis=1)
+        sigma = np.median(np.abs(dys - np.median(dys, axis=1, keepdims=True)), axis=1, keepdims=True)
+        sigma = sigma / np.sqrt(2)
+        sigma_floor = np.finfo(float).tiny
+    elif mode == "repeats":
+        y_filtered = np.broadcast_to(np.median(ys2d, axis=0), ys2d.shape)
+        absdev = np.abs(ys2d - y_filtered)
+        sigma = np.median(absdev, axis=0, keepdims=True)
+        sigma_floor = np.median(sigma)
+    else:
+        raise ValueError("mode must be 'rolling' or 'repeats'")
+    sigma = MAD2SIGMA * np.maximum(sigma, sigma_floor)
+    mask = absdev > threshold * sigma
+    ynew = np.where(mask, y_filtered, ys2d)
+    shape = np.moveaxis(ys, axis, -1).shape
+    ynew = np.moveaxis(ynew.reshape(shape), -1, axis)
+    mask = np.moveaxis(mask.reshape(shape), -1, axis)
+    return ynew, mask
@@ -126,6 +126,38 @@ def point_on_plane_projection(point, plane, test=False):
         assert (norm.dot(proj_pt) + d <= epsilon)
     return proj_pt
 
+##############################################
+### VECTORISED FUNCTIONS (POINT CLOUDS N,3) ###
+##############################################
+
+def lengths(v):
+    """Lengths of an array of vectors (..., 3)"""
+    return np.sqrt(np.einsum('...i,...i->...', v, v))
+
+def units(v):
+    """Unit vectors in the direction of an array of vectors (..., 3)"""
+    return v / lengths(v)[..., np.newaxis]
+
+def angles_3p(p0, p1, p2):
+    """vectorised angle_3p for arrays of points (..., 3), in degrees"""
+    u, v = p1-p0, p2-p0
+    costheta = np.einsum('...i,...i->...', u, v) / (lengths(u) * lengths(v))
+    return np.degrees(np.arccos(np.clip(costheta, -1, 1)))
+
+def points_on_plane_projection(points, plane):
+    """vectorised point_on_plane_projection for an array of points (N, 3)"""
+    norm = plane[:-1]
+    d = plane[-1]
+    offset = (points.dot(norm) + d) / norm.dot(norm)
+    return points - offset[..., np.newaxis] * norm
+
+def rotate_points(points, axis, theta):
+    """rotate an array of points (N, 3) around axis by theta (radians),
+    one angle or one angle per point (-> sloth.math.rotmatrix)"""
+    from sloth.math.rotmatrix import rotation_matrices
+    from sloth.math.rotmatrix import rotate_points as _rotate_points
+    return _rotate_points(points, rotation_matrices(axis, theta))
+
 
 if __name__ == '__main__':
     pass
@@ -15,6 +15,133 @@ _logger = getLogger('gridxyz')
 MODNAME = '_math'
 
 
+#: cache of the Delaunay triangulations, keyed by a hash of the XY coordinates
+_TRI_CACHE = {}
+_TRI_CACHE_SIZE = 4
+
+
+def _hash_xy(xcol, ycol):
+    """hash of the XY coordinates"""
+    import hashlib
+    hsh = hashlib.sha1(np.ascontiguousarray(xcol, dtype=float).tobytes())
+    hsh.update(np.ascontiguousarray(ycol, dtype=float).tobytes())
+    return hsh.hexdigest()
+
+
+def get_triangulation(xcol, ycol):
+    """Delaunay triangulation of the (X, Y) points, built once per point set"""
+    from scipy.spatial import Delaunay
+    key = _hash_xy(xcol, ycol)
+    try:
+        return _TRI_CACHE[key]
+    except KeyError:
+        pass
+    _logger.info("Triangulating {0} points...".format(len(xcol)))
+    tri = Delaunay(np.column_stack((xcol, ycol)))
+    if len(_TRI_CACHE) >= _TRI_CACHE_SIZE:
+        _TRI_CACHE.pop(next(iter(_TRI_CACHE)))
+    _TRI_CACHE[key] = tri
+    return tri
+
+
+class GridXYZ(object):
+    """Grid many Z columns measured on the same (X, Y) scan positions
+
+    The XY regular mesh (and the Delaunay triangulation of the scan points,
+    cached by coordinates) are computed once, then each call grids one or
+    more Z columns.
+
+    Parameters
+    ----------
+    xcol, ycol : 1D arrays with the scan positions
+    xystep : the step size of the XY grid
+    method : interpolation method
+             'linear', 'cubic' -> triangulation (LinearNDInterpolator,
+                                  CloughTocher2DInterpolator)
+             'nearest'         -> NearestNDInterpolator
+             'bin'             -> O(N) binning, average of the points
+                                  falling on each mesh point (dense maps)
+    fill_value : value outside the convex hull or of empty bins [0]
+
+    Example
+    -------
+    >>> grid = GridXYZ(xcol, ycol, xystep=0.1)
+    >>> xgrid, ygrid, zz = grid(zcols)  # zcols: (npts, nchannels)
+    """
+
+    def __init__(self, xcol, ycol, xystep=None, method='cubic', fill_value=0):
+        if xystep is None:
+            xystep = 0.1
+            _logger.warning("'xystep' not given: using a default value of {0}".format(xystep))
+        self.xcol = np.asarray(xcol, dtype=float)
+        self.ycol = np.asarray(ycol, dtype=float)
+        self.method = method
+        self.fill_value = fill_value
+        #create the XY meshgrid
+        nxpoints = int((self.xcol.max()-self.xcol.min())/xystep)
+        nypoints = int((self.ycol.max()-self.ycol.min())/xystep)
+        self.xgrid = np.linspace(self.xcol.min(), self.xcol.max(), num=nxpoints)
+        self.ygrid = np.linspace(self.ycol.min(), self.ycol.max(), num=nypoints)
+        self._bins = None
+
+    def _grid_interp(self, zcols):
+        """grid with scipy interpolators"""
+        from scipy.interpolate import (LinearNDInterpolator,
+                                       CloughTocher2DInterpolator,
+                                       NearestNDInterpolator)
+        if self.method == 'nearest':
+            interp = NearestNDInterpolator(np.column_stack((self.xcol, self.ycol)), zcols)
+            return interp(self.xgrid[None, :], self.ygrid[:, None])
+        tri = get_triangulation(self.xcol, self.ycol)
+        if self.method == 'linear':
+            interp = LinearNDInterpolator(tri, zcols, fill_value=self.fill_value)
+        elif self.method == 'cubic':
+            interp = CloughTocher2DInterpolator(tri, zcols, fill_value=self.fill_value)
+        else:
+            raise ValueError("Unknown interpolation method {0}".format(self.method))
+        return interp(self.xgrid[None, :], self.ygrid[:, None])
+
+    def _grid_bin(self, zcols):
+        """grid by averaging the points falling on each mesh point"""
+        nx, ny = self.xgrid.size, self.ygrid.size
+        if self._bins is None:
+            ix = np.rint((self.xcol - self.xgrid[0]) / (self.xgrid[-1] - self.xgrid[0]) * (nx - 1))
+            iy = np.rint((self.ycol - self.ygrid[0]) / (self.ygrid[-1] - self.ygrid[0]) * (ny - 1))
+            ibin = iy.astype(int) * nx + ix.astype(int)
+            self._bins = (ibin, np.bincount(ibin, minlength=nx*ny))
+        ibin, counts = self._bins
+        nch = zcols.shape[1]
+        ibins = (ibin[:, None] + np.arange(nch)[None, :] * (nx*ny)).ravel()
+        sums = np.bincount(ibins, weights=zcols.ravel(), minlength=nx*ny*nch)
+        sums = sums.reshape(nch, ny, nx).transpose(1, 2, 0)
+        counts = counts.reshape(ny, nx)[:, :, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            zz = sums / counts
+        zz[np.broadcast_to(counts == 0, zz.shape)] = self.fill_value
+        return zz
+
+    def __call__(self, zcol):
+        """grid Z column(s) on the XY mesh
+
+        Parameters
+        ----------
+        zcol : 1D array (npts) or 2D array (npts, nchannels)
+
+        Returns
+        -------
+        xgrid, ygrid : 1D arrays giving abscissa and ordinate of the map
+        zz : 2D array (ny, nx) or 3D array (ny, nx, nchannels)
+        """
+        zcol = np.asarray(zcol, dtype=float)
+        zcols = zcol.reshape(zcol.shape[0], -1)
+        _logger.info("Gridding data with {0}...".format(self.method))
+        if self.method == 'bin':
+            zz = self._grid_bin(zcols)
+        else:
+            zz = self._grid_interp(zcols)
+        return self.xgrid, self.ygrid, zz.reshape(zz.shape[:2] + zcol.shape[1:])
+
+
 def gridxyz(xcol, ycol, zcol, xystep=None, lib='scipy', method='cubic'):
     """Grid (X, Y, Z) 1D data on a 2D regular mesh
 
@@ -23,9 +150,10 @@ def gridxyz(xcol, ycol, zcol, xystep=None, lib='scipy', method='cubic'):
     xcol, ycol, zcol : 1D arrays repesenting the map (z is the intensity)
     xystep : the step size of the XY grid
     lib : library used for griddata
-          [scipy]
+          [scipy] -> GridXYZ (triangulation cached by XY coordinates)
           matplotlib
     method : interpolation method
+             'bin' -> O(N) binning, scipy only (-> GridXYZ)
 
     Returns
     -------
@@ -44,8 +172,8 @@ def gridxyz(xcol, ycol, zcol, xystep=None, lib='scipy', method='cubic'):
     nypoints = int((ycol.max()-ycol.min())/xystep)
     xgrid = np.linspace(xcol.min(), xcol.max(), num=nxpoints)
     ygrid = np.linspace(ycol.min(), ycol.max(), num=nypoints)
-    xx, yy = np.meshgrid(xgrid, ygrid)
     if ('matplotlib' in lib.lower()):
+        xx, yy = np.meshgrid(xgrid, ygrid)
         try:
             from matplotlib.mlab import griddata
         except ImportError:
@@ -58,13 +186,11 @@ def gridxyz(xcol, ycol, zcol, xystep=None, lib='scipy', method='cubic'):
         return xgrid, ygrid, zz
     elif ('scipy' in lib.lower()):
         try:
-            from scipy.interpolate import griddata
+            import scipy.interpolate  # noqa: F401
         except ImportError:
             _logger.error("Cannot load griddata from Scipy")
             return
-        _logger.info("Gridding data with {0}...".format(lib))
-        zz = griddata((xcol, ycol), zcol, (xgrid[None,:], ygrid[:,None]), method=method, fill_value=0)
-        return xgrid, ygrid, zz
+        return GridXYZ(xcol, ycol, xystep=xystep, method=method, fill_value=0)(zcol)
 
 ### LARCH ###
 def gridxyz_larch(xcol, ycol, zcol, xystep=None, method='cubic', lib='scipy', _larch=None):
@@ -20,6 +20,7 @@ def norm1D(y, norm=None, logger=None, **kws):
            "max-min" -> (y - np.min(y)) / (np.max(y) - np.min(y))
            "area"    -> (y - np.min(y)) / np.trapezoid(y, x=kws.get('x'))
            "sum"     ->  (y - np.min(y)) / np.sum(y)
+           "edge-step" -> (y - pre_edge) / edge_step (-> pre_edge_matrix)
            "larch"   -> TODO!!!
 
     Returns
@@ -28,6 +29,8 @@ def norm1D(y, norm=None, logger=None, **kws):
 
     """
     _logger = logger or getLogger("sloth.math.normalization.norm1D")
+    if norm == "edge-step":
+        return norm1D_stack(y, norm=norm, logger=_logger, **kws)[0][0]
     if norm == "max":
         return y / np.max(y)
     elif norm == "max-min":
@@ -57,5 +60,257 @@ def norm1D(y, norm=None, logger=None, **kws):
         return y
 
 
+def norm1D_stack(ys, norm=None, x=None, logger=None, **kws):
+    """normalization of a stack of curves at once (same methods of norm1D)
+
+    Parameters
+    ----------
+    ys : 2D array (ncurves, npts), one curve per row (1D array -> one curve)
+    norm : string, available options
+           "max", "max-min", "area", "sum" -> as in norm1D
+           "edge-step" -> (y - pre_edge) / edge_step, with x required
+                          (-> pre_edge_matrix, **kws passed to it)
+    x : None, 1D array (npts), shared x axis, or 2D array (ncurves, npts)
+
+    Returns
+    -------
+    ynorm : 2D array (ncurves, npts)
+    factors : dict with "offset" and "scale", such that
+              ynorm = (ys - offset) / scale and ys = ynorm * scale + offset
+              "offset" -> (ncurves, 1), or (ncurves, npts) for "edge-step"
+              "scale" -> (ncurves, 1)
+    """
+    _logger = logger or getLogger("sloth.math.normalization.norm1D_stack")
+    ys = np.atleast_2d(np.asarray(ys, dtype=float))
+    ncurves = ys.shape[0]
+    offset = np.zeros((ncurves, 1))
+    scale = np.ones((ncurves, 1))
+    if norm == "max":
+        scale = np.max(ys, axis=1, keepdims=True)
+    elif norm == "max-min":
+        offset = np.min(ys, axis=1, keepdims=True)
+        scale = np.max(ys, axis=1, keepdims=True) - offset
+    elif norm == "area":
+        offset = np.min(ys, axis=1, keepdims=True)
+        try:
+            scale = np.trapezoid(ys, x=x, axis=1)[:, np.newaxis]
+        except Exception:
+            scale = np.trapezoid(ys, axis=1)[:, np.newaxis]
+    elif norm == "sum":
+        offset = np.min(ys, axis=1, keepdims=True)
+        scale = np.sum(ys, axis=1, keepdims=True)
+    elif norm == "edge-step":
+        if x is None:
+            raise ValueError("'edge-step' normalization requires 'x'")
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            pre = [pre_edge_matrix(x, ys, **kws)]
+        else:
+            pre = [pre_edge_matrix(xrow, yrow, **kws) for (xrow, yrow) in zip(x, ys)]
+        offset = np.concatenate([out["pre_edge"] for out in pre])
+        scale = np.concatenate([out["edge_step"] for out in pre])[:, np.newaxis]
+    elif norm == "larch":
+        _logger.error("NOT IMPLEMENTED YET!")
+    else:
+        _logger.debug("Normalization method not applied")
+    if norm == "max":
+        ynorm = ys / scale
+    else:
+        ynorm = (ys - offset) / scale
+    return ynorm, {"offset": offset, "scale": scale}
+
+
+def denorm1D_stack(ynorm, factors):
+    """invert norm1D_stack given the returned factors"""
+    return ynorm * factors["scale"] + factors["offset"]
+
+
+def _index_of(arr, value):
+    """index of sorted `arr` *at or below* value (as larch.math.index_of)"""
+    return max(int(np.searchsorted(arr, value, side="right")) - 1, 0)
+
+
+def _index_nearest(arr, value):
+    """index of `arr` *nearest* to value (as larch.math.index_nearest)"""
+    return int(np.abs(arr - value).argmin())
+
+
+def _polyfit_matrix(x, ys, deg):
+    """least-squares polynomial fit of all columns of `ys` at once
+
+    Parameters
+    ----------
+    x : 1D array (m)
+    ys : 2D array (m, nchannels)
+    deg : int, polynomial degree
+
+    Returns
+    -------
+    coefs : 2D array (deg+1, nchannels), increasing powers of x
+    """
+    vander = np.polynomial.polynomial.polyvander(x, deg)
+    scale = np.sqrt((vander * vander).sum(axis=0))
+    scale[scale == 0] = 1
+    coefs = np.linalg.lstsq(vander / scale, ys, rcond=None)[0]
+    return coefs / scale[:, np.newaxis]
+
+
+def pre_edge_matrix(
+    energy,
+    mus,
+    e0=None,
+    pre1=None,
+    pre2=None,
+    norm1=None,
+    norm2=None,
+    nnorm=None,
+    nvict=0,
+    npre=1,
+    step=None,
+):
+    """pre-edge subtraction and normalization of many channels at once
+
+    Vectorised version of `larch.xafs.pre_edge` for spectra sharing the same
+    energy grid (e.g. multi-element fluorescence detectors): the pre-edge
+    line and the post-edge polynomial are fitted to all channels with one
+    batched least-squares, using the same defaults as Larch for the fit
+    ranges.
+
+    Parameters
+    ----------
+    energy : 1D array (npts), increasing energy grid in eV
+    mus : 2D array (nchannels, npts), mu(E) of each channel
+    e0 : float or None, shared edge energy
+         None -> energy at the maximum derivative of the averaged channels
+    pre1, pre2 : floats or None, pre-edge range relative to e0
+    norm1, norm2 : floats or None, post-edge range relative to e0
+    nnorm : int or None, degree of the post-edge polynomial
+    nvict : int, energy exponent for the pre-edge fit [0]
+    npre : int, 1 for linear pre-edge, 0 for constant [1]
+    step : float, array (nchannels) or None, forced edge step(s)
+
+    Returns
+    -------
+    dict with keys
+        'e0' : float
+        'edge_step' : 1D array (nchannels)
+        'norm', 'flat', 'pre_edge', 'post_edge' : 2D arrays (nchannels, npts)
+        'precoefs' : 2D array (2, nchannels), pre-edge line in powers of energy
+        'norm_coefs' : 2D array (nnorm+1, nchannels), post-edge polynomial
+                       in powers of (energy - e0)
+        'pre1', 'pre2', 'norm1', 'norm2', 'nnorm', 'nvict', 'npre' : used ranges
+    """
+    energy = np.asarray(energy, dtype=float)
+    mus = np.atleast_2d(np.asarray(mus, dtype=float))
+    npts = energy.size
+    if npts <= 1:
+        raise ValueError("energy array must have at least 2 points")
+    if mus.shape[1] != npts:
+        raise ValueError("mus must have shape (nchannels, len(energy))")
+    emin, emax = energy[0], energy[-1]
+
+    if e0 is None or e0 < energy[1] or e0 > energy[-2]:
+        dmude = np.gradient(mus.mean(axis=0), energy)
+        nskip = max(3, int(npts * 0.02))
+        e0 = energy[nskip + int(np.argmax(dmude[nskip:-nskip]))]
+    e0 = float(e0)
+    ie0 = _index_nearest(energy, e0)
+
+    # fit ranges, same defaults as Larch
+    if pre1 is None:
+        if ie0 > 20:
+            pre1 = 5.0 * round((energy[1] - e0) / 5.0)
+        else:
+            pre1 = 2.0 * round((energy[1] - e0) / 2.0)
+    pre1 = max(pre1, emin - e0)
+    if pre2 is None:
+        pre2 = 0.5 * pre1
+    if pre1 > pre2:
+        pre1, pre2 = pre2, pre1
+    if (_index_of(energy - e0, pre2) - _index_of(energy - e0, pre1)) < 3:
+        nvict = 0
+        npre = 0
+
+    if norm2 is None:
+        norm2 = 5.0 * round((emax - e0) / 5.0)
+    if norm2 < 0:
+        norm2 = emax - e0 - norm2
+    norm2 = min(norm2, emax - e0)
+    if norm1 is None:
+        norm1 = min(25, 5.0 * round(norm2 / 15.0))
+    if norm1 > norm2:
+        norm1, norm2 = norm2, norm1
+    norm1 = min(norm1, norm2 - 2)
+    if nnorm is None:
+        nnorm = 2
+        if norm2 - norm1 < 300:
+            nnorm = 1
+        if norm2 - norm1 < 30:
+            nnorm = 0
+    nnorm = max(min(nnorm, 5), 0)
+
+    # pre-edge
+    p1 = _index_of(energy, pre1 + e0)
+    p2 = _index_nearest(energy, pre2 + e0)
+    if npre == 0:
+        if p2 == p1:
+            p2 = p2 + 1
+        precoefs = np.zeros((2, mus.shape[0]))
+        precoefs[0] = mus[:, p1:p2].mean(axis=1)
+        pre_edge = np.repeat(precoefs[0][:, np.newaxis], npts, axis=1)
+    else:
+        if p2 - p1 < 2:
+            p2 = min(npts, p1 + 2)
+        evict = energy**nvict
+        precoefs = _polyfit_matrix(energy[p1:p2], (mus * evict)[:, p1:p2].T, 1)
+        pre_edge = (precoefs[0][:, np.newaxis] + np.outer(precoefs[1], energy)) / evict
+
+    # post-edge
+    p1 = _index_of(energy, norm1 + e0)
+    p2 = _index_nearest(energy, norm2 + e0)
+    if p1 > npts - 3:
+        p1 = npts - 3
+    if p2 - p1 < 2:
+        p1 = p1 - 2
+        nnorm = 0
+    elif p2 - p1 < 5:
+        nnorm = min(1, nnorm)
+    erel = energy - e0
+    presub = (mus - pre_edge)[:, p1:p2]
+    norm_coefs = _polyfit_matrix(erel[p1:p2], presub.T, nnorm)
+    post_edge = pre_edge + np.polynomial.polynomial.polyvander(erel, nnorm).dot(
+        norm_coefs
+    ).T
+
+    if step is None:
+        edge_step = post_edge[:, ie0] - pre_edge[:, ie0]
+    else:
+        edge_step = np.broadcast_to(np.asarray(step, dtype=float), (mus.shape[0],))
+    edge_step = np.maximum(np.abs(edge_step), 1.0e-12)
+    norm = (mus - pre_edge) / edge_step[:, np.newaxis]
+
+    flat_residue = (post_edge - pre_edge) / edge_step[:, np.newaxis]
+    flat = norm - flat_residue + flat_residue[:, ie0 : ie0 + 1]
+    flat[:, :ie0] = norm[:, :ie0]
+
+    return {
+        "e0": e0,
+        "edge_step": edge_step,
+        "norm": norm,
+        "flat": flat,
+        "pre_edge": pre_edge,
+        "post_edge": post_edge,
+        "precoefs": precoefs,
+        "norm_coefs": norm_coefs,
+        "pre1": float(pre1),
+        "pre2": float(pre2),
+        "norm1": float(norm1),
+        "norm2": float(norm2),
+        "nnorm": nnorm,
+        "nvict": nvict,
+        "npre": npre,
+    }
+
+
 if __name__ == "__main__":
     pass
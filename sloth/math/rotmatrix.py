@@ -39,41 +39,17 @@ def rotation_matrix_numpy(axis, theta):
 
 
 def rotation_matrix_weave(axis, theta, mat=None):
-    """ return the rotation matrix using Weave
-    (~20x faster than numpy)
+    """ return the rotation matrix (scipy.weave is gone: same as numpy)
+
+    .. deprecated:: use :func:`rotation_matrix_numpy` or, for many
+       rotations at once, :func:`rotation_matrices`
 
     Parameters
     ----------
     axis : numpy.array([x,y,z])
     theta : rotation angle in radians
     """
-    if mat == None:
-        mat = np.eye(3, 3)
-
-    support = "#include <math.h>"
-    code = """
-    double x = sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2]);
-    double a = cos(theta / 2.0);
-    double b = -(axis[0] / x) * sin(theta / 2.0);
-    double c = -(axis[1] / x) * sin(theta / 2.0);
-    double d = -(axis[2] / x) * sin(theta / 2.0);
-
-    mat[0] = a*a + b*b - c*c - d*d;
-    mat[1] = 2 * (b*c - a*d);
-    mat[2] = 2 * (b*d + a*c);
-
-    mat[3*1 + 0] = 2*(b*c+a*d);
-    mat[3*1 + 1] = a*a+c*c-b*b-d*d;
-    mat[3*1 + 2] = 2*(c*d-a*b);
-
-    mat[3*2 + 0] = 2*(b*d-a*c);
-    mat[3*2 + 1] = 2*(c*d+a*b);
-    mat[3*2 + 2] = a*a+d*d-b*b-c*c;
-    """
-
-    weave.inline(code, ["axis", "theta", "mat"], support_code=support, libraries=["m"])
-
-    return mat
+    return rotation_matrix_numpy(axis, theta)
 
 
 def rotate(arr, axis, theta, method="numpy"):
@@ -84,21 +60,169 @@ def rotate(arr, axis, theta, method="numpy"):
     arr : np.array([x,y,z])
     axis : np.array([x,y,z])
     theta : in radians
-    method : 'numpy' or 'weave'
+    method : 'numpy' or 'weave' (-> 'numpy')
 
     Returns
     -------
     np.array([x,y,z])
 
     """
-    if method == "numpy":
+    if method in ("numpy", "weave"):
         return np.dot(rotation_matrix_numpy(axis, theta), arr)
-    elif method == "weave":
-        return np.dot(rotation_matrix_weave(axis, theta), arr)
     else:
         raise NameError("method for rotation matrix is 'numpy' or 'weave'")
 
 
+# VECTORISED KERNELS #
+# stacks of rotation matrices have shape (..., 3, 3), point clouds (..., 3)
+
+#: unit vectors for the Euler angles axes
+_EULER_AXES = {
+    "x": np.array([1.0, 0.0, 0.0]),
+    "y": np.array([0.0, 1.0, 0.0]),
+    "z": np.array([0.0, 0.0, 1.0]),
+}
+
+
+def quaternion_matrices(quat):
+    """ return the stack of rotation matrices of unit quaternions
+
+    Parameters
+    ----------
+    quat : array (..., 4), quaternions [a, b, c, d] (scalar first),
+           normalized here
+
+    Returns
+    -------
+    array (..., 3, 3)
+    """
+    quat = np.asarray(quat, dtype=float)
+    quat = quat / np.linalg.norm(quat, axis=-1, keepdims=True)
+    a, b, c, d = np.moveaxis(quat, -1, 0)
+    mat = np.empty(quat.shape[:-1] + (3, 3))
+    mat[..., 0, 0] = a * a + b * b - c * c - d * d
+    mat[..., 0, 1] = 2 * (b * c - a * d)
+    mat[..., 0, 2] = 2 * (b * d + a * c)
+    mat[..., 1, 0] = 2 * (b * c + a * d)
+    mat[..., 1, 1] = a * a + c * c - b * b - d * d
+    mat[..., 1, 2] = 2 * (c * d - a * b)
+    mat[..., 2, 0] = 2 * (b * d - a * c)
+    mat[..., 2, 1] = 2 * (c * d + a * b)
+    mat[..., 2, 2] = a * a + d * d - b * b - c * c
+    return mat
+
+
+def axis_angle_quaternions(axis, theta):
+    """ return the quaternions of the rotations around axis by theta
+
+    same convention of :func:`rotation_matrix_numpy`
+
+    Parameters
+    ----------
+    axis : array (..., 3)
+    theta : array (...), rotation angles in radians
+
+    Returns
+    -------
+    array (..., 4)
+    """
+    axis = np.asarray(axis, dtype=float)
+    theta = np.asarray(theta, dtype=float)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
+    half = theta / 2.0
+    shape = np.broadcast_shapes(axis.shape[:-1], theta.shape)
+    quat = np.empty(shape + (4,))
+    quat[..., 0] = np.cos(half)
+    quat[..., 1:] = -axis * np.sin(half)[..., np.newaxis]
+    return quat
+
+
+def rotation_matrices(axis, theta):
+    """ return the stack of rotation matrices around axis by theta
+
+    vectorised :func:`rotation_matrix_numpy`, the arguments broadcast
+
+    Parameters
+    ----------
+    axis : array (..., 3)
+    theta : array (...), rotation angles in radians
+
+    Returns
+    -------
+    array (..., 3, 3)
+    """
+    return quaternion_matrices(axis_angle_quaternions(axis, theta))
+
+
+def euler_matrices(alpha, beta, gamma, axes="zyx"):
+    """ return the stack of rotation matrices given by Euler angles
+
+    R = R(axes[0], alpha) . R(axes[1], beta) . R(axes[2], gamma), with each
+    rotation as in :func:`rotation_matrix_numpy`
+
+    Parameters
+    ----------
+    alpha, beta, gamma : arrays (...), rotation angles in radians
+    axes : str, sequence of three axes among 'x', 'y', 'z' ['zyx']
+
+    Returns
+    -------
+    array (..., 3, 3)
+    """
+    if len(axes) != 3 or any(ax not in _EULER_AXES for ax in axes):
+        raise NameError("axes must be a sequence of 3 among 'x', 'y', 'z'")
+    mats = [
+        rotation_matrices(_EULER_AXES[ax], ang)
+        for (ax, ang) in zip(axes, (alpha, beta, gamma))
+    ]
+    return np.matmul(np.matmul(mats[0], mats[1]), mats[2])
+
+
+def compose_rotations(mats):
+    """ compose a chain of rotations, R = mats[0] . mats[1] . ... . mats[-1]
+
+    the chain is reduced pairwise, taking log2(len(mats)) stacked products
+
+    Parameters
+    ----------
+    mats : array (nchain, ..., 3, 3)
+
+    Returns
+    -------
+    array (..., 3, 3)
+    """
+    mats = np.asarray(mats, dtype=float)
+    while mats.shape[0] > 1:
+        if mats.shape[0] % 2:
+            last = mats[-1:]
+            mats = np.concatenate((np.matmul(mats[0:-1:2], mats[1::2]), last))
+        else:
+            mats = np.matmul(mats[0::2], mats[1::2])
+    return mats[0]
+
+
+def rotate_points(points, mats, out=None):
+    """ rotate a point cloud
+
+    Parameters
+    ----------
+    points : array (N, 3)
+    mats : array (3, 3), one rotation for all points, or (N, 3, 3), one
+           rotation per point
+    out : array (N, 3) or None, preallocated output (not `points` itself)
+
+    Returns
+    -------
+    array (N, 3)
+    """
+    points = np.asarray(points)
+    mats = np.asarray(mats, dtype=float)
+    if mats.ndim == 2:
+        #: single matrix -> one product, runs at memory bandwidth
+        return np.matmul(points, mats.T, out=out)
+    return np.einsum("...ij,...j->...i", mats, points, out=out, optimize=True)
+
+
 if __name__ == "__main__":
     v = np.array([3, 5, 0])
     axis = np.array([4, 4, 1])
@@ -106,5 +230,5 @@ if __name__ == "__main__":
 
     print("Rotation with Numpy:")
     print(np.dot(rotation_matrix_numpy(axis, theta), v))
-    print("Rotation with Scipy.Weave:")
-    print(np.dot(rotation_matrix_weave(axis, theta), v))
+    print("Rotation of many points at once:")
+    print(rotate_points(np.array([v, v]), rotation_matrices(axis, [theta, -theta])))
@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ray_tracer: pure NumPy ray tracing of bent crystal analysers
+===============================================================
+
+Self-contained ray tracing (no SHADOW3 required) of spherically or
+cylindrically bent Johann and Johansson crystal analysers in the Rowland
+circle geometry of :class:`sloth.inst.rowland.RcHoriz`:
+
+- sample (source) at the origin, analyser center at (0, p, 0), detector
+  in the YZ plane, all distances in the unit of Rm (mm by default);
+- Johann: crystal surface and lattice planes bent to 2*Rm;
+- Johansson: lattice planes bent to 2*Rm, surface ground to Rm;
+- cylindrical: bent in the meridional (YZ) plane only, flat along X.
+
+The rays are generated, traced and accumulated in chunks of fixed size:
+the memory is bounded by the chunk size, whatever the total number of
+rays. The rays are stored as SHADOW3 rays, arrays (nrays, 18), thus can
+be used with :mod:`sloth.raytracing.shadow_utils` (see get_beam()):
+
+== ===========================================
+ 1 X position
+ 2 Y position
+ 3 Z position
+ 4 X direction
+ 5 Y direction
+ 6 Z direction
+ 7 X component of the sigma electric vector
+ 8 Y component of the sigma electric vector
+ 9 Z component of the sigma electric vector
+10 flag (1 good, -1 lost on the crystal aperture)
+11 wavenumber (cm^-1)
+12 ray index (starting from 1)
+13 optical path (unit of Rm)
+14 sigma phase
+15 pi phase
+16 X component of the pi electric vector
+17 Y component of the pi electric vector
+18 Z component of the pi electric vector
+== ===========================================
+
+Example
+-------
+
+>>> from sloth.raytracing.ray_tracer import AnalyserTracer
+>>> tr = AnalyserTracer(Rm=500., theta0=75., dspacing=1.0452, kind='johann',
+...                     shape='spherical', aperture=(100., 100.))
+>>> res = tr.run(10**7, ene_width=2., chunk_size=10**6)
+>>> res['image'], res['ene_hist']
+
+"""
+
+import numpy as np
+
+from sloth.inst.rowland import HC, RcHoriz
+from sloth.utils.logging import getLogger
+
+_logger = getLogger("sloth.raytracing.ray_tracer")
+
+#: h*c in eV*cm, for the wavenumber (column 11)
+HC_EV_CM = HC * 100
+
+#: SHADOW3 columns (1-based) used here
+COL_POS = (1, 2, 3)
+COL_DIR = (4, 5, 6)
+COL_ES = (7, 8, 9)
+COL_FLAG = 10
+COL_K = 11
+COL_INDEX = 12
+COL_OPD = 13
+COL_EP = (16, 17, 18)
+
+#: XCrystalBox.opts['scan_ang_unit'] -> factor from radians
+_ANG_UNITS = {0: 1.0, 1: 1e6, 2: np.rad2deg(1.0), 3: np.rad2deg(1.0) * 3600}
+
+
+def rays_energy(rays):
+    """energy (eV) of the rays, from the wavenumber (column 11)"""
+    return rays[:, COL_K - 1] * HC_EV_CM / (2 * np.pi)
+
+
+def rays_intensity(rays):
+    """intensity of the rays, |Es|^2 + |Ep|^2 (SHADOW3 column 23)"""
+    es = rays[:, COL_ES[0] - 1 : COL_ES[-1]]
+    ep = rays[:, COL_EP[0] - 1 : COL_EP[-1]]
+    return np.einsum("ij,ij->i", es, es) + np.einsum("ij,ij->i", ep, ep)
+
+
+def get_beam(rays):
+    """SHADOW3 beam from an array of rays (requires Shadow)"""
+    import Shadow
+
+    beam = Shadow.Beam(len(rays))
+    beam.rays = np.ascontiguousarray(rays, dtype=float)
+    return beam
+
+
+def reflectivity_function(refl=None, wrc=1.25e-4):
+    """reflectivity as a function of the angular deviation from the
+    Bragg angle (rad)
+
+    Parameters
+    ----------
+    refl : None, callable or XCrystalBox
+        None: top-hat of full width `wrc`;
+        callable: refl(dtheta_rad) -> reflectivity;
+        XCrystalBox: its interpolated curve (after load_refl()), the scan
+        variable must be the angle relative to the Bragg angle
+        (opts['scan_mode'] 2 or 3)
+    wrc : float
+        full width of the top-hat reflectivity (rad) [1.25E-4]
+
+    Returns
+    -------
+    callable
+    """
+    if refl is None:
+        return lambda dth: (np.abs(dth) <= wrc / 2.0).astype(float)
+    if hasattr(refl, "opts"):
+        if not hasattr(refl, "refl"):
+            raise AttributeError("XCrystalBox: reflectivity not loaded, see load_refl()")
+        if refl.opts.get("scan_mode") not in (2, 3):
+            raise ValueError("XCrystalBox: scan_mode must be 2 or 3 (angle minus theta Bragg)")
+        factor = _ANG_UNITS[refl.opts["scan_ang_unit"]]
+        curve = refl.refl
+        return lambda dth: np.clip(curve(dth * factor), 0.0, None)
+    if callable(refl):
+        return refl
+    raise TypeError("refl must be None, a callable or a XCrystalBox")
+
+
+class AnalyserTracer(object):
+    """Ray tracer of a bent crystal analyser on the Rowland circle"""
+
+    def __init__(self, Rm=500.0, theta0=75.0, dspacing=None, kind="johann", shape="spherical",
+                 aperture=(100.0, 100.0), mask="rectangular", refl=None, wrc=1.25e-4):
+        """
+        Parameters
+        ----------
+        Rm : float
+            radius of the Rowland circle (mm)
+        theta0 : float
+            Bragg angle of the analyser center (deg)
+        dspacing : float
+            d-spacing of the reflection (\\AA)
+        kind : str
+            'johann' or 'johansson'
+        shape : str
+            'spherical' or 'cylindrical' (bent in the meridional plane only)
+        aperture : tuple of floats
+            (sagittal, meridional) full sizes of the crystal (mm), measured
+            on the plane tangent at the center; for the circular mask the
+            first is the diameter
+        mask : str
+            'rectangular' or 'circular'
+        refl, wrc : reflectivity, see reflectivity_function()
+        """
+        if dspacing is None:
+            raise ValueError("the d-spacing is required")
+        if kind not in ("johann", "johansson"):
+            raise NameError("kind is 'johann' or 'johansson'")
+        if shape not in ("spherical", "cylindrical"):
+            raise NameError("shape is 'spherical' or 'cylindrical'")
+        if mask not in ("rectangular", "circular"):
+            raise NameError("mask is 'rectangular' or 'circular'")
+        self.Rm = float(Rm)
+        self.theta0 = float(theta0)
+        self.dspacing = float(dspacing)
+        self.kind = kind
+        self.shape = shape
+        self.aperture = tuple(float(val) for val in aperture)
+        self.mask = mask
+        self.reflectivity = reflectivity_function(refl, wrc=wrc)
+        rc = RcHoriz(Rm=self.Rm, theta0=self.theta0, d=self.dspacing, showInfos=False)
+        self.ene0 = float(rc.get_ene())
+        rth = np.deg2rad(self.theta0)
+        self.p = float(rc.p)
+        #: analyser center, detector center
+        self.ana_pos = np.array(rc.get_ana_pos(), dtype=float)
+        self.det_pos = np.array(rc.get_det_pos(), dtype=float)
+        #: normal to the crystal at the center (towards the Rowland circle center)
+        self.normal = np.array([0.0, -np.sin(rth), np.cos(rth)])
+        #: meridional tangent at the center
+        self.tangent = np.array([0.0, np.cos(rth), np.sin(rth)])
+        #: center of the lattice planes curvature (2*Rm) and of the surface
+        self.planes_center = self.ana_pos + 2 * self.Rm * self.normal
+        if kind == "johann":
+            self.surf_center, self.surf_radius = self.planes_center, 2 * self.Rm
+        else:
+            self.surf_center, self.surf_radius = self.ana_pos + self.Rm * self.normal, self.Rm
+        #: detector frame (SHADOW3 convention: Y along the central ray, X sagittal)
+        ey = self.det_pos - self.ana_pos
+        ey /= np.linalg.norm(ey)
+        ex = np.array([1.0, 0.0, 0.0])
+        self.det_frame = np.stack((ex, ey, np.cross(ex, ey)))
+        #: source divergences covering the crystal (rad): horizontal half
+        #: angle and vertical (min, max) angles
+        self.hdiv, self.vdiv = self._divergences()
+
+    def _divergences(self, margin=0.01):
+        """divergences of the source covering the crystal, from the edges
+        of the aperture on the bent surface (sag included), enlarged by
+        `margin` (fraction of the angular range)"""
+        hw, hl = self.aperture[0] / 2.0, self.aperture[1] / 2.0
+        if self.mask == "circular":
+            hl = hw
+        u, v = [uv.ravel() for uv in np.meshgrid([-hw, 0.0, hw], [-hl, 0.0, hl])]
+        r2 = v ** 2 + (u ** 2 if self.shape == "spherical" else 0.0)
+        sag = self.surf_radius - np.sqrt(self.surf_radius ** 2 - r2)
+        pts = (self.ana_pos + u[:, np.newaxis] * self.det_frame[0] + v[:, np.newaxis] * self.tangent
+               + sag[:, np.newaxis] * self.normal)
+        hdiv = np.arctan(np.abs(pts[:, 0]) / pts[:, 1]).max()
+        vang = np.arctan(pts[:, 2] / pts[:, 1])
+        vmar = margin * (vang.max() - vang.min())
+        return hdiv * (1 + margin), (vang.min() - vmar, vang.max() + vmar)
+
+    def source(self, nrays, energy=None, ene_width=0.0, size=(0.0, 0.0), rng=None, index0=0):
+        """rays from the sample position, uniform in energy, position
+        (box) and angles (flat divergences covering the crystal)
+
+        Parameters
+        ----------
+        nrays : int
+            number of rays
+        energy : float
+            central energy (eV) [None -> energy at theta0]
+        ene_width : float
+            full width of the uniform energy distribution (eV) [0]
+        size : tuple of floats
+            (X, Z) full sizes of the source (box) [(0, 0), point source]
+        rng : numpy.random.Generator [None -> default_rng()]
+        index0 : int
+            index of the first ray - 1 (column 12)
+
+        Returns
+        -------
+        rays : array (nrays, 18)
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        if energy is None:
+            energy = self.ene0
+        rays = np.zeros((nrays, 18))
+        rays[:, 0] = (rng.random(nrays) - 0.5) * size[0]
+        rays[:, 2] = (rng.random(nrays) - 0.5) * size[1]
+        #: the vertical divergence covers the crystal, from its lower to its upper end
+        vmin, vmax = self.vdiv
+        dirs = rays[:, 3:6]
+        dirs[:, 0] = np.tan((2 * rng.random(nrays) - 1) * self.hdiv)
+        dirs[:, 1] = 1.0
+        dirs[:, 2] = np.tan(vmin + rng.random(nrays) * (vmax - vmin))
+        dirs /= np.linalg.norm(dirs, axis=1, keepdims=True)
+        #: sigma polarization (perpendicular to the meridional plane)
+        rays[:, 6] = 1.0
+        rays[:, COL_FLAG - 1] = 1.0
+        rays[:, COL_K - 1] = 2 * np.pi * (energy + (rng.random(nrays) - 0.5) * ene_width) / HC_EV_CM
+        rays[:, COL_INDEX - 1] = np.arange(index0 + 1, index0 + nrays + 1)
+        return rays
+
+    def _intersect(self, pos, dirs):
+        """distance along the rays to the crystal surface (NaN if missed)"""
+        rel = pos - self.surf_center
+        if self.shape == "cylindrical":
+            #: cylinder axis along X
+            rel, dirs = rel[:, 1:], dirs[:, 1:]
+        a = np.einsum("ij,ij->i", dirs, dirs)
+        b = np.einsum("ij,ij->i", dirs, rel)
+        c = np.einsum("ij,ij->i", rel, rel) - self.surf_radius ** 2
+        with np.errstate(invalid="ignore"):
+            #: the sample is inside the surface, farthest root
+            return (-b + np.sqrt(b * b - a * c)) / a
+
+    def _in_aperture(self, pts):
+        """mask of the points within the crystal aperture"""
+        rel = pts - self.ana_pos
+        u = rel[:, 0]
+        v = rel @ self.tangent
+        if self.mask == "circular":
+            return u * u + v * v <= (self.aperture[0] / 2.0) ** 2
+        return (np.abs(u) <= self.aperture[0] / 2.0) & (np.abs(v) <= self.aperture[1] / 2.0)
+
+    def trace(self, rays, frame="detector"):
+        """trace the rays from the source to the detector plane (in place)
+
+        Parameters
+        ----------
+        rays : array (nrays, 18), see source()
+        frame : str
+            'detector': positions and vectors in the detector frame
+            (SHADOW3 image plane, Y along the central ray, X sagittal);
+            'global': sample frame (RcHoriz)
+
+        Returns
+        -------
+        rays, dtheta
+            dtheta : deviation of the glancing angle on the lattice
+            planes from the Bragg angle (rad), NaN for the lost rays
+        """
+        pos = rays[:, 0:3]
+        dirs = rays[:, 3:6]
+        s1 = self._intersect(pos, dirs)
+        pts = pos + s1[:, np.newaxis] * dirs
+        good = np.isfinite(s1) & (s1 > 0)
+        good[good] = self._in_aperture(pts[good])
+        lost = ~good
+        #: lost rays keep the incoming direction and the position on the
+        #: crystal surface (or the source position if they miss it)
+        lost_pos = np.where(np.isfinite(pts[lost]), pts[lost], pos[lost])
+        lost_dirs = dirs[lost].copy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            #: lattice planes normal (towards the planes center)
+            hvec = self.planes_center - pts
+            if self.shape == "cylindrical":
+                hvec[:, 0] = 0.0
+            hvec /= np.linalg.norm(hvec, axis=1, keepdims=True)
+            cos_in = np.einsum("ij,ij->i", dirs, hvec)
+            wlen = 2 * np.pi / rays[:, COL_K - 1] * 1e8  # cm -> \AA
+            dtheta = np.arcsin(-cos_in) - np.arcsin(wlen / (2 * self.dspacing))
+            dtheta[lost] = np.nan
+            refl = np.zeros(len(rays))
+            refl[good] = self.reflectivity(dtheta[good])
+            #: specular reflection on the lattice planes
+            dout = dirs - 2 * cos_in[:, np.newaxis] * hvec
+            #: propagation to the detector plane
+            ey = self.det_frame[1]
+            s2 = ((self.det_pos - pts) @ ey) / (dout @ ey)
+            pdet = pts + s2[:, np.newaxis] * dout
+        amp = np.sqrt(refl)[:, np.newaxis]
+        rays[:, 6:9] *= amp
+        rays[:, 15:18] *= amp
+        rays[:, COL_OPD - 1] += np.where(good, s1 + s2, 0.0)
+        rays[:, COL_FLAG - 1] = np.where(good, 1.0, -1.0)
+        if frame == "detector":
+            rays[:, 0:3] = (pdet - self.det_pos) @ self.det_frame.T
+            rays[:, 3:6] = dout @ self.det_frame.T
+            rays[:, 6:9] = rays[:, 6:9] @ self.det_frame.T
+            rays[:, 15:18] = rays[:, 15:18] @ self.det_frame.T
+        elif frame == "global":
+            rays[:, 0:3] = pdet
+            rays[:, 3:6] = dout
+        else:
+            raise NameError("frame is 'detector' or 'global'")
+        if frame == "detector":
+            lost_pos = (lost_pos - self.det_pos) @ self.det_frame.T
+            lost_dirs = lost_dirs @ self.det_frame.T
+        rays[lost, 0:3] = lost_pos
+        rays[lost, 3:6] = lost_dirs
+        return rays, dtheta
+
+    def iter_chunks(self, nrays, chunk_size=10 ** 6, seed=None, frame="detector", **src_kws):
+        """generate and trace the rays in chunks
+
+        Parameters
+        ----------
+        nrays : int
+            total number of rays
+        chunk_size : int
+            rays per chunk [10**6]
+        seed : int, None
+            seed of the random generators (one per chunk: the rays do not
+            depend on the chunk size only if seed is None)
+        frame : see trace()
+        **src_kws : see source()
+
+        Yields
+        ------
+        rays, dtheta : see trace()
+        """
+        nrays, chunk_size = int(nrays), int(chunk_size)
+        for ichunk, start in enumerate(range(0, nrays, chunk_size)):
+            nchunk = min(chunk_size, nrays - start)
+            rng = np.random.default_rng(None if seed is None else [seed, ichunk])
+            rays = self.source(nchunk, rng=rng, index0=start, **src_kws)
+            yield self.trace(rays, frame=frame)
+
+    def run(self, nrays, chunk_size=10 ** 6, seed=None, bins=101, image_range=None, ene_range=None,
+            keep_rays=False, **src_kws):
+        """trace nrays in chunks and accumulate the detector image and the
+        energy distribution of the reflected rays
+
+        Parameters
+        ----------
+        nrays, chunk_size, seed : see iter_chunks()
+        bins : int
+            number of bins of the histograms [101]
+        image_range : ((xmin, xmax), (zmin, zmax)), None
+            detector image range [None -> from the first chunk]
+        ene_range : (emin, emax), None
+            energy histogram range [None -> source energy range]
+        keep_rays : boolean
+            return also all the rays (memory!) [False]
+        **src_kws : see source()
+
+        Returns
+        -------
+        dict
+            'nrays', 'ngood' : total and not lost rays
+            'intensity' : total reflected intensity (col 23)
+            'image', 'xedges', 'zedges' : detector image (intensity weighted)
+            'ene_hist', 'ene_edges' : energy distribution (intensity weighted)
+            'dth_mean', 'dth_std' : intensity weighted statistics of dtheta
+            'rays' : (nrays, 18) array, only if keep_rays
+        """
+        if ene_range is None:
+            ene0 = src_kws.get("energy") or self.ene0
+            ewidth = src_kws.get("ene_width", 0.0) or 1.0
+            ene_range = (ene0 - ewidth / 2.0, ene0 + ewidth / 2.0)
+        out = {"nrays": 0, "ngood": 0, "intensity": 0.0, "image": None,
+               "ene_hist": np.zeros(bins), "ene_edges": np.linspace(ene_range[0], ene_range[1], bins + 1)}
+        sw, sdth, sdth2 = 0.0, 0.0, 0.0
+        kept = []
+        for rays, dtheta in self.iter_chunks(nrays, chunk_size=chunk_size, seed=seed, **src_kws):
+            good = rays[:, COL_FLAG - 1] > 0
+            wgt = rays_intensity(rays[good])
+            xx, zz = rays[good, 0], rays[good, 2]
+            if image_range is None:
+                xpad = max(np.ptp(xx), 1e-6) * 0.05 if len(xx) else 1.0
+                zpad = max(np.ptp(zz), 1e-6) * 0.05 if len(zz) else 1.0
+                image_range = ((xx.min() - xpad, xx.max() + xpad), (zz.min() - zpad, zz.max() + zpad)) if len(xx) else ((-1.0, 1.0), (-1.0, 1.0))
+            img, xedges, zedges = np.histogram2d(xx, zz, bins=bins, range=image_range, weights=wgt)
+            out["image"] = img if out["image"] is None else out["image"] + img
+            out["xedges"], out["zedges"] = xedges, zedges
+            out["ene_hist"] += np.histogram(rays_energy(rays[good]), bins=out["ene_edges"], weights=wgt)[0]
+            out["nrays"] += len(rays)
+            out["ngood"] += int(np.count_nonzero(good))
+            out["intensity"] += float(wgt.sum())
+            sw += wgt.sum()
+            sdth += (wgt * dtheta[good]).sum()
+            sdth2 += (wgt * dtheta[good] ** 2).sum()
+            if keep_rays:
+                kept.append(rays)
+        out["dth_mean"] = sdth / sw if sw > 0 else np.nan
+        out["dth_std"] = np.sqrt(max(sdth2 / sw - out["dth_mean"] ** 2, 0.0)) if sw > 0 else np.nan
+        if keep_rays:
+            out["rays"] = np.concatenate(kept) if kept else np.zeros((0, 18))
+        _logger.info("%d rays traced, %d on the crystal, intensity %.1f", out["nrays"], out["ngood"], out["intensity"])
+        return out
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ray_transforms: in-place affine transformations of SHADOW3 rays
+==================================================================
+
+Rotations and translations are composed into one 4x4 affine matrix
+
+    A = | R  t |
+        | 0  1 |
+
+that is applied in place to the rays, arrays (nrays, 18) as in
+:mod:`sloth.raytracing.ray_tracer`: the positions (columns 1-3) are
+transformed by R and translated by t, the direction and electric
+vectors (columns 4-6, 7-9, 16-18) are rotated only; the other columns
+are not modified. The rays are processed in chunks of fixed size, with
+one (n, 3) x (3, 3) product per vector and chunk, thus without copies of
+the whole array; a NaN stays within its own 3-vector.
+
+The rotations follow the convention of
+:func:`sloth.math.rotmatrix.rotation_matrices` for the three axes (for
+the X and Z axes, the one of the original shadow_utils.rotate_rays(),
+that kept the opposite sign for the Y axis).
+
+Example
+-------
+
+>>> from sloth.raytracing.ray_transforms import RayTransform
+>>> tr = RayTransform().rotate(10., 3).rotate(-5., 1).translate([0., 10., 0.])
+>>> tr(beam.rays)  #: in place
+
+"""
+
+import numpy as np
+
+from sloth.math.rotmatrix import rotation_matrices
+from sloth.raytracing.ray_tracer import COL_DIR, COL_EP, COL_ES, COL_POS
+
+#: (0-based) column slices of the positions and of the vectors rotated with them
+_COL_POS = slice(COL_POS[0] - 1, COL_POS[-1])
+_COL_VECS = [slice(cols[0] - 1, cols[-1]) for cols in (COL_DIR, COL_ES, COL_EP)]
+
+#: unit vectors of the axes given as SHADOW's columns (1: X, 2: Y, 3: Z)
+_AXES = {1: (1.0, 0.0, 0.0), 2: (0.0, 1.0, 0.0), 3: (0.0, 0.0, 1.0)}
+
+
+def affine_matrix(rot=None, offset=None):
+    """4x4 affine matrix from a 3x3 rotation matrix and a translation
+
+    :param rot: array (3, 3) [None: identity]
+    :param offset: array (3,) [None: no translation]
+    :returns: array (4, 4)
+
+    """
+    mat = np.eye(4)
+    if rot is not None:
+        mat[:3, :3] = rot
+    if offset is not None:
+        mat[:3, 3] = offset
+    return mat
+
+
+def rotation_affine(angle, axis):
+    """4x4 affine matrix of a rotation
+
+    :param angle: rotation angle in degrees
+    :param axis: int, SHADOW's column (1: X, 2: Y, 3: Z), or array (3,),
+                 arbitrary rotation axis; same handedness for both, see
+                 rotmatrix.rotation_matrices()
+    :returns: array (4, 4)
+
+    """
+    if np.ndim(axis) == 0:
+        if axis not in _AXES:
+            raise NameError("Wrong axis")
+        axis = _AXES[axis]
+    rot = rotation_matrices(np.asarray(axis, dtype=float), np.deg2rad(angle))
+    return affine_matrix(rot=rot)
+
+
+def translation_affine(offset):
+    """4x4 affine matrix of a translation by offset, array (3,)"""
+    return affine_matrix(offset=offset)
+
+
+def compose_affine(*mats):
+    """compose 4x4 affine matrices applied in the given order
+
+    :param mats: arrays (4, 4), mats[0] is applied first
+    :returns: array (4, 4), mats[-1] . ... . mats[0]
+
+    """
+    out = np.eye(4)
+    for mat in mats:
+        out = np.dot(mat, out)
+    return out
+
+
+def transform_rays(rays, mat, chunk_size=4096):
+    """apply a 4x4 affine matrix to the rays in place
+
+    :param rays: array (nrays, 18)
+    :param mat: array (4, 4), see affine_matrix() and compose_affine()
+    :param chunk_size: number of rays per matrix product [4096, fits in cache]
+    :returns: rays (the same array)
+
+    """
+    if rays.ndim != 2 or rays.shape[1] != 18:
+        raise ValueError("rays must be an array (nrays, 18)")
+    mat = np.asarray(mat, dtype=float)
+    rot_t = np.ascontiguousarray(mat[:3, :3].T)
+    offset = mat[:3, 3]
+    buf = np.empty((min(chunk_size, len(rays)), 3))
+    for start in range(0, len(rays), chunk_size):
+        chunk = rays[start : start + chunk_size]
+        out = buf[: len(chunk)]
+        np.matmul(chunk[:, _COL_POS], rot_t, out=out)
+        out += offset
+        chunk[:, _COL_POS] = out
+        for cols in _COL_VECS:
+            np.matmul(chunk[:, cols], rot_t, out=out)
+            chunk[:, cols] = out
+    return rays
+
+
+class RayTransform(object):
+    """pipeline of rotations and translations applied as one affine matrix
+
+    The methods return the instance itself, thus can be chained; the
+    transformations are applied in the order they are added.
+    """
+
+    def __init__(self, mat=None):
+        """
+        :param mat: array (4, 4), initial transformation [None: identity]
+        """
+        self.matrix = np.eye(4) if mat is None else np.array(mat, dtype=float)
+
+    def __repr__(self):
+        return "RayTransform({0})".format(self.matrix.tolist())
+
+    def affine(self, mat):
+        """add a 4x4 affine matrix"""
+        self.matrix = compose_affine(self.matrix, mat)
+        return self
+
+    def rotate(self, angle, axis):
+        """add a rotation, see rotation_affine()"""
+        return self.affine(rotation_affine(angle, axis))
+
+    def translate(self, offset):
+        """add a translation by offset, array (3,)"""
+        return self.affine(translation_affine(offset))
+
+    def then(self, other):
+        """new transformation: this one followed by other"""
+        return RayTransform(compose_affine(self.matrix, other.matrix))
+
+    def inverse(self):
+        """new transformation undoing this one"""
+        return RayTransform(np.linalg.inv(self.matrix))
+
+    def __call__(self, rays, chunk_size=4096):
+        """apply in place to rays, see transform_rays()"""
+        return transform_rays(rays, self.matrix, chunk_size=chunk_size)
@@ -1214,6 +1214,36 @@ class ShadowSpectro1(object):
         #     self.det.write("end.02")
         #     self.beam.write("star.02")
 
+    def run_parallel(self, nruns, nrays=None, seed=None, nproc=None):
+        """run independent SHADOW/source and SHADOW/trace on a process
+        pool and merge the rays in self.beam
+
+        Parameters
+        ----------
+        nruns : int
+                number of runs, each with a distinct (odd) seed
+        nrays : int, None
+                rays per run [None: as in self.src]
+        seed : int, None
+               seed of the first run [None: random]
+        nproc : int, None
+                number of processes [None: all cores]
+        """
+        import shutil
+        import tempfile
+        from sloth.raytracing.shadow_utils import ShadowTrace, run_rays_parallel, shadow_seeds
+        self_repair_src(self.src)
+        self_repair_oe(self.oe1)
+        tmpdir = tempfile.mkdtemp(prefix="sloth_spectro1_")
+        try:
+            start_files = [os.path.join(tmpdir, "start.00"), os.path.join(tmpdir, "start.01")]
+            self.src.write(start_files[0])
+            self.oe1.write(start_files[1])
+            trace = ShadowTrace(start_files, nrays=nrays)
+            self.beam.rays = run_rays_parallel(trace, shadow_seeds(nruns, seed=seed), nproc=nproc)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
     def set_rowland_radius(self, Rm, isJohansson=False):
         """set Rowland circle radius [cm]
 
@@ -10,13 +10,14 @@
 import sys
 import os
 import math
+import shutil
+import tempfile
 import numpy as np
 from scipy.interpolate import splrep, sproot, splev
 
-from silx.gui.plot.StackView import StackViewMainWindow
-
 from sloth.fit.peakfit_silx import fit_splitpvoigt
 from sloth.inst.rowland import RcHoriz, RcVert
+from sloth.raytracing.ray_transforms import rotation_affine, transform_rays
 
 from sloth.utils.logging import getLogger
 
@@ -252,6 +253,27 @@ def get_beam_from_file(bin_fname):
     return beam
 
 
+def merge_rays(rays_list, out=None):
+    """merge arrays of rays into one preallocated array
+
+    :param rays_list: list of arrays (nrays, 18)
+    :param out: array (nrays_total, 18) or None (allocated here)
+    :returns: merged rays
+    :rtype: array (nrays_total, 18)
+
+    """
+    nrays = [len(rays) for rays in rays_list]
+    if out is None:
+        out = np.empty((sum(nrays), rays_list[0].shape[1]))
+    elif len(out) != sum(nrays):
+        raise ValueError("out must have {0} rays".format(sum(nrays)))
+    start = 0
+    for rays, nray in zip(rays_list, nrays):
+        out[start : start + nray] = rays
+        start += nray
+    return out
+
+
 def merge_beams(beams):
     """merge a list of beams
 
@@ -261,16 +283,123 @@ def merge_beams(beams):
 
     """
     beam_mrg = Shadow.Beam()
-    beam_mrg.rays = beams[0].rays
-    for ibeam, beam in enumerate(beams):
-        if ibeam == 0:
-            continue
-        beam_mrg.rays = np.append(beam_mrg.rays, beam.rays, axis=0)
+    beam_mrg.rays = merge_rays([beam.rays for beam in beams])
     return beam_mrg
 
 
+def _run_trace(trace, seed, workdir):
+    """run one trace in a worker process, the rays go to workdir/rays.npy"""
+    os.makedirs(workdir, exist_ok=True)
+    rays = trace(seed, workdir)
+    fname = os.path.join(workdir, "rays.npy")
+    np.save(fname, rays)
+    return fname, len(rays)
+
+
+def run_rays_parallel(trace, seeds, nproc=None, tmpdir=None, renumber=True):
+    """run independent traces on a process pool and merge their rays
+
+    Each worker saves its rays to a temporary .npy file, the files are
+    read back (memory mapped) into one preallocated array.
+
+    :param trace: picklable callable, trace(seed, workdir) -> rays (nrays, 18),
+                  one working directory per run (see ShadowTrace)
+    :param seeds: list of seeds, one per run
+    :param nproc: number of processes (None: all cores, 1: in this process)
+    :param tmpdir: directory for the temporary files (None: system default)
+    :param renumber: renumber the rays index (column 12) of the merged rays [True]
+    :returns: merged rays
+    :rtype: array (nrays_total, 18)
+
+    """
+    rundir = tempfile.mkdtemp(prefix="sloth_rays_", dir=tmpdir)
+    workdirs = [os.path.join(rundir, "run{0:04d}".format(irun)) for irun in range(len(seeds))]
+    try:
+        if nproc == 1:
+            outs = [_run_trace(trace, seed, wdir) for seed, wdir in zip(seeds, workdirs)]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=nproc) as pool:
+                outs = list(pool.map(_run_trace, [trace] * len(seeds), seeds, workdirs))
+        rays_list = [np.load(fname, mmap_mode="r") for fname, _ in outs]
+        rays = merge_rays(rays_list)
+        del rays_list
+    finally:
+        shutil.rmtree(rundir, ignore_errors=True)
+    if renumber:
+        rays[:, 11] = np.arange(1, len(rays) + 1)
+    _logger.info("merged {0} runs, {1} rays".format(len(seeds), len(rays)))
+    return rays
+
+
+class ShadowTrace(object):
+    """one SHADOW3 run from start files (picklable, see run_rays_parallel)"""
+
+    def __init__(self, start_files, nrays=None):
+        """
+        :param start_files: list of SHADOW3 start files, source first
+                            (e.g. ['start.00', 'start.01'])
+        :param nrays: number of rays [None: as in the source start file]
+        """
+        self.start_files = [os.path.abspath(fname) for fname in start_files]
+        self.nrays = nrays
+
+    def __call__(self, seed, workdir):
+        import Shadow
+
+        cwd = os.getcwd()
+        #: SHADOW3 writes its files in the current directory
+        os.chdir(workdir)
+        try:
+            src = Shadow.Source()
+            src.load(self.start_files[0])
+            if self.nrays is not None:
+                src.NPOINT = int(self.nrays)
+            src.ISTAR1 = int(seed)
+            beam = Shadow.Beam()
+            beam.genSource(src)
+            for ioe, fname in enumerate(self.start_files[1:], 1):
+                oe = Shadow.OE()
+                oe.load(fname)
+                beam.traceOE(oe, ioe)
+        finally:
+            os.chdir(cwd)
+        return beam.rays
+
+
+def shadow_seeds(nruns, seed=None):
+    """distinct odd seeds for SHADOW3 runs (seed, seed+2, ... or random)"""
+    if seed is None:
+        rng = np.random.default_rng()
+        seeds = 2 * rng.choice(5 * 10**8, size=nruns, replace=False) + 1
+    else:
+        seeds = int(seed) + (1 - int(seed) % 2) + 2 * np.arange(nruns)
+    return [int(seed) for seed in seeds]
+
+
+def run_shadow_parallel(start_files, nruns, nrays=None, seed=None, nproc=None, tmpdir=None):
+    """run independent SHADOW3 traces on a process pool and merge them
+
+    :param start_files: list of SHADOW3 start files, source first
+    :param nruns: number of runs
+    :param nrays: rays per run [None: as in the source start file]
+    :param seed: first seed [None: random], see shadow_seeds
+    :param nproc: number of processes [None: all cores]
+    :param tmpdir: directory for the temporary files
+    :returns: merged beam
+    :rtype: Shadow.Beam()
+
+    """
+    rays = run_rays_parallel(ShadowTrace(start_files, nrays=nrays), shadow_seeds(nruns, seed=seed),
+                             nproc=nproc, tmpdir=tmpdir)
+    beam = Shadow.Beam()
+    beam.rays = rays
+    return beam
+
+
 def rotate_rays(rays, angle, axis):
-    """rotate rays
+    """rotate rays (in place)
 
         Parameters
         ----------
@@ -285,34 +414,17 @@ def rotate_rays(rays, angle, axis):
         Returns
         -------
         array
-            Rotated rays
+            Rotated rays (the same array)
+
+        See also
+        --------
+        sloth.raytracing.ray_transforms.RayTransform, to compose several
+        rotations and translations in a single pass over the rays
         """
-    a1 = rays.copy()
-    rangle = np.deg2rad(angle)
-    if axis == 1:
-        torot = [2, 3]
-    elif axis == 2:
-        torot = [1, 3]
-    elif axis == 3:
-        torot = [1, 2]
-    else:
-        raise NameError("Wrong axis")
-    costh = np.cos(rangle)
-    sinth = np.sin(rangle)
-    tstart = np.array([1, 4, 7, 16])
-    for i in range(len(tstart)):
-        newaxis = axis + tstart[i] - 1
-        newaxisi = newaxis - 1
-        newtorot = torot + tstart[i] - 1
-        newtoroti = newtorot - 1
-        rays[:, newtoroti[0]] = (
-            a1[:, newtoroti[0]] * costh + a1[:, newtoroti[1]] * sinth
-        )
-        rays[:, newtoroti[1]] = (
-            -a1[:, newtoroti[0]] * sinth + a1[:, newtoroti[1]] * costh
-        )
-        rays[:, newaxisi] = a1[:, newaxisi]
-    return rays
+    #: historical convention: opposite handedness for the Y axis
+    if axis == 2:
+        angle = -angle
+    return transform_rays(rays, rotation_affine(angle, axis))
 
 
 ##################
@@ -465,6 +577,8 @@ def plot_fpstack(fps):
     sv : class:`StackViewMainWindow`
 
     """
+    from silx.gui.plot.StackView import StackViewMainWindow
+
     fpStack = np.array([i["histogram"] for i in fps])
     sv = StackViewMainWindow()
     sv.setWindowTitle("footprints (= lost rays at OE)")
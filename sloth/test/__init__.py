@@ -9,9 +9,45 @@ logger = logging.getLogger(__name__)
 
 def suite():
     from . import test_version
+    from . import test_normalization
+    from . import test_datasource_spech5
+    from . import test_convolution1D
+    from . import test_broaden_crispy
+    from . import test_gridxyz
+    from . import test_deglitch
+    from . import test_rotmatrix
+    from . import test_arrays
+    from . import test_xdata
+    from . import test_bragg
+    from . import test_dthetaxz
+    from . import test_sweep
+    from . import test_rowland
+    from . import test_trajectory
+    from . import test_spectro14
+    from . import test_ray_tracer
+    from . import test_shadow_utils
+    from . import test_ray_transforms
 
     test_suite = unittest.TestSuite()
     test_suite.addTest(test_version.suite())
+    test_suite.addTest(test_normalization.suite())
+    test_suite.addTest(test_datasource_spech5.suite())
+    test_suite.addTest(test_convolution1D.suite())
+    test_suite.addTest(test_broaden_crispy.suite())
+    test_suite.addTest(test_gridxyz.suite())
+    test_suite.addTest(test_deglitch.suite())
+    test_suite.addTest(test_rotmatrix.suite())
+    test_suite.addTest(test_arrays.suite())
+    test_suite.addTest(test_xdata.suite())
+    test_suite.addTest(test_bragg.suite())
+    test_suite.addTest(test_dthetaxz.suite())
+    test_suite.addTest(test_sweep.suite())
+    test_suite.addTest(test_rowland.suite())
+    test_suite.addTest(test_trajectory.suite())
+    test_suite.addTest(test_spectro14.suite())
+    test_suite.addTest(test_ray_tracer.suite())
+    test_suite.addTest(test_shadow_utils.suite())
+    test_suite.addTest(test_ray_transforms.suite())
 
     return test_suite
 
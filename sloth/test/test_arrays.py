@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.utils.arrays"""
+
+import unittest
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+from sloth.utils.arrays import StreamMerger1D, interp_arrays_1d, merge_arrays_1d, rebin_piecewise_constant
+
+
+class TestStreamMerger1D(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.linspace(0, 10, 200)
+        self.ys = np.sin(self.x) + rng.normal(scale=0.1, size=(30, 200))
+        self.weights = rng.uniform(0.5, 2, 30)
+
+    def test_welford_vs_numpy(self):
+        mrg = StreamMerger1D()
+        for y, wgt in zip(self.ys, self.weights):
+            mrg.add(self.x, y, weight=wgt)
+        res = mrg.result()
+        np.testing.assert_allclose(res["mean"], np.average(self.ys, axis=0, weights=self.weights), atol=1e-12)
+        mrg = StreamMerger1D(self.x)
+        for y in self.ys:
+            mrg.add(self.x, y)
+        res = mrg.result()
+        np.testing.assert_allclose(res["variance"], self.ys.var(axis=0, ddof=1), atol=1e-12)
+        np.testing.assert_allclose(res["stderr"], self.ys.std(axis=0, ddof=1) / np.sqrt(30), atol=1e-12)
+
+    def test_weighted_variance(self):
+        mrg = StreamMerger1D(self.x)
+        for y, wgt in zip(self.ys, self.weights):
+            mrg.add(self.x, y, weight=wgt)
+        res = mrg.result()
+        v1, v2 = self.weights.sum(), (self.weights ** 2).sum()
+        mean = np.average(self.ys, axis=0, weights=self.weights)
+        var = (self.weights[:, np.newaxis] * (self.ys - mean) ** 2).sum(axis=0) / (v1 - v2 / v1)
+        np.testing.assert_allclose(res["variance"], var, rtol=1e-10)
+        np.testing.assert_allclose(res["stderr"], np.sqrt(var / (v1 ** 2 / v2)), rtol=1e-10)
+        #: rescaled (e.g. inverse-variance) weights give the same results
+        mrg = StreamMerger1D(self.x)
+        for y, wgt in zip(self.ys, self.weights):
+            mrg.add(self.x, y, weight=wgt * 1e-3)
+        res_scaled = mrg.result()
+        for key in ("mean", "variance", "stderr"):
+            np.testing.assert_allclose(res_scaled[key], res[key], rtol=1e-10)
+
+    def test_coverage(self):
+        curves = [[self.x[20:], y[20:], "", {}] for y in self.ys[:10]]
+        curves += [[self.x, y, "", {}] for y in self.ys[10:]]
+        axis, zmrg = merge_arrays_1d(iter(curves), method="welford", axis=self.x)
+        np.testing.assert_allclose(zmrg[:19], self.ys[10:, :19].mean(axis=0), atol=1e-12)
+        np.testing.assert_allclose(zmrg[20:], self.ys[:, 20:].mean(axis=0), atol=1e-12)
+        mrg = StreamMerger1D(self.x)
+        for curve in curves:
+            mrg.add(curve[0], curve[1])
+        self.assertEqual(mrg.result()["coverage"][0], 20)
+        self.assertEqual(mrg.result()["coverage"][-1], 30)
+
+    def test_zero_weight(self):
+        curves = [[self.x, y, "", {}] for y in self.ys[:3]]
+        weights = [0.0, 1.0, 1.0]
+        _, zavg = merge_arrays_1d(curves, method="average", axis=self.x, weights=weights)
+        _, zmrg = merge_arrays_1d(curves, method="welford", axis=self.x, weights=weights)
+        self.assertFalse(np.isnan(zmrg).any())
+        np.testing.assert_allclose(zmrg, zavg, atol=1e-12)
+
+
+class TestInterpArrays(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.x = np.linspace(0, 10, 101)
+        self.zs = rng.normal(size=(5, 101))
+        #: out of range on both sides, points on the grid and between
+        self.axis = np.linspace(-0.5, 10.5, 221)
+
+    def _ref(self, xdat, zdat, kind="linear"):
+        return interp1d(xdat, zdat, kind=kind, bounds_error=False, fill_value=np.nan)(self.axis)
+
+    def test_shared_grid(self):
+        out = interp_arrays_1d([self.x] * 5, self.zs, self.axis)
+        self.assertEqual(out.shape, (5, self.axis.size))
+        self.assertTrue(np.isnan(out[:, self.axis < 0]).all() and np.isnan(out[:, self.axis > 10]).all())
+        for zdat, row in zip(self.zs, out):
+            np.testing.assert_allclose(row, self._ref(self.x, zdat), atol=1e-12, equal_nan=True)
+        #: a NaN sample only affects the interpolated points next to it
+        zs = self.zs.copy()
+        zs[0, 50] = np.nan
+        out = interp_arrays_1d([self.x] * 5, zs, self.axis)
+        near = np.abs(self.axis - self.x[50]) < 0.075
+        self.assertTrue(np.isnan(out[0, near]).all())
+        self.assertFalse(np.isnan(out[0, ~near & (self.axis >= 0) & (self.axis <= 10)]).any())
+
+    def test_unsorted(self):
+        rng = np.random.default_rng(3)
+        xdats = [self.x[::-1], rng.permutation(self.x), self.x + 0.05]
+        zdats = [self.zs[0][::-1], self.zs[1], self.zs[2]]
+        out = interp_arrays_1d(xdats, zdats, self.axis)
+        for xdat, zdat, row in zip(xdats, zdats, out):
+            np.testing.assert_allclose(row, self._ref(xdat, zdat), atol=1e-12, equal_nan=True)
+
+    def test_kind(self):
+        xdats = [self.x, self.x + 0.05]
+        out = interp_arrays_1d(xdats, self.zs[:2], self.axis, kind="cubic")
+        for xdat, zdat, row in zip(xdats, self.zs, out):
+            np.testing.assert_allclose(row, self._ref(xdat, zdat, kind="cubic"), atol=1e-12, equal_nan=True)
+
+    def test_fill_value(self):
+        xdats = [self.x] * 2
+        out = interp_arrays_1d(xdats, self.zs[:2], self.axis, fill_value="extrapolate")
+        self.assertFalse(np.isnan(out).any())
+        for zdat, row in zip(self.zs, out):
+            ref = interp1d(self.x, zdat, fill_value="extrapolate")(self.axis)
+            np.testing.assert_allclose(row, ref, atol=1e-12)
+        out = interp_arrays_1d(xdats, self.zs[:2], self.axis, fill_value=(-1.0, 1.0))
+        np.testing.assert_array_equal(out[:, self.axis < 0], -1.0)
+        np.testing.assert_array_equal(out[:, self.axis > 10], 1.0)
+        with self.assertRaises(ValueError):
+            interp_arrays_1d(xdats, self.zs[:2], self.axis, bounds_error=True)
+
+
+class TestRebin(unittest.TestCase):
+    def test_rebin_batch(self):
+        rng = np.random.default_rng(1)
+        x1 = np.sort(rng.uniform(0, 10, 41))
+        x2 = np.linspace(-1, 11, 17)
+        ys = rng.uniform(size=(50, 40))
+        ys2 = rebin_piecewise_constant(x1, ys, x2)
+        self.assertEqual(ys2.shape, (50, 16))
+        np.testing.assert_allclose(ys2.sum(axis=1), ys.sum(axis=1), rtol=1e-12)
+        np.testing.assert_allclose(rebin_piecewise_constant(x1, ys[3], x2), ys2[3], rtol=1e-12)
+
+    def test_rebin_fractions(self):
+        y2 = rebin_piecewise_constant([0, 1, 2], [2.0, 4.0], [0, 0.5, 1.5, 2])
+        np.testing.assert_allclose(y2, [1.0, 3.0, 2.0])
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestStreamMerger1D))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestInterpArrays))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestRebin))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
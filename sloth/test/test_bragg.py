@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.utils.bragg"""
+
+import unittest
+
+import numpy as np
+
+from sloth.utils.bragg import SI_ALAT, bragg_th, d_cubic, find_reflections, findhkl, hkl_table
+
+
+class TestHklTable(unittest.TestCase):
+    def test_extinction(self):
+        table = hkl_table("Si")
+        hkl = np.stack((table["h"], table["k"], table["l"]), axis=1)
+        labels = set(table["crys_lab"])
+        self.assertIn("Si(1,1,1)", labels)
+        self.assertIn("Si(4,4,4)", labels)
+        self.assertNotIn("Si(2,2,2)", labels)
+        self.assertNotIn("Si(2,1,0)", labels)
+        self.assertTrue((hkl.sum(axis=1)[(hkl % 2 == 0).all(axis=1)] % 4 == 0).all())
+        i444 = list(table["crys_lab"]).index("Si(4,4,4)")
+        self.assertEqual(table["crys0_lab"][i444], "Si(1,1,1)")
+        self.assertAlmostEqual(table["d"][i444], d_cubic(SI_ALAT, (4, 4, 4)))
+
+    def test_findhkl(self):
+        best = findhkl(8047.8, thetamin=65, retBest=True, verbose=False)
+        self.assertEqual(best[5], "Si(4,4,4)")
+        self.assertAlmostEqual(best[4], bragg_th(8047.8, d_cubic(SI_ALAT, (4, 4, 4))))
+        crys, table, theta = find_reflections(np.array([8047.8, 6403.8]), thetamin=65)
+        self.assertEqual(theta.shape, (2, len(crys)))
+        self.assertEqual(np.count_nonzero(~np.isnan(theta[0])),
+                         len(findhkl(8047.8, thetamin=65, retAll=True, verbose=False)))
+
+    def test_unknown_crystal(self):
+        with self.assertRaises(ValueError):
+            hkl_table("Xx")
+        with self.assertRaises(ValueError):
+            find_reflections(8047.8, crystal="Xx")
+        #: findhkl falls back to Si and Ge
+        self.assertEqual(findhkl(8047.8, crystal="Xx", retAll=True, verbose=False),
+                         findhkl(8047.8, crystal="all", retAll=True, verbose=False))
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestHklTable))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
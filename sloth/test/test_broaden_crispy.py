@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.math.broaden_crispy"""
+
+import unittest
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+from sloth.math import broaden_crispy
+from sloth.math.broaden_crispy import (
+    broaden,
+    convolve_fft,
+    gaussian_kernel1d,
+    gaussian_kernel2d,
+)
+
+
+class TestConvolveFFT(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.arr1d = rng.random(301)
+        self.arr2d = rng.random((120, 97))
+        self.stack = rng.random((4, 120, 97))
+
+    def test_1d(self):
+        kernel = gaussian_kernel1d(3.0)
+        np.testing.assert_allclose(convolve_fft(self.arr1d, kernel),
+                                   fftconvolve(self.arr1d, kernel, mode="same"), atol=1e-12)
+
+    def test_2d(self):
+        kernel = gaussian_kernel2d(np.array([2.0, 1.5]))
+        np.testing.assert_allclose(convolve_fft(self.arr2d, kernel),
+                                   fftconvolve(self.arr2d, kernel, mode="same"), atol=1e-12)
+
+    def test_stack(self):
+        kernel = gaussian_kernel2d(np.array([2.0, 1.5]))
+        out = convolve_fft(self.stack, kernel)
+        for plane, ref in zip(self.stack, out):
+            np.testing.assert_allclose(ref, fftconvolve(plane, kernel, mode="same"), atol=1e-12)
+        kernel = gaussian_kernel1d(2.5)
+        out = convolve_fft(self.stack, kernel, axes=(1,))
+        ref = fftconvolve(self.stack, kernel[np.newaxis, :, np.newaxis], mode="same", axes=1)
+        np.testing.assert_allclose(out, ref, atol=1e-12)
+
+    def test_broaden_cache(self):
+        broaden_crispy._KERNEL_RFFT_CACHE.clear()
+        out = broaden(self.stack, fwhm=[4.0, 3.0], spacing=[1.0, 1.0])
+        self.assertEqual(len(broaden_crispy._KERNEL_RFFT_CACHE), 1)
+        cached = next(iter(broaden_crispy._KERNEL_RFFT_CACHE.values()))
+        out2 = broaden(self.stack, fwhm=[4.0, 3.0])
+        self.assertEqual(len(broaden_crispy._KERNEL_RFFT_CACHE), 1)
+        self.assertIs(next(iter(broaden_crispy._KERNEL_RFFT_CACHE.values())), cached)
+        np.testing.assert_array_equal(out, out2)
+        sigma = np.array([4.0, 3.0]) / (2 * np.sqrt(2 * np.log(2)))
+        ref = fftconvolve(self.stack[0], gaussian_kernel2d(sigma), mode="same")
+        np.testing.assert_allclose(out[0], ref, atol=1e-12)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestConvolveFFT))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
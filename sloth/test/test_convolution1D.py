@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.math.convolution1D"""
+
+import math
+import os
+import unittest
+
+import numpy as np
+
+from sloth.math import convolution1D
+from sloth.math.convolution1D import (
+    FDMNES_EFERMI,
+    FdmnesConv,
+    _conv_loop,
+    conv,
+    conv_fdmnes,
+    conv_matrix,
+    conv_sparse,
+    fdmnes_gamma,
+    lin_gamma,
+)
+
+CURDIR = os.path.dirname(os.path.realpath(__file__))
+DATA = os.path.join(CURDIR, "testdata")
+
+
+def _fdmnes_loop(e, mu, gamma_hole, ecent, elarg, gamma_max, efermi, gaussian,
+                 gamma_type="Gamma_fix"):
+    """scalar, point by point, FDMNES convolution (reference for conv_fdmnes)"""
+    e = [float(en) for en in e]
+    lo = [e[0] - 0.5 * (e[1] - e[0])] + [0.5 * (e[j] + e[j - 1]) for j in range(1, len(e))]
+    hi = lo[1:] + [math.inf]
+
+    def width(en):
+        erel = (en - efermi) / ecent
+        if erel <= 0:
+            return gamma_hole
+        arg = math.pi / 3 * gamma_max / elarg * (erel - 1.0 / erel ** 2)
+        return gamma_hole + gamma_max * (0.5 + math.atan(arg) / math.pi)
+
+    f = [0.0 if en < efermi else float(m) for en, m in zip(e, mu)]
+    z = []
+    for ei in e:
+        zi = 0.0
+        for j, ej in enumerate(e):
+            hw = 0.5 * width(ei if gamma_type == "Gamma_fix" else ej)
+            zi += f[j] * (math.atan((hi[j] - ei) / hw) - math.atan((lo[j] - ei) / hw)) / math.pi
+        z.append(zi)
+    sig2 = math.sqrt(2) * gaussian / (2 * math.sqrt(2 * math.log(2)))
+    out = []
+    for ei in e:
+        g = [0.5 * (math.erf((h - ei) / sig2) - math.erf((l - ei) / sig2)) for l, h in zip(lo, hi)]
+        out.append(sum(zj * gj for zj, gj in zip(z, g)) / sum(g))
+    return np.array(out)
+
+
+class TestConvFdmnes(unittest.TestCase):
+    """compare with a reference computed from documented parameters
+
+    testdata/fdmnes_conv_ref.dat is the output of _fdmnes_loop() for the
+    parameters below (see its header), for both gamma types
+    """
+
+    def setUp(self):
+        dat = np.loadtxt(os.path.join(DATA, "fdmnes_conv_in.dat"))
+        self.ene = dat[:, 0]
+        self.mus = dat[:, 1:3] + dat[:, 3:5]  #: sum of the two absorbing sites
+        self.ref = np.loadtxt(os.path.join(DATA, "fdmnes_conv_ref.dat"))
+        self.pars = dict(gamma_hole=1.0, ecent=30.0, elarg=30.0, gamma_max=15.0,
+                         efermi=FDMNES_EFERMI, gaussian=0.9)
+
+    def test_reference(self):
+        np.testing.assert_array_equal(self.ref[:, 0], self.ene)
+        for igt, gamma_type in enumerate(("Gamma_fix", "Gamma_var")):
+            for icol, mu in enumerate(self.mus.T):
+                mu_ref = self.ref[:, 1 + 2 * igt + icol]
+                mu_conv = conv_fdmnes(self.ene, mu, gamma_type=gamma_type, **self.pars)
+                np.testing.assert_allclose(mu_conv, mu_ref, rtol=1e-6)
+        mu_loop = _fdmnes_loop(self.ene, self.mus[:, 0], **self.pars)
+        np.testing.assert_allclose(mu_loop, self.ref[:, 1], rtol=1e-6)
+
+    def test_batch(self):
+        gmax = np.array([5.0, 10.0, 15.0])
+        ecent = np.array([20.0, 30.0])
+        mu = self.mus[:, 0]
+        pars = dict(gamma_hole=1.0, efermi=FDMNES_EFERMI, gaussian=0.9)
+        mu_conv = conv_fdmnes(self.ene, mu, gamma_max=gmax[:, np.newaxis],
+                              ecent=ecent[np.newaxis, :], **pars)
+        self.assertEqual(mu_conv.shape, (3, 2, self.ene.size))
+        for igm, gm in enumerate(gmax):
+            for iec, ec in enumerate(ecent):
+                ref = conv_fdmnes(self.ene, mu, gamma_max=gm, ecent=ec, **pars)
+                np.testing.assert_allclose(mu_conv[igm, iec], ref, rtol=1e-12)
+
+    def test_no_efermi(self):
+        gam = fdmnes_gamma(self.ene, efermi=None)
+        np.testing.assert_array_equal(gam, fdmnes_gamma(self.ene, efermi=FDMNES_EFERMI))
+        self.assertGreater(np.ptp(gam), 10.)
+        mu = self.mus[:, 0]
+        pars = dict(gamma_hole=1.5, gaussian=1.5)
+        np.testing.assert_array_equal(conv_fdmnes(self.ene, mu, efermi=None, **pars),
+                                      conv_fdmnes(self.ene, mu, efermi=FDMNES_EFERMI, **pars))
+        fc = FdmnesConv(fn_in=os.path.join(DATA, "fdmnes_conv_in.dat"))
+        fc.opts["efermi_sel"] = "!"
+        ene, mu_conv = fc.convolve()
+        fc.opts["efermi_sel"] = ""
+        np.testing.assert_array_equal(fc.convolve(efermi=FDMNES_EFERMI)[1], mu_conv)
+
+    def test_blocks(self):
+        mu = self.mus[:, 0]
+        for gamma_type in ("Gamma_fix", "Gamma_var"):
+            ref = conv_fdmnes(self.ene, mu, gamma_type=gamma_type, **self.pars)
+            block = convolution1D._CONV_FDMNES_BLOCK
+            convolution1D._CONV_FDMNES_BLOCK = 10 * self.ene.size
+            try:
+                mu_conv = conv_fdmnes(self.ene, mu, gamma_type=gamma_type, **self.pars)
+            finally:
+                convolution1D._CONV_FDMNES_BLOCK = block
+            np.testing.assert_allclose(mu_conv, ref, rtol=1e-12)
+
+    def test_class(self):
+        fc = FdmnesConv(fn_in=os.path.join(DATA, "fdmnes_conv_in.dat"))
+        ene, mu_conv = fc.convolve(**self.pars)
+        self.assertEqual(mu_conv.shape, (4, ene.size))
+
+
+class TestConvSparse(unittest.TestCase):
+    """compare with the original loop implementation"""
+
+    def setUp(self):
+        dat = np.loadtxt(os.path.join(DATA, "fdmnes_conv_in.dat"))
+        self.ene = dat[:, 0]
+        self.mu = dat[:, 1]
+        self.fwhm = lin_gamma(self.ene, fwhm=1.2, linbroad=[5, -6, 60])
+
+    def test_loop(self):
+        for kernel in ("gaussian", "lorentzian"):
+            ref = _conv_loop(self.ene, self.mu, kernel=kernel, fwhm_e=self.fwhm, efermi=-5)
+            mu_conv = conv(self.ene, self.mu, kernel=kernel, fwhm_e=self.fwhm, efermi=-5)
+            np.testing.assert_allclose(mu_conv, ref, rtol=1e-10, atol=1e-14)
+
+    def test_batch(self):
+        mus = np.array([self.mu, 2 * self.mu, self.mu + 1])
+        mu_conv = conv_sparse(self.ene, mus, kernel="pvoigt", fwhm_e=self.fwhm)
+        self.assertEqual(mu_conv.shape, mus.shape)
+        for mu, ref in zip(mus, mu_conv):
+            np.testing.assert_allclose(
+                conv_sparse(self.ene, mu, kernel="pvoigt", fwhm_e=self.fwhm), ref)
+
+    def test_pvoigt(self):
+        #: kernel points below the first one are dropped (as in _conv_loop)
+        inner = (self.ene - 1.5 * self.fwhm) > self.ene[0]
+        kmat, kext = conv_matrix(self.ene, self.fwhm, kernel="pvoigt", eta=0.3)
+        np.testing.assert_allclose((np.asarray(kmat.sum(axis=1)).ravel() + kext[1])[inner], 1.)
+        ones = conv_sparse(self.ene, np.ones_like(self.ene), kernel="pvoigt", fwhm_e=self.fwhm)
+        np.testing.assert_allclose(ones[inner], 1.)
+        for eta, kernel in ((0., "gaussian"), (1., "lorentzian")):
+            np.testing.assert_allclose(
+                conv_sparse(self.ene, self.mu, kernel="pvoigt", fwhm_e=self.fwhm, eta=eta),
+                conv_sparse(self.ene, self.mu, kernel=kernel, fwhm_e=self.fwhm), rtol=1e-12)
+        gau = conv_sparse(self.ene, self.mu, kernel="gaussian", fwhm_e=self.fwhm)
+        lor = conv_sparse(self.ene, self.mu, kernel="lorentzian", fwhm_e=self.fwhm)
+        np.testing.assert_allclose(
+            conv_sparse(self.ene, self.mu, kernel="pvoigt", fwhm_e=self.fwhm, eta=0.3),
+            0.3 * lor + 0.7 * gau, rtol=1e-10)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestConvFdmnes))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestConvSparse))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
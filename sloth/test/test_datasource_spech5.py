@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.io.datasource_spech5 (requires silx and larch)"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+try:
+    from sloth.io.datasource_spech5 import DataSourceSpecH5
+
+    HAS_SPECH5 = True
+except ImportError:
+    HAS_SPECH5 = False
+
+SPEC_SCAN = """#F test.spec
+#D Mon Oct 19 10:00:00 2026
+
+#S 1 ascan  ene 7.0 7.3 6 1
+#D Mon Oct 19 10:00:01 2026
+#N 4
+#L ene  I0  I1  I2
+"""
+
+
+@unittest.skipUnless(HAS_SPECH5, "silx or larch not installed")
+class TestGetCurvesSignals(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        ene = np.array([7.0, 7.01, 7.03, 7.06, 7.1, 7.2, 7.3])
+        i1 = 10 + 50 / (1 + np.exp(-(ene - 7.05) / 0.01))
+        rows = np.column_stack((ene, np.full_like(ene, 100.0), i1, 2 * i1 + 5))
+        fname = os.path.join(self.tmpdir, "test.spec")
+        with open(fname, "w") as fspec:
+            fspec.write(SPEC_SCAN)
+            np.savetxt(fspec, rows, fmt="%.6f")
+        self.ds = DataSourceSpecH5(fname)
+        self.ds.set_scan(1)
+
+    def tearDown(self):
+        self.ds.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_same_as_signal_data(self):
+        signals = ["I1", "I2"]
+        for method in ("max", "max-min", "area", "sum"):
+            norm = dict(method=method)
+            curves = self.ds.get_curves_signals(signals, norm=norm)
+            for signal, curve in zip(signals, curves):
+                label, sig_data = self.ds.get_signal_data(signal, norm=norm)
+                self.assertEqual(curve[3]["sig_label"], label)
+                np.testing.assert_allclose(curve[1], sig_data, rtol=1e-6)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestGetCurvesSignals))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
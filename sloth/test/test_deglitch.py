@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.math.deglitch"""
+
+import unittest
+
+import numpy as np
+
+from sloth.math.deglitch import remove_spikes_pandas, remove_spikes_stack
+
+
+class TestDeglitch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = np.linspace(0, 20, 2000)
+        self.ys = np.sin(self.x)[np.newaxis, :] + 0.01 * rng.standard_normal((50, 2000))
+        self.spikes = (rng.integers(0, 50, 40), rng.integers(5, 1995, 40))
+        self.spiky = self.ys.copy()
+        self.spiky[self.spikes] += 0.5
+
+    def test_clean_stack(self):
+        for kernel_size in (5, 7):
+            ynew, mask = remove_spikes_stack(self.ys, kernel_size=kernel_size)
+            self.assertFalse(mask.any())
+            np.testing.assert_array_equal(ynew, self.ys)
+
+    def test_rolling(self):
+        ynew, mask = remove_spikes_stack(self.spiky)
+        self.assertEqual(mask.shape, self.spiky.shape)
+        self.assertTrue(mask[self.spikes].all())
+        self.assertEqual(np.count_nonzero(mask), np.count_nonzero(self.spiky != self.ys))
+        self.assertLess(np.abs(ynew - self.ys).max(), 0.1)
+        ynew_t, mask_t = remove_spikes_stack(self.spiky.T, axis=0)
+        np.testing.assert_array_equal(mask_t, mask.T)
+        np.testing.assert_array_equal(ynew_t, ynew.T)
+
+    def test_repeats(self):
+        ynew, mask = remove_spikes_stack(self.spiky, mode="repeats")
+        self.assertTrue(mask[self.spikes].all())
+        self.assertLess(np.abs(ynew - self.ys).max(), 0.1)
+        self.assertRaises(ValueError, remove_spikes_stack, self.spiky, mode="unknown")
+
+    def test_pandas(self):
+        y = self.ys[0].copy()
+        y[[100, 1000]] += 5.
+        ynew = remove_spikes_pandas(y, window=5, threshold=3)
+        self.assertEqual(ynew.shape, y.shape)
+        self.assertFalse(np.isnan(ynew).any())
+        self.assertLess(np.abs(ynew - self.ys[0]).max(), 0.1)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestDeglitch))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
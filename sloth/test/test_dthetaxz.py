@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.inst.dthetaxz (batched vs scalar)"""
+
+import math
+import unittest
+
+import numpy as np
+import numpy.ma as ma
+
+from sloth.inst.dthetaxz import (dThetaCoeffsPairs, dThetaXZ, dThetaXZStack, getDthetaStats, getDthetaSummary,
+                                 getMeshCompressed, getMeshMasked)
+
+
+class TestDthetaXZ(unittest.TestCase):
+    def setUp(self):
+        x0 = np.linspace(-0.05, 0.05, 101)
+        xx, zz = np.meshgrid(x0, x0)
+        cmask = xx**2 + zz**2 >= 0.05**2
+        self.mxx = ma.array(xx, mask=cmask)
+        self.mzz = ma.array(zz, mask=cmask)
+        self.cases = list(range(1, 11))
+        self.angles = [15., 35., 60., 85.]
+
+    def test_stack(self):
+        dths = dThetaXZStack(self.mxx.data, self.mzz.data, self.angles, self.cases)
+        self.assertEqual(dths.shape, (10, 4, 101, 101))
+        for ics, cs in enumerate(self.cases):
+            for ith, th in enumerate(self.angles):
+                np.testing.assert_allclose(dths[ics, ith], dThetaXZ(self.mxx.data, self.mzz.data, th, case=cs),
+                                           rtol=1e-12, atol=1e-18)
+
+    def test_summary(self):
+        wrc = 1.25E-4
+        sa, eres = getDthetaSummary(self.mxx, self.mzz, wrc=wrc, cases=self.cases, angles=self.angles, chunk=3)
+        area = (self.mxx.data[0][1] - self.mxx.data[0][0])**2
+        for ics, cs in enumerate(self.cases):
+            for ith, th in enumerate(self.angles):
+                dth = dThetaXZ(self.mxx, self.mzz, th, case=cs)
+                neff = np.count_nonzero(np.abs(dth.compressed()) <= wrc)
+                self.assertAlmostEqual(sa[ics, ith], neff * area / math.sin(math.radians(th)))
+                self.assertAlmostEqual(eres[ics, ith],
+                                       math.sqrt((dth.max() - dth.min())**2 + wrc**2) / math.tan(math.radians(th)))
+
+    def test_stats_fwhm(self):
+        x, z = self.mxx.compressed(), self.mzz.compressed()
+        cases = np.repeat(self.cases, len(self.angles))
+        angles = np.tile(self.angles, len(self.cases))
+        stats = getDthetaStats(x, z, dThetaCoeffsPairs(cases, angles), nbins=50, chunk=3, block=3000)
+        for ipair, (cs, th) in enumerate(zip(cases, angles)):
+            dth = dThetaXZ(x, z, th, case=int(cs))
+            if dth.max() == dth.min():
+                self.assertEqual(stats['fwhm'][ipair], 0.)
+                continue
+            hist, edges = np.histogram(dth, bins=50, range=(dth.min(), dth.max()))
+            above = np.flatnonzero(hist >= hist.max() / 2)
+            ref = edges[above[-1] + 1] - edges[above[0]]
+            self.assertAlmostEqual(stats['fwhm'][ipair], ref, delta=1e-3 * (dth.max() - dth.min()) + 1e-18)
+
+    def test_mesh_compressed(self):
+        for mask in ('circular', 'rectangular'):
+            mxx, mzz = getMeshMasked(mask, csteps=151j)
+            x, z, area = getMeshCompressed(mask, csteps=151j)
+            self.assertEqual(len(x), mxx.count())
+            self.assertEqual(sorted(zip(x, z)), sorted(zip(mxx.compressed(), mzz.compressed())))
+            sa, eres = getDthetaSummary(mxx, mzz, cases=self.cases, angles=self.angles)
+            sa32, eres32 = getDthetaSummary(*getMeshCompressed(mask, csteps=151j, dtype=np.float32)[:2],
+                                            cases=self.cases, angles=self.angles, area=area, block=1000)
+            np.testing.assert_allclose(sa32, sa, rtol=1e-3)
+            np.testing.assert_allclose(eres32, eres, rtol=1e-5)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestDthetaXZ))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.math.gridxyz"""
+
+import unittest
+
+import numpy as np
+from scipy.interpolate import griddata
+
+from sloth.math import gridxyz as gridxyz_mod
+from sloth.math.gridxyz import GridXYZ, get_triangulation, gridxyz
+
+
+class TestGridXYZ(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.xcol = rng.uniform(0, 2, 500)
+        self.ycol = rng.uniform(0, 1, 500)
+        self.zcols = np.column_stack((np.sin(3 * self.xcol) * self.ycol, self.xcol ** 2 + self.ycol))
+
+    def test_griddata(self):
+        for method in ("linear", "cubic", "nearest"):
+            xgrid, ygrid, zz = GridXYZ(self.xcol, self.ycol, xystep=0.05, method=method)(self.zcols)
+            xx, yy = np.meshgrid(xgrid, ygrid)
+            self.assertEqual(zz.shape, xx.shape + (2,))
+            for ich in range(2):
+                ref = griddata((self.xcol, self.ycol), self.zcols[:, ich], (xx, yy),
+                               method=method, fill_value=0)
+                np.testing.assert_allclose(zz[:, :, ich], ref, rtol=1e-10, atol=1e-12)
+        xgrid, ygrid, zz1 = gridxyz(self.xcol, self.ycol, self.zcols[:, 0], xystep=0.05, method="linear")
+        ref = griddata((self.xcol, self.ycol), self.zcols[:, 0], (xx, yy), method="linear", fill_value=0)
+        np.testing.assert_allclose(zz1, ref, rtol=1e-10, atol=1e-12)
+
+    def test_triangulation_cache(self):
+        gridxyz_mod._TRI_CACHE.clear()
+        tri = get_triangulation(self.xcol, self.ycol)
+        self.assertIs(get_triangulation(self.xcol.copy(), self.ycol.copy()), tri)
+        GridXYZ(self.xcol, self.ycol, xystep=0.05, method="linear")(self.zcols[:, 0])
+        GridXYZ(self.xcol, self.ycol, xystep=0.1, method="cubic")(self.zcols[:, 1])
+        self.assertEqual(len(gridxyz_mod._TRI_CACHE), 1)
+        self.assertIs(next(iter(gridxyz_mod._TRI_CACHE.values())), tri)
+
+    def test_bin(self):
+        #: scan on the mesh points, each measured twice (z and z + 1)
+        xgrid = np.linspace(0, 2, 21)
+        ygrid = np.linspace(0, 2, 21)
+        xx, yy = np.meshgrid(xgrid, ygrid)
+        xcol = np.tile(xx.ravel(), 2)
+        ycol = np.tile(yy.ravel(), 2)
+        zz = xx + 10 * yy
+        zcol = np.concatenate((zz.ravel(), zz.ravel() + 1))
+        grid = GridXYZ(xcol, ycol, xystep=2 / 21.5, method="bin")
+        xg, yg, zbin = grid(zcol)
+        np.testing.assert_allclose(xg, xgrid)
+        np.testing.assert_allclose(yg, ygrid)
+        np.testing.assert_allclose(zbin, zz + 0.5)
+        #: empty bins get the fill value
+        keep = xcol < 1.5
+        xg, yg, zbin = GridXYZ(xcol[keep], ycol[keep], xystep=0.05, method="bin", fill_value=-1)(zcol[keep])
+        self.assertTrue((zbin == -1).any())
+        filled = zbin[zbin != -1]
+        self.assertTrue((filled >= zcol[keep].min()).all() and (filled <= zcol[keep].max()).all())
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestGridXYZ))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.math.normalization"""
+
+import unittest
+
+import numpy as np
+
+from sloth.math.normalization import (
+    denorm1D_stack,
+    norm1D,
+    norm1D_stack,
+    pre_edge_matrix,
+)
+
+HAS_LARCH = False
+try:
+    from larch.xafs import preedge
+
+    HAS_LARCH = True
+except ImportError:
+    pass
+
+
+def _dummy_xas_channels(nchannels=12, seed=0):
+    """multi-channel step-like XAS spectra on a shared energy grid"""
+    rng = np.random.default_rng(seed)
+    ene = np.concatenate([np.arange(6900, 7100, 2.0), np.arange(7100, 7600, 0.5)])
+    edge = 1.0 / (1.0 + np.exp(-(ene - 7112.0) / 2.0))
+    base = 0.1 + 1e-5 * (ene - 6900) + edge * (1 - 2e-4 * (ene - 7112).clip(0))
+    amps = rng.uniform(0.5, 2, nchannels)[:, np.newaxis]
+    offs = rng.uniform(0, 0.3, nchannels)[:, np.newaxis]
+    noise = 0.002 * rng.standard_normal((nchannels, ene.size))
+    return ene, amps * base + offs + noise
+
+
+class TestPreEdgeMatrix(unittest.TestCase):
+    def test_shapes(self):
+        ene, mus = _dummy_xas_channels()
+        out = pre_edge_matrix(ene, mus)
+        self.assertEqual(out["norm"].shape, mus.shape)
+        self.assertEqual(out["edge_step"].shape, (mus.shape[0],))
+        self.assertAlmostEqual(out["e0"], 7112.0, delta=2.0)
+
+    @unittest.skipUnless(HAS_LARCH, "larch not available")
+    def test_larch(self):
+        ene, mus = _dummy_xas_channels()
+        out = pre_edge_matrix(ene, mus, e0=7112.0)
+        for ich, mu in enumerate(mus):
+            ref = preedge(ene, mu, e0=7112.0)
+            np.testing.assert_allclose(out["edge_step"][ich], ref["edge_step"], rtol=1e-8)
+            np.testing.assert_allclose(out["norm"][ich], ref["norm"], atol=1e-8)
+            np.testing.assert_allclose(out["post_edge"][ich], ref["post_edge"], atol=1e-8)
+
+
+class TestNorm1DStack(unittest.TestCase):
+    def test_norm1D(self):
+        ene, mus = _dummy_xas_channels()
+        for norm in ("max", "max-min", "area", "sum", None):
+            ynorm, factors = norm1D_stack(mus, norm=norm, x=ene)
+            for mu, yn in zip(mus, ynorm):
+                np.testing.assert_array_equal(yn, norm1D(mu, norm=norm, x=ene))
+            np.testing.assert_allclose(denorm1D_stack(ynorm, factors), mus)
+
+    def test_edge_step(self):
+        ene, mus = _dummy_xas_channels()
+        ynorm, factors = norm1D_stack(mus, norm="edge-step", x=ene, e0=7112.0)
+        ref = pre_edge_matrix(ene, mus, e0=7112.0)
+        np.testing.assert_allclose(ynorm, ref["norm"])
+        np.testing.assert_allclose(denorm1D_stack(ynorm, factors), mus)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestPreEdgeMatrix))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestNorm1DStack))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.raytracing.ray_tracer"""
+
+import unittest
+
+import numpy as np
+
+from sloth.raytracing.ray_tracer import AnalyserTracer, rays_energy, rays_intensity
+from sloth.utils.bragg import SI_ALAT, d_cubic
+
+
+class TestAnalyserTracer(unittest.TestCase):
+    def setUp(self):
+        self.kws = dict(Rm=500., theta0=75., dspacing=d_cubic(SI_ALAT, (5, 5, 5)), aperture=(50., 100.))
+
+    def test_johansson_focus(self):
+        tr = AnalyserTracer(kind="johansson", shape="cylindrical", **self.kws)
+        rays = tr.source(10000, rng=np.random.default_rng(0))
+        rays[:, 3] = 0.  #: meridional rays
+        rays[:, 3:6] /= np.linalg.norm(rays[:, 3:6], axis=1, keepdims=True)
+        rays, dtheta = tr.trace(rays)
+        good = rays[:, 9] > 0
+        self.assertGreater(good.mean(), 0.95)
+        np.testing.assert_allclose(dtheta[good], 0., atol=1e-9)
+        np.testing.assert_allclose(rays[good, 2], 0., atol=1e-8)
+        np.testing.assert_allclose(rays_intensity(rays[good]), 1.)
+        np.testing.assert_allclose(rays_energy(rays), tr.ene0)
+
+    def test_source_coverage(self):
+        for kind, shape in (("johann", "spherical"), ("johansson", "cylindrical")):
+            kws = dict(self.kws, theta0=35., aperture=(100., 100.))
+            tr = AnalyserTracer(kind=kind, shape=shape, **kws)
+            rays = tr.source(100000, rng=np.random.default_rng(1))
+            s1 = tr._intersect(rays[:, 0:3], rays[:, 3:6])
+            pts = rays[:, 0:3] + s1[:, np.newaxis] * rays[:, 3:6]
+            good = tr._in_aperture(pts)
+            self.assertGreater(good.mean(), 0.8)
+            u = pts[good, 0]
+            v = (pts[good] - tr.ana_pos) @ tr.tangent
+            for val in (u, v):
+                self.assertLess(val.min(), -49.5)
+                self.assertGreater(val.max(), 49.5)
+            #: the two meridional halves of the crystal are illuminated alike
+            self.assertAlmostEqual(np.mean(v < 0), 0.5, delta=0.05)
+
+    def test_lost_rays_frame(self):
+        tr = AnalyserTracer(kind="johann", shape="spherical", **self.kws)
+        rays = tr.source(2000, rng=np.random.default_rng(2))
+        rays[:500, 3] += 0.5  #: out of the crystal aperture
+        rays[:, 3:6] /= np.linalg.norm(rays[:, 3:6], axis=1, keepdims=True)
+        rays_glob, _ = tr.trace(rays.copy(), frame="global")
+        rays_det, _ = tr.trace(rays.copy(), frame="detector")
+        lost = rays_det[:, 9] < 0
+        self.assertTrue(lost[:500].all())
+        np.testing.assert_allclose(rays_det[:, 0:3], (rays_glob[:, 0:3] - tr.det_pos) @ tr.det_frame.T,
+                                   atol=1e-9)
+        np.testing.assert_allclose(rays_det[:, 3:6], rays_glob[:, 3:6] @ tr.det_frame.T, atol=1e-12)
+
+    def test_chunks(self):
+        tr = AnalyserTracer(kind="johann", shape="spherical", refl=lambda dth: np.exp(-(dth / 5e-5) ** 2), **self.kws)
+        res = tr.run(20000, chunk_size=3000, seed=3, ene_width=2., keep_rays=True)
+        self.assertEqual(res["rays"].shape, (20000, 18))
+        np.testing.assert_array_equal(res["rays"][:, 11], np.arange(1, 20001))
+        good = res["rays"][:, 9] > 0
+        self.assertEqual(res["ngood"], np.count_nonzero(good))
+        self.assertAlmostEqual(res["intensity"], rays_intensity(res["rays"][good]).sum())
+        self.assertAlmostEqual(res["image"].sum(), res["intensity"])
+        res2 = tr.run(20000, chunk_size=3000, seed=3, ene_width=2.)
+        np.testing.assert_array_equal(res2["ene_hist"], res["ene_hist"])
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestAnalyserTracer))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.raytracing.ray_transforms"""
+
+import unittest
+
+import numpy as np
+
+from sloth.raytracing.ray_transforms import RayTransform, rotation_affine, transform_rays
+from sloth.raytracing.shadow_utils import rotate_rays
+
+
+class TestRayTransforms(unittest.TestCase):
+    def setUp(self):
+        self.rays = np.random.default_rng(0).random((1000, 18))
+
+    def test_rotation(self):
+        rays = self.rays.copy()
+        out = transform_rays(rays, rotation_affine(90., 3), chunk_size=300)
+        self.assertIs(out, rays)
+        for cols in ((0, 1), (3, 4), (6, 7), (15, 16)):
+            np.testing.assert_allclose(rays[:, cols[0]], self.rays[:, cols[1]], atol=1e-15)
+            np.testing.assert_allclose(rays[:, cols[1]], -self.rays[:, cols[0]], atol=1e-15)
+        np.testing.assert_array_equal(rays[:, 9:15], self.rays[:, 9:15])
+        for axis, vec in ((1, [1, 0, 0]), (2, [0, 1, 0]), (3, [0, 0, 1])):
+            np.testing.assert_allclose(rotation_affine(30., vec), rotation_affine(30., axis), atol=1e-15)
+
+    def test_rotate_rays(self):
+        #: shadow_utils.rotate_rays keeps its original per-axis convention
+        angle = np.deg2rad(17.)
+        for axis, (i0, i1) in ((1, (1, 2)), (2, (0, 2)), (3, (0, 1))):
+            rays = rotate_rays(self.rays.copy(), 17., axis)
+            for col in (0, 3, 6, 15):
+                a0, a1 = self.rays[:, col + i0], self.rays[:, col + i1]
+                np.testing.assert_allclose(rays[:, col + i0], a0 * np.cos(angle) + a1 * np.sin(angle))
+                np.testing.assert_allclose(rays[:, col + i1], -a0 * np.sin(angle) + a1 * np.cos(angle))
+                np.testing.assert_array_equal(rays[:, col + axis - 1], self.rays[:, col + axis - 1])
+
+    def test_nan(self):
+        rays = self.rays.copy()
+        rays[0, 12] = np.nan
+        rays[1, 3] = np.nan
+        RayTransform().rotate(10., [1., 2., 3.]).translate([1., 0., 0.])(rays)
+        self.assertEqual(np.count_nonzero(np.isnan(rays[0])), 1)
+        np.testing.assert_array_equal(np.flatnonzero(np.isnan(rays[1])), [3, 4, 5])
+
+    def test_pipeline(self):
+        tr = RayTransform().rotate(10., 1).translate([1., 2., 3.]).rotate(-20., [1., 1., 0.])
+        rays = tr(self.rays.copy())
+        rot = tr.matrix[:3, :3]
+        np.testing.assert_allclose(rays[:, 0:3], self.rays[:, 0:3] @ rot.T + tr.matrix[:3, 3])
+        np.testing.assert_allclose(rays[:, 3:6], self.rays[:, 3:6] @ rot.T)
+        np.testing.assert_allclose(np.linalg.norm(rays[:, 6:9], axis=1), np.linalg.norm(self.rays[:, 6:9], axis=1))
+        tr.inverse()(rays)
+        np.testing.assert_allclose(rays, self.rays, atol=1e-12)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestRayTransforms))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
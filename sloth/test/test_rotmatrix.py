@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.math.rotmatrix and sloth.math.geometry3D (vectorised vs scalar)"""
+
+import unittest
+
+import numpy as np
+
+from sloth.math import geometry3D
+from sloth.math.rotmatrix import (
+    compose_rotations,
+    euler_matrices,
+    rotate,
+    rotate_points,
+    rotation_matrices,
+    rotation_matrix_numpy,
+)
+
+
+class TestRotMatrix(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.axes = rng.normal(size=(20, 3))
+        self.thetas = rng.uniform(-np.pi, np.pi, 20)
+        self.points = rng.normal(size=(20, 3))
+
+    def test_rotation_matrices(self):
+        mats = rotation_matrices(self.axes, self.thetas)
+        for mat, axis, theta in zip(mats, self.axes, self.thetas):
+            np.testing.assert_allclose(mat, rotation_matrix_numpy(axis, theta), atol=1e-14)
+
+    def test_euler_compose(self):
+        xax, yax, zax = np.eye(3)
+        alpha, beta, gamma = self.thetas[:3]
+        ref = np.dot(rotation_matrix_numpy(zax, alpha),
+                     np.dot(rotation_matrix_numpy(yax, beta), rotation_matrix_numpy(xax, gamma)))
+        np.testing.assert_allclose(euler_matrices(alpha, beta, gamma, axes="zyx"), ref, atol=1e-14)
+        chain = rotation_matrices(self.axes[:5], self.thetas[:5])
+        np.testing.assert_allclose(compose_rotations(chain),
+                                   np.linalg.multi_dot(list(chain)), atol=1e-14)
+
+    def test_rotate_points(self):
+        axis, theta = self.axes[0], self.thetas[0]
+        rotated = rotate_points(self.points, rotation_matrix_numpy(axis, theta))
+        for pt, rpt in zip(self.points, rotated):
+            np.testing.assert_allclose(rpt, rotate(pt, axis, theta), atol=1e-14)
+        rotated = rotate_points(self.points, rotation_matrices(self.axes, self.thetas))
+        for pt, rpt, axis, theta in zip(self.points, rotated, self.axes, self.thetas):
+            np.testing.assert_allclose(rpt, rotate(pt, axis, theta), atol=1e-14)
+
+
+class TestGeometry3D(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.p0, self.p1, self.p2 = rng.normal(size=(3, 20, 3))
+        self.plane = geometry3D.plane_3p(*rng.normal(size=(3, 3)))
+
+    def test_lengths_units(self):
+        vecs = self.p1 - self.p0
+        lens = geometry3D.lengths(vecs)
+        uvecs = geometry3D.units(vecs)
+        for vec, vlen, uvec in zip(vecs, lens, uvecs):
+            self.assertAlmostEqual(vlen, geometry3D.length(vec), places=14)
+            np.testing.assert_allclose(uvec, geometry3D.unit(vec), atol=1e-14)
+        np.testing.assert_allclose(geometry3D.lengths(vecs.reshape(4, 5, 3)),
+                                   lens.reshape(4, 5), atol=1e-14)
+
+    def test_angles_3p(self):
+        angs = geometry3D.angles_3p(self.p0, self.p1, self.p2)
+        for p0, p1, p2, ang in zip(self.p0, self.p1, self.p2, angs):
+            self.assertAlmostEqual(ang, geometry3D.angle_3p(p0, p1, p2), places=10)
+        #: collinear points, clipped cosine
+        vecs = self.p1 - self.p0
+        np.testing.assert_allclose(
+            geometry3D.angles_3p(self.p0, self.p0 + vecs, self.p0 - 3 * vecs), 180.0)
+
+    def test_points_on_plane_projection(self):
+        proj = geometry3D.points_on_plane_projection(self.p0, self.plane)
+        for pt, ppt in zip(self.p0, proj):
+            np.testing.assert_allclose(
+                ppt, geometry3D.point_on_plane_projection(pt, self.plane), atol=1e-14)
+        np.testing.assert_allclose(proj.dot(self.plane[:-1]) + self.plane[-1], 0, atol=1e-12)
+
+    def test_rotate_points(self):
+        axis, theta = self.p1[0], 0.7
+        rotated = geometry3D.rotate_points(self.p0, axis, theta)
+        for pt, rpt in zip(self.p0, rotated):
+            np.testing.assert_allclose(rpt, rotate(pt, axis, theta), atol=1e-14)
+        thetas = np.linspace(-np.pi, np.pi, len(self.p0))
+        rotated = geometry3D.rotate_points(self.p0, axis, thetas)
+        for pt, rpt, theta in zip(self.p0, rotated, thetas):
+            np.testing.assert_allclose(rpt, rotate(pt, axis, theta), atol=1e-14)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestRotMatrix))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestGeometry3D))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.inst.rowland"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from sloth.inst.rowland import RcHoriz, RcVert, load_bender_calib, save_bender_calib
+
+
+class TestRowlandArrays(unittest.TestCase):
+    def setUp(self):
+        self.theta = np.linspace(35., 85., 5)
+        self.chi = np.linspace(-20., 20., 5)
+        self.kws = dict(Rm=500., theta0=0., alpha=3., d=1.6374, aL=97.)
+
+    def _compare(self, cls, **extra):
+        rca = cls(**self.kws, **extra).set_theta0(self.theta)
+        det, ana = rca.get_det_pos(), rca.get_ana_pos(self.chi)
+        sag = rca.get_sag_off(rca.get_axoff(self.chi))
+        self.assertEqual(det.shape, (len(self.theta), 3))
+        self.assertEqual(ana.shape, (len(self.theta), 3))
+        for ith, (theta, chi) in enumerate(zip(self.theta, self.chi)):
+            rc = cls(**self.kws, **extra).set_theta0(theta)
+            np.testing.assert_allclose(det[ith], rc.get_det_pos(), rtol=1e-12, atol=1e-12)
+            np.testing.assert_allclose(ana[ith], rc.get_ana_pos(chi), rtol=1e-12, atol=1e-12)
+            self.assertAlmostEqual(sag[ith], rc.get_sag_off(rc.get_axoff(chi)), places=10)
+            self.assertAlmostEqual(rca.get_axoff_line(20., 1., 10.)[ith], rc.get_axoff_line(20., 1., 10.), places=10)
+            self.assertAlmostEqual(rca.get_az_off(2.)[ith], rc.get_az_off(2.), places=10)
+
+    def test_horiz(self):
+        self._compare(RcHoriz)
+
+    def test_vert(self):
+        self._compare(RcVert, rotHor=True)
+
+    def test_trajectory(self):
+        rc = RcVert(Rm=500., theta0=0., d=1.6374, showInfos=False)
+        ene = np.linspace(8000., 9000., 10**5)
+        rc.set_theta0(rc.get_theta(ene))
+        self.assertEqual(rc.get_ana_pos(np.linspace(-30., 30., ene.size)).shape, (ene.size, 3))
+        np.testing.assert_allclose(rc.get_ene(), ene)
+        rc.set_theta0(75.)
+        dth = rc.get_dth(np.array([0., 1.]))
+        self.assertEqual(dth[0], 0.)
+        self.assertAlmostEqual(dth[1], rc.get_dth(1.))
+        self.assertIsInstance(rc.get_dth(1.), float)
+        self.assertIsInstance(rc.get_ene_off(2.), float)
+        np.testing.assert_allclose(rc.get_ene_off(np.array([0., 2.])), [0., rc.get_ene_off(2.)])
+
+
+class TestBender(unittest.TestCase):
+    def setUp(self):
+        self.kws = dict(Rm=240., d=3.1356, aW=25., aWext=32, rSext=10., aL=97., showInfos=False,
+                        bender_version=1, bender=(40., 60., 28.), actuator=(300, 120))
+
+    def test_calib(self):
+        theta = np.linspace(35., 85., 6)
+        rc = RcHoriz(**self.kws)
+        calib = rc.get_bender_calib(theta)
+        self.assertTrue(calib["ok"].all())
+        for ith, th in enumerate(theta):
+            rc1 = RcHoriz(theta0=th, **self.kws)
+            pos = rc1.get_bender_pos()
+            self.assertAlmostEqual(calib["bender_axoff"][ith], pos[0])
+            self.assertAlmostEqual(calib["mot_sagoff"][ith], rc1.get_bender_mot(pos))
+        Rs, converged, niter = rc.get_bender_rs(calib["mot_sagoff"], Rs0=1.05*calib["Rs"], retAll=True)
+        self.assertTrue(converged.all())
+        np.testing.assert_allclose(Rs, calib["Rs"], atol=1e-8)
+        fname = os.path.join(tempfile.mkdtemp(), "bender.npz")
+        save_bender_calib(fname, calib)
+        calib2 = load_bender_calib(fname)
+        np.testing.assert_array_equal(calib2["mot_sagoff"], calib["mot_sagoff"])
+        os.remove(fname)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestRowlandArrays))
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestBender))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.raytracing.shadow_utils"""
+
+import unittest
+
+import numpy as np
+
+from sloth.raytracing.ray_tracer import AnalyserTracer
+from sloth.raytracing.shadow_utils import merge_rays, run_rays_parallel, shadow_seeds
+from sloth.utils.bragg import SI_ALAT, d_cubic
+
+
+class _TracerRun(object):
+    """picklable trace for run_rays_parallel"""
+
+    def __init__(self, nrays):
+        self.nrays = nrays
+
+    def __call__(self, seed, workdir):
+        tr = AnalyserTracer(Rm=500., theta0=75., dspacing=d_cubic(SI_ALAT, (5, 5, 5)), aperture=(50., 100.))
+        return tr.trace(tr.source(self.nrays, rng=np.random.default_rng(seed)))[0]
+
+
+class TestShadowUtils(unittest.TestCase):
+    def test_merge_rays(self):
+        rays_list = [np.full((n, 18), float(n)) for n in (3, 5, 2)]
+        rays = merge_rays(rays_list)
+        np.testing.assert_array_equal(rays, np.concatenate(rays_list))
+        out = np.empty((10, 18))
+        self.assertIs(merge_rays(rays_list, out=out), out)
+        self.assertRaises(ValueError, merge_rays, rays_list, out=np.empty((9, 18)))
+
+    def test_seeds(self):
+        seeds = shadow_seeds(4, seed=100)
+        self.assertEqual(seeds, [101, 103, 105, 107])
+        seeds = shadow_seeds(10)
+        self.assertEqual(len(set(seeds)), 10)
+        self.assertTrue(all(seed % 2 for seed in seeds))
+
+    def test_run_parallel(self):
+        trace = _TracerRun(1000)
+        seeds = [1, 3, 5]
+        rays = run_rays_parallel(trace, seeds, nproc=2)
+        self.assertEqual(rays.shape, (3000, 18))
+        np.testing.assert_array_equal(rays[:, 11], np.arange(1, 3001))
+        ref = np.concatenate([trace(seed, None) for seed in seeds])
+        np.testing.assert_array_equal(rays[:, :11], ref[:, :11])
+        rays1 = run_rays_parallel(trace, seeds, nproc=1)
+        np.testing.assert_array_equal(rays1, rays)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestShadowUtils))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.inst.spectro14"""
+
+import unittest
+
+import numpy as np
+
+from sloth.inst.spectro14 import SI_ALAT, AnalyserBM16, SpectrometerBM16, calc_pos_com, d_cubic
+
+
+class TestAnalyserBank(unittest.TestCase):
+    def test_geometry(self):
+        theta = np.array([45., 80.])
+        spectro = SpectrometerBM16(theta[0])
+        bank = spectro.bank
+        geo = spectro.get_positions(theta)
+        self.assertEqual(geo["position"].shape, (2, 21, 3))
+        for ith, th in enumerate(theta):
+            for name in ("b1", "h4", "h7", "c2"):
+                iana = bank.index(name)
+                ana = AnalyserBM16(th, pos=bank.pos[iana], dz=bank.dz[iana])
+                np.testing.assert_allclose(geo["position"][ith, iana], ana.position, atol=1e-9)
+                np.testing.assert_allclose(geo["normal"][ith, iana], ana.normal, atol=1e-12)
+                self.assertAlmostEqual(geo["pitch"][ith, iana], ana.pitch)
+                self.assertAlmostEqual(geo["geo_bragg"][ith, iana], ana.geo_bragg, places=6)
+
+    def test_pos_com(self):
+        dsp = d_cubic(SI_ALAT, (4, 4, 4))
+        emi = np.linspace(8.0, 8.4, 5)
+        com = calc_pos_com(emi, d=dsp, r=1000., dz=82., sz=500.)
+        for iene, ene in enumerate(emi):
+            com1 = calc_pos_com(ene, d=dsp, r=1000., dz=82., sz=500.)
+            for key, val in com1.items():
+                self.assertAlmostEqual(com[key][iene], val)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestAnalyserBank))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.inst.sweep (requires h5py)"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from sloth.inst.dthetaxz import getDthetaSummary, getMeshMasked
+from sloth.inst.sweep import ParameterSweep, sweep_grid
+
+try:
+    import h5py
+
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
+
+@unittest.skipUnless(HAS_H5PY, "h5py not installed")
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.angles = np.linspace(35, 85, 6)
+        self.grid = sweep_grid(r1p=[500., 1000.], theta=self.angles, case=['Jn', 'Js', 'TorJs'])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sweep(self):
+        fname = os.path.join(self.tmpdir, "sweep.h5")
+        sweep = ParameterSweep(fname, self.grid, chunk_size=7, csteps=81j)
+        sweep.run(nproc=1)
+        res = sweep.results()
+        sel = res["r1p"] == 1000.
+        mxx, mzz = getMeshMasked(csteps=81j)
+        sa, eres = getDthetaSummary(mxx, mzz, cases=[1, 2, 5], angles=self.angles)
+        np.testing.assert_allclose(res["sa"][sel].reshape(6, 3).T, sa)
+        np.testing.assert_allclose(res["eres"][sel].reshape(6, 3).T, eres)
+        #: resume after losing one chunk
+        with h5py.File(fname, "a") as h5:
+            h5["done"][2] = False
+            h5["results"]["eff"][14:21] = np.nan
+        sweep.run(nproc=1)
+        np.testing.assert_array_equal(sweep.results()["eff"], res["eff"])
+        values, eff = sweep.summary("eff", by="case")
+        np.testing.assert_array_equal(values, [1, 2, 5])
+        self.assertTrue(np.all(res["dth_fwhm"] <= res["dth_range"]))
+        with self.assertRaises(ValueError):
+            ParameterSweep(fname, sweep_grid(theta=[30., 40.])).run(nproc=1)
+
+    def test_pool(self):
+        fname1 = os.path.join(self.tmpdir, "sweep1.h5")
+        fname2 = os.path.join(self.tmpdir, "sweep2.h5")
+        ParameterSweep(fname1, self.grid, chunk_size=5, csteps=61j).run(nproc=1)
+        sweep = ParameterSweep(fname2, self.grid, chunk_size=5, csteps=61j)
+        sweep.run(nproc=2)
+        res1 = ParameterSweep(fname1, self.grid, chunk_size=5).results()
+        res2 = sweep.results()
+        self.assertEqual(set(res1), set(res2))
+        for key, val in res1.items():
+            np.testing.assert_array_equal(res2[key], val)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestParameterSweep))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.inst.trajectory"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from sloth.inst.rowland import RcHoriz
+from sloth.inst.trajectory import TrajectoryTable, reflection_trajectories, trajectory_table
+
+
+class TestTrajectoryTable(unittest.TestCase):
+    def setUp(self):
+        self.kws = dict(d=0.7839, Rm=500., aL=97., chis=[0., 10.])
+        self.tab = TrajectoryTable.build(8000., 8100., npts=201, **self.kws)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_interp(self):
+        energy = np.linspace(8010., 8090., 7)
+        for kind in ("cubic", "linear"):
+            pos, err = self.tab.interp(energy, kind=kind, retErr=True)
+            rc = RcHoriz(Rm=500., d=0.7839, aL=97., showInfos=False)
+            for iene, ene in enumerate(energy):
+                rc.set_theta0(rc.get_theta(ene), showInfos=False)
+                for iax in range(3):
+                    key = "ana1_{0}".format("xyz"[iax])
+                    self.assertLessEqual(abs(pos[key][iene] - rc.get_ana_pos(10.)[iax]), err[key] + 1e-12)
+        self.assertLess(self.tab.error_bound("cubic")["det_y"], self.tab.error_bound("linear")["det_y"])
+        with self.assertRaises(ValueError):
+            self.tab.interp(7990.)
+
+    def test_io(self):
+        for ext in (".npz", ".h5"):
+            fname = os.path.join(self.tmpdir, "traj" + ext)
+            self.tab.save(fname)
+            tab = TrajectoryTable.load(fname)
+            self.assertEqual(tab.key, self.tab.key)
+            np.testing.assert_array_equal(tab.columns["det_z"], self.tab.columns["det_z"])
+        fname = os.path.join(self.tmpdir, "traj.txt")
+        self.tab.export_txt(fname, columns=["theta", "det_y"])
+        data = np.loadtxt(fname)
+        self.assertEqual(data.shape, (201, 3))
+        np.testing.assert_allclose(data[:, 1], self.tab.columns["theta"], atol=1e-6)
+        tab = trajectory_table(8000., 8100., npts=201, cache_dir=self.tmpdir, **self.kws)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpdir, tab.key + ".npz")))
+
+    def test_reflections(self):
+        tabs = reflection_trajectories(crystal="Si", hkl_max=6, npts=101, Rm=500.)
+        self.assertIn("Si(4,4,4)", tabs)
+        theta = tabs["Si(4,4,4)"].columns["theta"]
+        self.assertAlmostEqual(theta.max(), 85., places=3)
+        self.assertAlmostEqual(theta.min(), 35., places=3)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestTrajectoryTable))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
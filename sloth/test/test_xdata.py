@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Test sloth.utils.xdata (requires xraylib)"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from sloth.utils import xdata
+
+
+@unittest.skipUnless(xdata.HAS_XRAYLIB, "xraylib not installed")
+class TestLineTable(unittest.TestCase):
+    def setUp(self):
+        #: cache files in a temporary directory, not in ~/.sloth
+        self.tmpdir = tempfile.mkdtemp()
+        self._table_file = xdata.LINE_TABLE_FILE
+        xdata.LINE_TABLE_FILE = os.path.join(self.tmpdir, "xraylib_lines.npz")
+
+    def tearDown(self):
+        xdata.LINE_TABLE_FILE = self._table_file
+        shutil.rmtree(self.tmpdir)
+
+    def test_line_table(self):
+        table = xdata.line_table(cache_file=None)
+        self.assertTrue(np.all(np.diff(table["en"]) >= 0))
+        ifeka1 = np.flatnonzero((table["el"] == "Fe") & (table["ln"] == "KA1"))[0]
+        self.assertAlmostEqual(table["en"][ifeka1], xdata.xl.LineEnergy(26, xdata.xl.KA1_LINE) * 1000)
+
+    def test_cache_file(self):
+        table = xdata.line_table(rebuild=True)
+        key = xdata._line_table_key()
+        self.assertEqual(os.listdir(self.tmpdir), [f"xraylib_lines_{key}.npz"])
+        xdata._LINE_TABLE.clear()
+        cached = xdata.line_table()
+        for name, arr in table.items():
+            np.testing.assert_array_equal(cached[name], arr)
+        #: another grid of lines is another table
+        lines = xdata.LINES
+        xdata.LINES = lines[:3]
+        try:
+            self.assertNotEqual(xdata._line_table_key(), key)
+        finally:
+            xdata.LINES = lines
+
+    def test_find_line_index(self):
+        table = xdata.line_table(cache_file=None)
+        emins = np.array([6390.0, 8030.0])
+        istart, istop = xdata.find_line_index(emins, emins + 20)
+        for emin, i0, i1 in zip(emins, istart, istop):
+            ref = np.flatnonzero((table["en"] >= emin) & (table["en"] <= emin + 20))
+            np.testing.assert_array_equal(np.arange(i0, i1), ref)
+        out = xdata.find_line(6390.0, 6410.0, elements=["Fe"], outDict=True)
+        self.assertEqual(out["ln"], ["KA1", "KA2"])
+
+    def test_find_line_order(self):
+        #: ordered as the given elements and lines, not by energy
+        out = xdata.find_line(6000.0, 6500.0, elements=["Mn", "Fe", "Co"],
+                              lines=["KB1", "KA1", "KA2"], outDict=True)
+        self.assertEqual(list(zip(out["el"], out["ln"])), [("Mn", "KB1"), ("Fe", "KA1"), ("Fe", "KA2")])
+
+    def test_array_variants(self):
+        elements = np.array(["Fe", "Cu", "Pd"])[:, np.newaxis]
+        lines = ["KA1", "LA1", "MA1"]
+        enes = xdata.xray_line_array(elements, lines)
+        widths = xdata.fluo_width_array(elements, lines)
+        self.assertEqual(enes.shape, (3, 3))
+        for iel, elem in enumerate(elements[:, 0]):
+            for iln, line in enumerate(lines):
+                try:
+                    ref = xdata.xray_line(str(elem), line)
+                except Exception:
+                    ref = np.nan
+                np.testing.assert_equal(enes[iel, iln], ref)
+                self.assertEqual(widths[iel, iln], xdata.fluo_width(str(elem), line, showInfos=False))
+        self.assertTrue(np.isnan(enes[0, 2]))
+
+    def test_fluo_synth(self):
+        xfluo, yfluo, _ = xdata.fluo_spectrum("Fe", "KA1", showInfos=False)
+        ysynth = xdata.fluo_synth(xfluo, ["Fe"], lines=["KA1"], xwidth=4)
+        np.testing.assert_allclose(ysynth, yfluo, rtol=1e-12)
+        energy = np.arange(5000.0, 10000.0, 2.0)
+        concs = np.array([[1.0, 0.0], [0.3, 0.7]])
+        spectra = xdata.fluo_synth(energy, ["Fe", "Cu"], concentrations=concs, det_fwhm=130.0)
+        self.assertEqual(spectra.shape, (2, len(energy)))
+        np.testing.assert_allclose(
+            spectra[1], xdata.fluo_synth(energy, ["Fe", "Cu"], concentrations=concs[1], det_fwhm=130.0))
+        np.testing.assert_allclose(
+            spectra[0], xdata.fluo_synth(energy, ["Fe"], det_fwhm=130.0))
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(
+        unittest.defaultTestLoader.loadTestsFromTestCase(TestLineTable))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
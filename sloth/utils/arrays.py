@@ -30,6 +30,85 @@ def imax(arr, debug=False):
     return _im
 
 
+def _is_linear(kws, fill_value=np.nan):
+    """True if the interp1d arguments ask a linear interpolation with a
+    scalar fill value and no explicit bounds_error"""
+    if isinstance(fill_value, str) or np.ndim(fill_value) != 0:
+        return False
+    return kws.get("kind", "linear") == "linear" and set(kws) <= {
+        "kind",
+        "assume_sorted",
+        "copy",
+    }
+
+
+def interp_arrays_1d(xdats, zdats, axis, fill_value=np.nan, **kws):
+    """Resample many 1D arrays on a reference axis
+
+    Out-of-range points are set to `fill_value` (NaN-masked by default)
+    instead of raising. For linear interpolation:
+
+    - arrays sharing the same x grid are resampled all at once (one
+      `np.searchsorted` on the grid, giving a sparse interpolation matrix)
+    - other arrays go through `np.interp` (sorted first if not monotonic)
+
+    other kinds, a `fill_value` that is not a number (e.g. "extrapolate"
+    or a (below, above) tuple) or an explicit `bounds_error` fall back to
+    :func:`scipy.interpolate.interp1d`
+
+    Parameters
+    ----------
+    xdats, zdats : lists (or 2D arrays) of 1D arrays
+    axis : array 1D, reference axis
+    fill_value : float, tuple or "extrapolate", optional
+        value for the points of `axis` out of the x range [np.nan], as
+        in :func:`scipy.interpolate.interp1d`
+    **kws : optional
+        keyword arguments for :func:`scipy.interpolate.interp1d`
+
+    Returns
+    -------
+    outmat : array 2D (len(zdats), axis.size)
+    """
+    axis = np.asarray(axis)
+    outmat = np.empty((len(zdats), axis.size))
+    if not _is_linear(kws, fill_value):
+        kws.setdefault("bounds_error", False)
+        kws.update(fill_value=fill_value)
+        for idat, (xdat, zdat) in enumerate(zip(xdats, zdats)):
+            outmat[idat] = interp1d(xdat, zdat, **kws)(axis)
+        return outmat
+    xdat0 = np.asarray(xdats[0])
+    shared = all(np.array_equal(xdat, xdat0) for xdat in xdats[1:])
+    if shared and xdat0.size > 1 and (xdat0[1:] > xdat0[:-1]).all():
+        #: one searchsorted for all arrays
+        from scipy.sparse import csr_matrix
+
+        npts = xdat0.size
+        idx = np.clip(np.searchsorted(xdat0, axis, side="right") - 1, 0, npts - 2)
+        frac = (axis - xdat0[idx]) / (xdat0[idx + 1] - xdat0[idx])
+        rows = np.arange(axis.size)
+        vals, irows, icols = np.r_[1 - frac, frac], np.r_[rows, rows], np.r_[idx, idx + 1]
+        #: no explicit zeros, NaN * 0 would leak from the neighbouring sample
+        nonzero = vals != 0
+        wmat = csr_matrix(
+            (vals[nonzero], (irows[nonzero], icols[nonzero])),
+            shape=(axis.size, npts),
+        )
+        outmat = np.asarray(wmat @ np.asarray(zdats, dtype=float).T).T
+        outmat[:, (axis < xdat0[0]) | (axis > xdat0[-1])] = fill_value
+        return outmat
+    for idat, (xdat, zdat) in enumerate(zip(xdats, zdats)):
+        xdat, zdat = np.asarray(xdat), np.asarray(zdat)
+        if (xdat[1:] < xdat[:-1]).all():
+            xdat, zdat = xdat[::-1], zdat[::-1]
+        elif not (xdat[1:] >= xdat[:-1]).all():
+            isort = np.argsort(xdat, kind="stable")
+            xdat, zdat = xdat[isort], zdat[isort]
+        outmat[idat] = np.interp(axis, xdat, zdat, left=fill_value, right=fill_value)
+    return outmat
+
+
 def lists_to_matrix(data, axis=None, **kws):
     """Convert two lists of 1D arrays to a 2D matrix
 
@@ -44,6 +123,7 @@ def lists_to_matrix(data, axis=None, **kws):
         a reference axis used for the interpolation [None -> xdats[0]]
     **kws : optional
         keyword arguments for scipy.interpolate.interp1d()
+        (-> :func:`interp_arrays_1d`, out-of-range points are NaN)
 
     Returns
     -------
@@ -63,12 +143,7 @@ def lists_to_matrix(data, axis=None, **kws):
         return axis, np.array(zdats)
     else:
         #: interpolate
-        outmat = np.zeros((len(zdats), axis.size))
-        for idat, (xdat, zdat) in enumerate(zip(xdats, zdats)):
-            fdat = interp1d(xdat, zdat, **kws)
-            znew = fdat(axis)
-            outmat[idat] = znew
-        return axis, outmat
+        return axis, interp_arrays_1d(xdats, zdats, axis, **kws)
 
 
 def curves_to_matrix(curves, axis=None, **kws):
@@ -87,6 +162,7 @@ def curves_to_matrix(curves, axis=None, **kws):
         a reference axis used for the interpolation [None -> curves[0][0]]
     **kws : optional
         keyword arguments for func:`scipy.interpolate.interp1d`
+        (-> :func:`interp_arrays_1d`, out-of-range points are NaN)
 
     Returns
     -------
@@ -100,6 +176,7 @@ def curves_to_matrix(curves, axis=None, **kws):
         axis = curves[0][0]
     assert isinstance(axis, np.ndarray), "axis must be array"
     outmat = np.zeros((len(curves), axis.size))
+    to_interp = []
     for icurve, curve in enumerate(curves):
         assert len(curve) == 4, "wrong curve format, should contain four elements"
         x, y, label, info = curve
@@ -117,11 +194,16 @@ def curves_to_matrix(curves, axis=None, **kws):
             #: all same length
             outmat[icurve] = y
         else:
-            #: interpolate
-            fdat = interp1d(x, y, **kws)
-            ynew = fdat(axis)
-            outmat[icurve] = ynew
+            to_interp.append(icurve)
             _logger.debug("[curve_to_matrix] Curve %d (%s) interpolated", icurve, label)
+    if to_interp:
+        #: interpolate
+        outmat[to_interp] = interp_arrays_1d(
+            [curves[icurve][0] for icurve in to_interp],
+            [curves[icurve][1] for icurve in to_interp],
+            axis,
+            **kws,
+        )
     return axis, outmat
 
 
@@ -178,6 +260,107 @@ def avg_arrays_1d(data, axis=None, weights=None, **kws):
     return ax, np.average(mat, axis=0, weights=weights)
 
 
+class StreamMerger1D(object):
+    """Streaming merge of 1D arrays on a reference axis (Welford algorithm)
+
+    Each added curve is interpolated on the reference axis and used to
+    update, point by point, the running sum of weights, mean and sum of
+    squared deviations (M2). Memory does not depend on the number of
+    curves. Points out of the x range of a curve are not updated.
+
+    The weights are reliability weights (e.g. inverse variances): the
+    results do not change if all the weights are rescaled.
+
+    Example
+    -------
+    >>> mrg = StreamMerger1D(axis)
+    >>> for x, y in scans:
+    ...     mrg.add(x, y)
+    >>> res = mrg.result()
+    >>> res["mean"], res["stderr"]
+    """
+
+    def __init__(self, axis=None, **kws):
+        """
+        Parameters
+        ----------
+        axis : None or array 1D, optional
+            reference axis [None -> x of the first added curve]
+        **kws : optional
+            keyword arguments for :func:`interp_arrays_1d`
+        """
+        self.axis = None
+        self._kws = kws
+        self.ncurves = 0
+        if axis is not None:
+            self._init_axis(axis)
+
+    def _init_axis(self, axis):
+        self.axis = np.array(axis, dtype=float)
+        self.count = np.zeros_like(self.axis)
+        self.wsum = np.zeros_like(self.axis)
+        self.w2sum = np.zeros_like(self.axis)
+        self.mean = np.zeros_like(self.axis)
+        self.m2 = np.zeros_like(self.axis)
+
+    def add(self, x, y, weight=1):
+        """Add a curve (x, y) with a given weight"""
+        if self.axis is None:
+            self._init_axis(x)
+        x, y = np.asarray(x), np.asarray(y)
+        if (x.size == self.axis.size) and np.array_equal(x, self.axis):
+            ynew = y.astype(float)
+        else:
+            ynew = interp_arrays_1d([x], [y], self.axis, **self._kws)[0]
+        #: a zero weight does not update the point (0/0 on the first curve)
+        ok = np.isfinite(ynew) & (float(weight) != 0)
+        if not ok.all():
+            ynew = np.where(ok, ynew, 0.0)
+        wgt = np.where(ok, float(weight), 0.0)
+        self.count += ok
+        self.wsum += wgt
+        self.w2sum += wgt ** 2
+        delta = ynew - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean += np.where(ok, wgt / self.wsum * delta, 0.0)
+        self.m2 += wgt * delta * (ynew - self.mean)
+        self.ncurves += 1
+
+    def result(self, ddof=1):
+        """Merged data
+
+        Parameters
+        ----------
+        ddof : int, optional
+            delta degrees of freedom for the variance, with reliability
+            weights: M2 / (V1 - ddof * V2 / V1), V1 = sum(w), V2 = sum(w**2) [1]
+
+        Returns
+        -------
+        dict with 1D arrays
+            "axis" : reference axis
+            "mean" : weighted mean (NaN where no data)
+            "variance" : weighted variance (NaN where not enough data)
+            "stderr" : standard error of the mean, sqrt(variance / neff), with
+                       the effective number of curves neff = V1**2 / V2
+            "coverage" : number of curves (non-zero weight) covering each point
+        """
+        if self.axis is None:
+            raise ValueError("no data added")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(self.count > 0, self.mean, np.nan)
+            denom = self.wsum - ddof * self.w2sum / self.wsum
+            variance = np.where((self.count > ddof) & (denom > 0), self.m2 / denom, np.nan)
+            stderr = np.sqrt(variance * self.w2sum / self.wsum ** 2)
+        return {
+            "axis": self.axis,
+            "mean": mean,
+            "variance": variance,
+            "stderr": stderr,
+            "coverage": self.count.astype(int),
+        }
+
+
 def merge_arrays_1d(data, method="average", axis=None, weights=None, **kws):
     """Merge a list of 1D arrays by interpolation on a reference axis
 
@@ -194,15 +377,31 @@ def merge_arrays_1d(data, method="average", axis=None, weights=None, **kws):
         method used to merge, available methods are:
             - "average" : uses np.average()
             - "sum" : uses np.sum()
+            - "welford" : streaming (weighted) average with
+              :class:`StreamMerger1D`, `data` can be any iterable (e.g. a
+              generator of curves) and is never stacked in memory
     weights : None or array 1D, optional
-        used if method == "average"
+        used if method == "average" or "welford"
 
     Returns
     -------
     axis, zmrg : 1D arrays
         merge(zdats)
     """
-    if method == "sum":
+    if method == "welford":
+        data_fmt = kws.pop("data_fmt", "curves")
+        if data_fmt == "curves":
+            xys = ((curve[0], curve[1]) for curve in data)
+        elif data_fmt == "lists":
+            xys = zip(*data)
+        else:
+            raise NameError("'data_fmt' not understood")
+        mrg = StreamMerger1D(axis=axis, **kws)
+        for icurve, (xdat, zdat) in enumerate(xys):
+            mrg.add(xdat, zdat, weight=1 if weights is None else weights[icurve])
+        res = mrg.result()
+        return res["axis"], res["mean"]
+    elif method == "sum":
         return sum_arrays_1d(data, axis=axis, **kws)
     elif method == "average":
         return avg_arrays_1d(data, axis=axis, weights=weights, **kws)
@@ -210,13 +409,67 @@ def merge_arrays_1d(data, method="average", axis=None, weights=None, **kws):
         raise NameError("wrong 'method': %s" % method)
 
 
+_REBIN_MATRIX_CACHE = {}
+_REBIN_MATRIX_CACHE_SIZE = 16
+
+
+def rebin_matrix(x1, x2):
+    """Sparse overlap-weight matrix from old bin edges x1 to new edges x2
+
+    The element (j, i) is the fraction of the old bin i falling in the new
+    bin j, that is, the overlap length divided by the width of the old bin
+    (piecewise constant histogram). Old bins fully covered by the new edges
+    have column sums equal to 1, so the total counts are conserved. The
+    matrix is cached per edges pair.
+
+    Parameters
+    ----------
+    x1 : m+1 array of old bin edges (increasing)
+    x2 : n+1 array of new bin edges (increasing)
+
+    Returns
+    -------
+    wmat : scipy.sparse.csr_matrix (n, m)
+    """
+    from scipy.sparse import csr_matrix
+
+    x1 = np.ascontiguousarray(x1, dtype=float)
+    x2 = np.ascontiguousarray(x2, dtype=float)
+    key = (x1.tobytes(), x2.tobytes())
+    try:
+        return _REBIN_MATRIX_CACHE[key]
+    except KeyError:
+        pass
+    m, n = len(x1) - 1, len(x2) - 1
+    lo, hi = max(x1[0], x2[0]), min(x1[-1], x2[-1])
+    if hi > lo:
+        # common refinement of both grids within the overlap range
+        edges = np.union1d(x1[(x1 >= lo) & (x1 <= hi)], x2[(x2 >= lo) & (x2 <= hi)])
+        widths = np.diff(edges)
+        mids = 0.5 * (edges[1:] + edges[:-1])
+        iold = np.clip(np.searchsorted(x1, mids) - 1, 0, m - 1)
+        inew = np.clip(np.searchsorted(x2, mids) - 1, 0, n - 1)
+        wgts = widths / np.diff(x1)[iold]
+        ok = widths > 0
+        wmat = csr_matrix((wgts[ok], (inew[ok], iold[ok])), shape=(n, m))
+    else:
+        wmat = csr_matrix((n, m))
+    if len(_REBIN_MATRIX_CACHE) >= _REBIN_MATRIX_CACHE_SIZE:
+        _REBIN_MATRIX_CACHE.pop(next(iter(_REBIN_MATRIX_CACHE)))
+    _REBIN_MATRIX_CACHE[key] = wmat
+    return wmat
+
+
 def rebin_piecewise_constant(x1, y1, x2):
     """Rebin histogram values y1 from old bin edges x1 to new edges x2.
 
-    Code taken from: https://github.com/jhykes/rebin/blob/master/rebin.py
+    Originally taken from: https://github.com/jhykes/rebin/blob/master/rebin.py
 
     It follows the procedure described in Figure 18.13 (chapter 18.IV.B.
-    Spectrum Alignment, page 703) of Knoll [1]
+    Spectrum Alignment, page 703) of Knoll [1], here written as a product
+    with the sparse overlap-weight matrix given by :func:`rebin_matrix`
+    (cached per edges pair), so that a whole stack of spectra sharing the
+    same edges is rebinned in one call.
 
     References
     ----------
@@ -226,54 +479,20 @@ def rebin_piecewise_constant(x1, y1, x2):
     Parameters
     ----------
      - x1 : m+1 array of old bin edges.
-     - y1 : m array of old histogram values.
+     - y1 : m array or (nspectra, m) array of old histogram values.
             This is the total number in each bin, not an average.
      - x2 : n+1 array of new bin edges.
 
     Returns
     -------
-     - y2 : n array of rebinned histogram values.
+     - y2 : n array or (nspectra, n) array of rebinned histogram values.
     """
-    x1 = np.asarray(x1)
     y1 = np.asarray(y1)
-    x2 = np.asarray(x2)
-
-    # the fractional bin locations of the new bins in the old bins
-    i_place = np.interp(x2, x1, np.arange(len(x1)))
-
-    cum_sum = np.r_[[0], np.cumsum(y1)]
-
-    # calculate bins where lower and upper bin edges span
-    # greater than or equal to one original bin.
-    # This is the contribution from the 'intact' bins (not including the
-    # fractional start and end parts.
-    whole_bins = np.floor(i_place[1:]) - np.ceil(i_place[:-1]) >= 1.0
-    start = cum_sum[np.ceil(i_place[:-1]).astype(int)]
-    finish = cum_sum[np.floor(i_place[1:]).astype(int)]
-
-    y2 = np.where(whole_bins, finish - start, 0.0)
-
-    bin_loc = np.clip(np.floor(i_place).astype(int), 0, len(y1) - 1)
-
-    # fractional contribution for bins where the new bin edges are in the same
-    # original bin.
-    same_cell = np.floor(i_place[1:]) == np.floor(i_place[:-1])
-    frac = i_place[1:] - i_place[:-1]
-    contrib = frac * y1[bin_loc[:-1]]
-    y2 += np.where(same_cell, contrib, 0.0)
-
-    # fractional contribution for bins where the left and right bin edges are in
-    # different original bins.
-    different_cell = np.floor(i_place[1:]) > np.floor(i_place[:-1])
-    frac_left = np.ceil(i_place[:-1]) - i_place[:-1]
-    contrib = frac_left * y1[bin_loc[:-1]]
-
-    frac_right = i_place[1:] - np.floor(i_place[1:])
-    contrib += frac_right * y1[bin_loc[1:]]
-
-    y2 += np.where(different_cell, contrib, 0.0)
+    wmat = rebin_matrix(x1, x2)
+    if y1.ndim == 1:
+        return wmat.dot(y1)
+    return wmat.dot(y1.T).T
 
-    return y2
 
 ### MOVED TO sloth.utils.pymca // TODO: move to Larch
 #def reject_outliers(data, m=5.189, return_ma=False):
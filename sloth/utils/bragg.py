@@ -124,10 +124,14 @@ def de_bragg(theta, dth):
 
 
 def sqrt1over(d2m):
-    if d2m == 0:
-        return 0
-    else:
-        return np.sqrt(1 / d2m)
+    if np.ndim(d2m) == 0:
+        if d2m == 0:
+            return 0
+        else:
+            return np.sqrt(1 / d2m)
+    d2m = np.asarray(d2m, dtype=float)
+    with np.errstate(divide="ignore"):
+        return np.where(d2m == 0, 0.0, np.sqrt(1 / d2m))
 
 
 def d_cubic(a, hkl, **kws):
@@ -219,17 +223,168 @@ def get_dspacing(mat, hkl):
     return dspacing
 
 
+#: crystals known by :func:`hkl_table`: (structure, lattice parameters)
+CRYSTALS = {
+    "Si": ("diamond", {"a": SI_ALAT}),
+    "Ge": ("diamond", {"a": GE_ALAT}),
+    "InSb": ("zincblende", {"a": INSB_ALAT}),
+    "SiO2": ("hexagonal", {"a": SIO2_A, "c": SIO2_C}),
+}
+
+_HKL_TABLE_CACHE = {}
+
+
+def _hkl_combos(idx):
+    """(h, k, l) combinations with replacement of the given indices, as
+    itertools.combinations_with_replacement(idx, 3), in a (n, 3) array"""
+    idx = np.asarray(idx, dtype=int)
+    nidx = len(idx)
+    ii, jj, kk = np.indices((nidx, nidx, nidx)).reshape(3, -1)
+    ok = (ii <= jj) & (jj <= kk)
+    return np.stack((idx[ii[ok]], idx[jj[ok]], idx[kk[ok]]), axis=1)
+
+
+def _hkl_allowed(hkl, structure):
+    """structure factor extinction rules, returns a boolean mask
+
+    - sc, hexagonal and other lattices: no rule applied
+    - bcc: h+k+l even
+    - fcc, zincblende: h,k,l all odd or all even
+    - diamond: as fcc but if all even (0 is even) then h+k+l = 4n
+    """
+    h, k, l = hkl.T
+    hkl_sum = h + k + l
+    all_odd = (h % 2 == 1) & (k % 2 == 1) & (l % 2 == 1)
+    all_even = (h % 2 == 0) & (k % 2 == 0) & (l % 2 == 0)
+    if structure == "bcc":
+        return hkl_sum % 2 == 0
+    if structure in ("fcc", "zincblende"):
+        return all_odd | all_even
+    if structure == "diamond":
+        return all_odd | (all_even & (hkl_sum % 4 == 0))
+    return np.ones(len(hkl), dtype=bool)
+
+
+def hkl_table(crystal="Si", hkl_max=HKL_MAX):
+    """Table of the allowed reflections of a crystal (cached)
+
+    Parameters
+    ----------
+    crystal : str
+        crystal name, one of CRYSTALS ['Si']
+    hkl_max : int
+        indices are < hkl_max [HKL_MAX]
+
+    Returns
+    -------
+    dict of arrays
+        'h', 'k', 'l' : Miller indices (cubic: h >= k >= l)
+        'd' : d-spacing (\AA)
+        'crys_lab' : labels as 'Si(4,4,4)'
+        'crys0_lab' : labels of the reduced reflection as 'Si(1,1,1)'
+
+    Raises
+    ------
+    ValueError
+        if `crystal` is not in CRYSTALS
+    """
+    key = (crystal, hkl_max)
+    try:
+        return _HKL_TABLE_CACHE[key]
+    except KeyError:
+        pass
+    try:
+        structure, pars = CRYSTALS[crystal]
+    except KeyError:
+        raise ValueError(f"hkl_table: unknown crystal '{crystal}', available -> {list(CRYSTALS)}")
+    if structure in ("diamond", "zincblende", "fcc"):
+        #: only all odd and all even are allowed
+        hkl = np.concatenate(
+            (
+                _hkl_combos(range(hkl_max - 1 - (hkl_max % 2), 0, -2)),
+                _hkl_combos(range(hkl_max - 2 + (hkl_max % 2), -1, -2)),
+            )
+        )
+    elif structure in ("sc", "bcc"):
+        hkl = _hkl_combos(range(hkl_max - 1, -1, -1))
+    else:
+        hkl = np.indices((hkl_max, hkl_max, hkl_max)).reshape(3, -1).T[::-1]
+    hkl = hkl[_hkl_allowed(hkl, structure) & hkl.any(axis=1)]
+    hkl_t = tuple(hkl.T)
+    if structure == "hexagonal":
+        dspacing = d_hexagonal(pars["a"], pars["c"], hkl_t)
+    else:
+        dspacing = d_cubic(pars["a"], hkl_t)
+    #: reduced reflection, the largest n in [2, 9] dividing all indices
+    hkl0 = hkl.copy()
+    for n in range(2, 10):
+        div = (hkl % n == 0).all(axis=1)
+        hkl0[div] = hkl[div] // n
+    table = {
+        "h": hkl[:, 0],
+        "k": hkl[:, 1],
+        "l": hkl[:, 2],
+        "d": dspacing,
+        "crys_lab": np.array([f"{crystal}({h},{k},{l})" for h, k, l in hkl]),
+        "crys0_lab": np.array([f"{crystal}({h},{k},{l})" for h, k, l in hkl0]),
+    }
+    _HKL_TABLE_CACHE[key] = table
+    return table
+
+
+def find_reflections(energy, thetamin=65.0, thetamax=90.0, crystal="all", hkl_max=HKL_MAX):
+    """Reflections reaching a given energy (eV) at a Bragg angle in
+    [thetamin, thetamax] (deg)
+
+    Parameters
+    ----------
+    energy : float or 1D array
+        energy (eV)
+    thetamin, thetamax : float
+        Bragg angle range (deg) [65, 90]
+    crystal : str or list of str
+        crystal(s) from CRYSTALS, 'all' -> ['Si', 'Ge'] ['all'],
+        ValueError for unknown crystals (-> :func:`hkl_table`)
+    hkl_max : int
+        see :func:`hkl_table`
+
+    Returns
+    -------
+    crystal, table, theta
+        crystal : 1D array with the crystal name of each reflection
+        table : dict of 1D arrays, the hkl tables of the crystals concatenated
+        theta : Bragg angle (deg), array with the shape of energy + (nrefl,);
+                NaN where theta is out of [thetamin, thetamax]
+    """
+    if crystal == "all":
+        crystal = ["Si", "Ge"]
+    elif isinstance(crystal, str):
+        crystal = [crystal]
+    tables = [hkl_table(crys, hkl_max=hkl_max) for crys in crystal]
+    table = {key: np.concatenate([tab[key] for tab in tables]) for key in tables[0]}
+    crys = np.concatenate([np.full(len(tab["d"]), crys) for crys, tab in zip(crystal, tables)])
+    wlen = ev2wlen(np.asarray(energy, dtype=float))[..., np.newaxis]
+    with np.errstate(invalid="ignore"):
+        theta = np.rad2deg(np.arcsin(wlen / (2 * table["d"])))
+        theta[~((theta >= thetamin) & (theta <= thetamax))] = np.nan
+    return crys, table, theta
+
+
 def findhkl(energy=None, thetamin=65.0, crystal="all", retAll=False, retBest=False, verbose=True):
     """findhkl: for a given energy (eV) finds the Si and Ge reflections
     with relative Bragg angle
 
+    .. note:: the reflections are taken from the cached tables given by
+              :func:`hkl_table` (see :func:`find_reflections`)
+
     Usage
     =====
     findhkl(energy, thetamin, crystal, return_flag)
 
     energy (eV) [required]
     thetamin (deg) [optional, default: 65 deg]
-    crystal ('Si', 'Ge', 'all') [optional, default: 'all']
+    crystal ('Si', 'Ge', 'all' or other from CRYSTALS) [optional, default: 'all'],
+            a crystal not in CRYSTALS falls back to 'all' (Si and Ge)
 
     Output
     ======
@@ -241,67 +396,35 @@ def findhkl(energy=None, thetamin=65.0, crystal="all", retAll=False, retBest=Fal
     if energy is None:
         _logger.error(findhkl.__doc__)
         return None
+    if isinstance(crystal, str) and crystal != "all" and crystal not in CRYSTALS:
+        _logger.warning(f"findhkl: unknown crystal '{crystal}' -> Si and Ge")
+        crystal = "all"
 
-    def _find_theta(crystal, alat):
-
-        retDat = []
-        #retDat = [("#crystal", "h", "k", "l", "bragg_deg", "crystal_label")]
-        import itertools
-
-        def _structure_factor(idx):
-            """ fcc crystal: the structure factor is not 0 if h,k,l
-            are all odd or all even -> zincblende: as fcc but if all even
-            (0 is even) then h+k+l = 4n
-            """
-
-            def _check_hkl(hkl):
-                a = np.array(hkl)
-                if (a % 2 == 0).all() and not (a.sum() % 4 == 0):
-                    return False
-                else:
-                    return True
-
-            # hkl = itertools.product(idx, idx, idx)
-            hkl = itertools.combinations_with_replacement(idx, 3)
-            for x in hkl:
-                # check all even
-                if (x[0] % 2 == 0 and x[1] % 2 == 0 and x[2] % 2 == 0) and not (
-                    (x[0] + x[1] + x[2]) % 4 == 0
-                ):
-                    pass
-                else:
-                    try:
-                        theta = theta_b(ev2wlen(energy), d_cubic(alat, x))
-                    except Exception:
-                        continue
-                    if theta >= thetamin:
-                        crys_lab = f"{crystal}({x[0]},{x[1]},{x[2]})"
-                        crys0_lab = crys_lab
-                        ax = np.array(x)
-                        for n in range(2,10):
-                            if (ax % n == 0).all() and _check_hkl(x):
-                                ax0 = (ax/n).astype(int)
-                                crys0_lab = f"{crystal}({ax0[0]},{ax0[1]},{ax0[2]})"
-                        if verbose:
-                            print(f"{crys_lab}, Bragg {theta:2.2f} -> {crys0_lab}")
-                        retDat.append([crystal, x[0], x[1], x[2], theta, crys_lab, crys0_lab])
-        # all permutations of odd (h,k,l)
-        _structure_factor(reversed(range(1, HKL_MAX, 2)))
-        # all permutations of even (h,k,l)
-        _structure_factor(reversed(range(0, HKL_MAX, 2)))
-        return retDat
-
-    if crystal == "Si":
-        hkl_out = _find_theta("Si", SI_ALAT)
-    elif crystal == "Ge":
-        hkl_out = _find_theta("Ge", GE_ALAT)
-    else:
-        hkl_out = _find_theta("Si", SI_ALAT)
-        hkl_out.extend(_find_theta("Ge", GE_ALAT))
+    crys, table, theta = find_reflections(energy, thetamin=thetamin, crystal=crystal)
+    (ifound,) = np.nonzero(~np.isnan(theta))
+    if retBest:
+        if len(ifound) == 0:
+            raise ValueError(f"findhkl: no reflection found for {energy} eV")
+        ifound = [ifound[np.argmax(theta[ifound])]]
+    hkl_out = []
+    for idx in ifound:
+        crys_lab, crys0_lab = table["crys_lab"][idx], table["crys0_lab"][idx]
+        if verbose:
+            print(f"{crys_lab}, Bragg {theta[idx]:2.2f} -> {crys0_lab}")
+        hkl_out.append(
+            [
+                str(crys[idx]),
+                int(table["h"][idx]),
+                int(table["k"][idx]),
+                int(table["l"][idx]),
+                theta[idx],
+                str(crys_lab),
+                str(crys0_lab),
+            ]
+        )
 
     if retBest:
-        thmax = max([c[4] for c in hkl_out])
-        return [c for c in hkl_out if c[4] == thmax][0]
+        return hkl_out[0]
 
     if retAll:
         return hkl_out
@@ -14,7 +14,10 @@ Available libraries/dbs and order of usage
 .. note:: `XrayDB <https://github.com/xraypy/XrayDB>`_ has its own package now
 
 """
+import functools
+import hashlib
 import math
+import os
 import numpy as np
 
 try:
@@ -78,6 +81,37 @@ def _xraydb_error(ret=None):
     return ret
 
 
+#: MEMOISED XRAYLIB CALLS
+
+
+@functools.lru_cache(maxsize=8192)
+def _xl_call(fname, *args):
+    """Memoised call to ``xraylib.fname(*args)``, returns None on error"""
+    try:
+        return getattr(xl, fname)(*args)
+    except Exception:
+        return None
+
+
+def _xl(fname, *args):
+    """Cached ``xraylib.fname(*args)``, raises ValueError as xraylib does"""
+    value = _xl_call(fname, *args)
+    if value is None:
+        raise ValueError(f"xraylib.{fname}{args} failed")
+    return value
+
+
+def _broadcast_call(func, *args):
+    """Evaluate the scalar function `func` over the broadcast of `args`
+    and return a float array"""
+    bcast = np.broadcast(*[np.asarray(arg, dtype=object) for arg in args])
+    values = (
+        func(*[arg.item() if isinstance(arg, np.generic) else arg for arg in bargs])
+        for bargs in bcast
+    )
+    return np.fromiter(values, dtype=float, count=bcast.size).reshape(bcast.shape)
+
+
 #######################
 #: ELEMENTS AND LINES #
 #######################
@@ -358,7 +392,7 @@ def get_element(elem):
     if (isinstance(elem, str) and (elem in ELEMENTS)):
         return [elt for elt in ELEMENTS_INFO if elt[0] == elem][0]
     if (isinstance(elem, int) and (elem in ELEMENTS_N)):
-        return [elt for elt in ELEMENTS_INFO if elt[1] == elem]
+        return [elt for elt in ELEMENTS_INFO if elt[1] == elem][0]
     _LOGGER.error(_errstr)
     raise NameError(_errstr)
 
@@ -389,14 +423,132 @@ def find_edge(emin, emax, shells=None):
     for el in ELEMENTS:
         eln = get_element(el)
         for sh in shells:
-            edge = (xl.EdgeEnergy(eln[1], getattr(xl, sh + "_SHELL")) * 1000)
+            edge = (_xl("EdgeEnergy", eln[1], getattr(xl, sh + "_SHELL")) * 1000)
             if (edge >= emin) and (edge <= emax):
                 _LOGGER.info("{0} \t {1} \t {2:>.2f} eV".format(el, sh, edge))
 
 
+#: emission lines table (sorted by energy), see :func:`line_table`
+LINE_TABLE_FILE = os.path.join(os.path.expanduser("~"), ".sloth", "xraylib_lines.npz")
+_LINE_TABLE = {}
+
+
+def _line_table_key():
+    """xraylib version and hash of the ELEMENTS_INFO x LINES grid of the table"""
+    grid = repr((ELEMENTS_INFO, LINES)).encode()
+    return "{0}_{1}".format(getattr(xl, "__version__", ""), hashlib.sha1(grid).hexdigest()[:10])
+
+
+def _build_line_table():
+    """Loop over ELEMENTS and LINES with xraylib and return the lines table"""
+    z, el, ln, en, rel, w = [], [], [], [], [], []
+    for elt in ELEMENTS_INFO:
+        for line in LINES:
+            try:
+                line_ene = _xl("LineEnergy", elt[1], getattr(xl, line + "_LINE")) * 1000
+            except Exception:
+                continue
+            if line_ene <= 0:
+                continue
+            try:
+                line_rel = _xl("RadRate", elt[1], getattr(xl, line + "_LINE"))
+            except Exception:
+                line_rel = 0.0
+            z.append(elt[1])
+            el.append(elt[0])
+            ln.append(line)
+            en.append(line_ene)
+            rel.append(line_rel)
+            w.append(fluo_width(elem=elt[0], line=line, showInfos=False))
+    isort = np.argsort(en, kind="stable")
+    return {
+        "eln": np.array(z, dtype=int)[isort],
+        "el": np.array(el)[isort],
+        "ln": np.array(ln)[isort],
+        "en": np.array(en, dtype=float)[isort],
+        "rel": np.array(rel, dtype=float)[isort],
+        "w": np.array(w, dtype=float)[isort],
+    }
+
+
+def line_table(cache_file=True, rebuild=False):
+    """Table of all emission lines (ELEMENTS x LINES) known by xraylib
+
+    The table is built once, kept in memory and stored in `cache_file`
+    (one per xraylib version and ELEMENTS/LINES grid, the key is appended
+    to the file name) for the next sessions.
+
+    Parameters
+    ----------
+    cache_file : str, True or None (optional)
+        path to the .npz cache file, True: LINE_TABLE_FILE [default],
+        None: no file
+    rebuild : boolean (optional)
+        force rebuilding the table from xraylib [False]
+
+    Returns
+    -------
+    dict of 1D arrays sorted by energy
+        'eln': element number
+        'el': element symbol
+        'ln': line (Siegbahn)
+        'en': energy (eV)
+        'rel': relative intensity within the initial level (xraylib.RadRate)
+        'w': width (eV), see :func:`fluo_width`
+    """
+    if HAS_XRAYLIB is False:
+        return _xraylib_error(None)
+    key = _line_table_key()
+    if (not rebuild) and (key in _LINE_TABLE):
+        return _LINE_TABLE[key]
+    table = None
+    if cache_file is True:
+        cache_file = LINE_TABLE_FILE
+    if cache_file is not None:
+        root, ext = os.path.splitext(cache_file)
+        cache_file = f"{root}_{key}{ext}"
+        if (not rebuild) and os.path.isfile(cache_file):
+            try:
+                with np.load(cache_file) as npz:
+                    table = {key: npz[key] for key in npz.files}
+            except Exception:
+                _LOGGER.warning(f"cannot read {cache_file}")
+    if table is None:
+        table = _build_line_table()
+        if cache_file is not None:
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                np.savez(cache_file, **table)
+            except Exception:
+                _LOGGER.debug(f"cannot write {cache_file}")
+    _LINE_TABLE[key] = table
+    return table
+
+
+def find_line_index(emin, emax):
+    """Index ranges of the emission lines in the given energy window(s)
+
+    Parameters
+    ----------
+    emin, emax : floats or arrays
+        energy window(s) (eV)
+
+    Returns
+    -------
+    istart, istop : ints or arrays of ints
+        the lines in [emin, emax] are ``line_table()[key][istart:istop]``
+    """
+    ene = line_table()["en"]
+    return (np.searchsorted(ene, emin, side="left"), np.searchsorted(ene, emax, side="right"))
+
+
 def find_line(emin, emax, elements=None, lines=None, outDict=False, backend="xraylib", skip_zero_width=True, thetamin=65):
     """Get the emission line energy in a given energy range [emin,emax] (eV)
 
+    .. note:: with the xraylib backend, the lines are taken from the sorted
+              table given by :func:`line_table`; the results are ordered
+              as `elements` and `lines`, as with the pymca backend
+
     Parameters
     ----------
     emin, emax : float
@@ -434,6 +586,32 @@ def find_line(emin, emax, elements=None, lines=None, outDict=False, backend="xra
         lines = LINES
     if elements is None:
         elements = ELEMENTS
+    found = []
+    if backend == "pymca":
+        for el in elements:
+            eln = get_element(el)
+            for ln in lines:
+                try:
+                    line = Element[eln[0]][mapLine2Trans(ln)[1]]["energy"] * 1000
+                except Exception:
+                    _LOGGER.debug("{0}.{1} none".format(el, ln))
+                    continue
+                if (line >= emin) and (line <= emax):
+                    w = fluo_width(elem=el, line=ln, showInfos=False)
+                    found.append((eln[0], eln[1], ln, line, w))
+    else:
+        table = line_table()
+        istart, istop = find_line_index(emin, emax)
+        window = slice(istart, istop)
+        elns = [el if isinstance(el, (int, np.integer)) else get_element(el)[1] for el in elements]
+        mask = np.isin(table["eln"][window], elns) & np.isin(table["ln"][window], lines)
+        isel = np.flatnonzero(mask) + istart
+        #: same order as the loop over elements and lines (stable re-sort)
+        elrank = {eln: irank for irank, eln in reversed(list(enumerate(elns)))}
+        lnrank = {ln: irank for irank, ln in reversed(list(enumerate(lines)))}
+        isel = isel[np.lexsort(([lnrank[ln] for ln in table["ln"][isel]],
+                                [elrank[eln] for eln in table["eln"][isel]]))]
+        found = list(zip(*(table[key][isel].tolist() for key in ("el", "eln", "ln", "en", "w"))))
     _out = {}
     _out["el"] = []
     _out["eln"] = []
@@ -442,38 +620,26 @@ def find_line(emin, emax, elements=None, lines=None, outDict=False, backend="xra
     _out["w"] = []
     _out["crys_lab"] = []
     _out["crys0_lab"] = []
-    _out["crys_deg"] = [] 
-    for el in elements:
-        eln = get_element(el)
-        for ln in lines:
-            try:
-                if backend == "pymca":
-                    line = Element[eln[0]][mapLine2Trans(ln)[1]]["energy"] * 1000
-                else:
-                    line = xl.LineEnergy(eln[1], getattr(xl, ln + "_LINE")) * 1000
-            except Exception:
-                _LOGGER.debug("{0}.{1} none".format(el, ln))
+    _out["crys_deg"] = []
+    for el, eln, ln, line, w in found:
+        if w == 0:
+            _LOGGER.warning(f"{el}.{ln} zero width")
+            if skip_zero_width:
+                _LOGGER.info(f"{el}.{ln} skipped")
                 continue
-            if (line >= emin) and (line <= emax):
-                w = fluo_width(elem=el, line=ln, showInfos=False)
-                if w == 0:
-                    _LOGGER.warning(f"{el}.{ln} zero width")
-                    if skip_zero_width:
-                        _LOGGER.info(f"{el}.{ln} skipped")
-                        continue
-                _out["el"].append(eln[0])
-                _out["eln"].append(eln[1])
-                _out["ln"].append(ln)
-                _out["en"].append(line)
-                _out["w"].append(w)
-                try:
-                    hkl_out = findhkl(line, thetamin=thetamin, verbose=False, retBest=True)
-                except Exception:
-                    _LOGGER.warning(f"No Si/Ge crystal analyzer found for {eln[0]} {ln}")
-                    hkl_out = [None, None, None, None, None, None, None]
-                _out["crys_lab"].append(hkl_out[5])
-                _out["crys0_lab"].append(hkl_out[6])
-                _out["crys_deg"].append(hkl_out[4])
+        _out["el"].append(el)
+        _out["eln"].append(eln)
+        _out["ln"].append(ln)
+        _out["en"].append(line)
+        _out["w"].append(w)
+        try:
+            hkl_out = findhkl(line, thetamin=thetamin, verbose=False, retBest=True)
+        except Exception:
+            _LOGGER.warning(f"No Si/Ge crystal analyzer found for {el} {ln}")
+            hkl_out = [None, None, None, None, None, None, None]
+        _out["crys_lab"].append(hkl_out[5])
+        _out["crys0_lab"].append(hkl_out[6])
+        _out["crys_deg"].append(hkl_out[4])
     #: returns
     if outDict:
         return _out
@@ -497,11 +663,15 @@ def ene_res(emin, emax, shells=["K"]):
     for el in ELEMENTS:
         eln = get_element(el)
         for sh in shells:
-            edge = (xl.EdgeEnergy(eln[1], getattr(xl, sh + "_SHELL")) * 1000)
-            ch = (xl.AtomicLevelWidth(eln[1], getattr(xl, sh + "_SHELL")) * 1000)
+            try:
+                edge = (_xl("EdgeEnergy", eln[1], getattr(xl, sh + "_SHELL")) * 1000)
+                ch = (_xl("AtomicLevelWidth", eln[1], getattr(xl, sh + "_SHELL")) * 1000)
+            except ValueError:
+                _LOGGER.debug(f"{el} {sh} edge unknown")
+                continue
             if (edge >= emin) and (edge <= emax):
                 s["el"].append(el)
-                s["en"].append(xl.SymbolToAtomicNumber(el))
+                s["en"].append(_xl("SymbolToAtomicNumber", el))
                 s["edge"].append(edge)
                 s["ch"].append(ch)
                 s["dee"].append(ch / edge)
@@ -530,24 +700,23 @@ def fluo_width(elem=None, line=None, herfd=False, showInfos=True):
         _LOGGER.error("element or edge not given, returning 0")
         return 0
     elm = get_element(elem)
-    ln = mapLine2Trans(line)
-    try:
-        lw_xas = xl.AtomicLevelWidth(elm[1], getattr(xl, ln[2] + "_SHELL")) * 1000
-        lw_xes = xl.AtomicLevelWidth(elm[1], getattr(xl, ln[3] + "_SHELL")) * 1000
-        lw_herfd = 1.0 / (math.sqrt(lw_xas ** 2 + lw_xes ** 2))
-        if showInfos:
-            ln_ev = xl.LineEnergy(elm[1], getattr(xl, line + "_LINE")) * 1000
-            _LOGGER.info(f"{elm[0]} {line} (={ln[1]}): {ln_ev:.2f} eV")
-            _LOGGER.info(
-                f"Atomic levels widths: XAS={lw_xas:.2f} eV, XES={lw_xes:.2f} eV"
-            )
-            _LOGGER.info(f"... -> STD={lw_xas+lw_xes:.2f} eV, HERFD={lw_herfd:.2f} eV]")
-        if herfd is True:
-            return lw_herfd
-        else:
-            return lw_xas + lw_xes
-    except Exception:
+    if line not in LINES2TRANS:
+        _LOGGER.error(f"Line {line} not known; returning 0")
         return 0
+    width = _fluo_width(elm[1], line, herfd=herfd)
+    if showInfos and width > 0:
+        lw_xas, lw_xes = _level_widths(elm[1], line)
+        lw_herfd = _fluo_width(elm[1], line, herfd=True)
+        try:
+            ln_ev = _xl("LineEnergy", elm[1], getattr(xl, line + "_LINE")) * 1000
+        except Exception:
+            ln_ev = np.nan
+        _LOGGER.info(f"{elm[0]} {line} (={mapLine2Trans(line)[1]}): {ln_ev:.2f} eV")
+        _LOGGER.info(
+            f"Atomic levels widths: XAS={lw_xas:.2f} eV, XES={lw_xes:.2f} eV"
+        )
+        _LOGGER.info(f"... -> STD={lw_xas+lw_xes:.2f} eV, HERFD={lw_herfd:.2f} eV]")
+    return width
 
 
 def fluo_amplitude(elem, line, excitation=None, barn_unit=False):
@@ -577,16 +746,23 @@ def fluo_amplitude(elem, line, excitation=None, barn_unit=False):
         excitation /= 1000
     _LOGGER.info(f"Excitation energy is {excitation} keV")
     el_n = get_element(elem)[1]
+    fluo_amp = _fluo_amplitude(el_n, line, excitation, barn_unit)
+    if fluo_amp == 0:
+        _LOGGER.warning("Line not known")
+    return fluo_amp
+
+
+def _fluo_amplitude(el_n, line, excitation, barn_unit=False):
+    """fluorescence cross section for element number, line and excitation
+    energy in keV (0 if unknown)"""
     if barn_unit:
-        CSfluo = xl.CSb_FluorLine_Kissel_Cascade
+        CSfluo = "CSb_FluorLine_Kissel_Cascade"
     else:
-        CSfluo = xl.CS_FluorLine_Kissel_Cascade
+        CSfluo = "CS_FluorLine_Kissel_Cascade"
     try:
-        fluo_amp = CSfluo(el_n, getattr(xl, line + "_LINE"), excitation)
+        return _xl(CSfluo, el_n, getattr(xl, line + "_LINE"), excitation)
     except Exception:
-        _LOGGER.warning("Line not known")
-        fluo_amp = 0
-    return fluo_amp
+        return 0
 
 
 def xray_line(element, line=None, initial_level=None):
@@ -621,7 +797,7 @@ def xray_line(element, line=None, initial_level=None):
         _retNum = True
     for _line in lines:
         try:
-            line_ene = xl.LineEnergy(el_n, getattr(xl, _line + "_LINE")) * 1000
+            line_ene = _xl("LineEnergy", el_n, getattr(xl, _line + "_LINE")) * 1000
             outdict["line"].append(_line)
             outdict["ene"].append(line_ene)
         except Exception:
@@ -655,7 +831,7 @@ def xray_edge(element, initial_level=None):
         _LOGGER.error("initial_level is wrong")
     for _level in initial_level:
         try:
-            edge_ene = xl.EdgeEnergy(el_n, getattr(xl, _level + "_SHELL")) * 1000
+            edge_ene = _xl("EdgeEnergy", el_n, getattr(xl, _level + "_SHELL")) * 1000
             outdict["edge"].append(_level)
             outdict["ene"].append(edge_ene)
         except Exception:
@@ -669,6 +845,106 @@ def xray_edge(element, initial_level=None):
         return outdict
 
 
+#: ARRAY-AWARE VARIANTS (broadcasting elements and lines)
+
+_ELEMENTS_Z = {elt[0]: elt[1] for elt in ELEMENTS_INFO}
+
+
+def _element_z(elem):
+    """atomic number from symbol or number"""
+    if isinstance(elem, str):
+        return _ELEMENTS_Z[elem]
+    return int(elem)
+
+
+def _line_energy(elem, line):
+    try:
+        return _xl("LineEnergy", _element_z(elem), getattr(xl, line + "_LINE")) * 1000
+    except Exception:
+        return np.nan
+
+
+def _edge_energy(elem, level):
+    try:
+        return _xl("EdgeEnergy", _element_z(elem), getattr(xl, level + "_SHELL")) * 1000
+    except Exception:
+        return np.nan
+
+
+def xray_line_array(elements, lines):
+    """Emission energies (eV) for arrays of elements and lines
+
+    Parameters
+    ----------
+    elements : array-like of str or int
+    lines : array-like of str, Siegbahn notation
+        `elements` and `lines` are broadcast together, e.g.
+        ``xray_line_array(np.array(ELEMENTS)[:, None], LINES)``
+
+    Returns
+    -------
+    array of floats with the broadcast shape, NaN for unknown lines
+    """
+    if HAS_XRAYLIB is False:
+        return _xraylib_error(None)
+    return _broadcast_call(_line_energy, elements, lines)
+
+
+def xray_edge_array(elements, levels):
+    """Edge energies (eV) for arrays of elements and core levels (broadcast
+    together), NaN for unknown edges"""
+    if HAS_XRAYLIB is False:
+        return _xraylib_error(None)
+    return _broadcast_call(_edge_energy, elements, levels)
+
+
+@functools.lru_cache(maxsize=8192)
+def _level_widths(el_n, line):
+    """widths (eV) of the initial (XAS) and final (XES) levels of a line"""
+    ln = LINES2TRANS[line]
+    lw_xas = _xl("AtomicLevelWidth", el_n, getattr(xl, SHELLS[ln[1]] + "_SHELL")) * 1000
+    lw_xes = _xl("AtomicLevelWidth", el_n, getattr(xl, SHELLS[ln[2]] + "_SHELL")) * 1000
+    return lw_xas, lw_xes
+
+
+def _fluo_width(el_n, line, herfd=False):
+    """as :func:`fluo_width` for an element number, without logging"""
+    try:
+        lw_xas, lw_xes = _level_widths(el_n, line)
+    except Exception:
+        return 0
+    if herfd is True:
+        return 1.0 / (math.sqrt(lw_xas ** 2 + lw_xes ** 2))
+    return lw_xas + lw_xes
+
+
+def fluo_width_array(elements, lines, herfd=False):
+    """As :func:`fluo_width` for arrays of elements and lines (broadcast
+    together), 0 for unknown lines"""
+    if HAS_XRAYLIB is False:
+        return _xraylib_error(None)
+    return _broadcast_call(
+        lambda elem, line: _fluo_width(_element_z(elem), line, herfd), elements, lines
+    )
+
+
+def fluo_amplitude_array(elements, lines, excitation=10.0, barn_unit=False):
+    """As :func:`fluo_amplitude` for arrays of elements, lines and
+    excitation energies (broadcast together), 0 for unknown lines
+
+    .. note:: excitation energies >= 200 are considered in eV
+    """
+    if HAS_XRAYLIB is False:
+        return _xraylib_error(None)
+    excitation = np.asarray(excitation, dtype=float)
+    excitation = np.where(excitation >= 200.0, excitation / 1000, excitation)
+
+    def _amp(elem, line, exc):
+        return _fluo_amplitude(_element_z(elem), line, exc, barn_unit)
+
+    return _broadcast_call(_amp, elements, lines, excitation)
+
+
 def fluo_spectrum(elem, line, xwidth=3, xstep=0.05, plot=False, showInfos=True, **kws):
     """Generate a fluorescence spectrum for a given element/line
 
@@ -709,7 +985,7 @@ def fluo_spectrum(elem, line, xwidth=3, xstep=0.05, plot=False, showInfos=True,
         yunit = "cm2/g"
     fwhm = fluo_width(elem, line, showInfos=showInfos)
     amp = fluo_amplitude(el[1], line, excitation=exc, barn_unit=bu)
-    cen = xl.LineEnergy(el[1], getattr(xl, line + "_LINE")) * 1000
+    cen = _xl("LineEnergy", el[1], getattr(xl, line + "_LINE")) * 1000
     if (fwhm == 0) or (amp == 0) or (cen == 0):
         raise NameError("no line found")
     sig = fwhm2sigma(fwhm)
@@ -751,10 +1027,114 @@ def fluo_spectrum(elem, line, xwidth=3, xstep=0.05, plot=False, showInfos=True,
     return xfluo, yfluo, info
 
 
+def fluo_synth(energy, elements, concentrations=None, lines=None, excitation=10000.0,
+               det_fwhm=None, xwidth=10, barn_unit=False, retInfo=False):
+    """Synthetic fluorescence spectra for (batches of) compositions
+
+    All the lines of all the elements are gathered in arrays (see
+    :func:`xray_line_array`, :func:`fluo_width_array`,
+    :func:`fluo_amplitude_array`) and each peak is evaluated only in its
+    window, center -+ xwidth * (fwhm + det_fwhm), as a sparse (energy, lines)
+    matrix. The spectra of all the compositions are then given by a single
+    sparse product.
+
+    .. note:: the lineshape is the Lorentzian used by :func:`fluo_spectrum`,
+              convolved with a Gaussian of FWHM `det_fwhm` (detector
+              resolution) if given (Voigt profile)
+
+    Parameters
+    ----------
+    energy : 1D array
+        energy axis (eV)
+    elements : list of str or int
+        elements
+    concentrations : None or array, (nelements,) or (ncompositions, nelements)
+        weights of the elements [None -> 1 for all]
+    lines : list of str (optional)
+        emission lines in Siegbahn notation [None -> LINES (all)]
+    excitation : float (optional)
+        excitation energy (eV) [10000.]
+    det_fwhm : None, float or callable (optional)
+        detector resolution FWHM (eV), a callable gets the lines energies [None]
+    xwidth : int or float (optional)
+        FWHM multiplication factor giving the window of each peak [10]
+    barn_unit : boolean (optional)
+        use units of barn/atom [False -> cm2/g]
+    retInfo : boolean (optional)
+        return also the lines information [False]
+
+    Returns
+    -------
+    spectra : array (npts,) or (ncompositions, npts)
+    if retInfo:
+        spectra, info (dict of 1D arrays: 'el', 'ln', 'cen', 'fwhm', 'amp', 'det')
+    """
+    from scipy.sparse import csr_matrix
+
+    if HAS_XRAYLIB is False:
+        return _xraylib_error(None)
+    energy = np.asarray(energy, dtype=float)
+    if lines is None:
+        lines = LINES
+    elements = list(elements)
+    els = np.array([_element_z(el) for el in elements])[:, np.newaxis]
+    lns = np.array(lines)[np.newaxis, :]
+    cen = xray_line_array(els, lns)
+    fwhm = fluo_width_array(els, lns)
+    amp = fluo_amplitude_array(els, lns, excitation, barn_unit=barn_unit)
+    ok = np.isfinite(cen) & (fwhm > 0) & (amp > 0)
+    iel, iln = np.nonzero(ok)
+    cen, fwhm, amp = cen[ok], fwhm[ok], amp[ok]
+    if callable(det_fwhm):
+        det = np.broadcast_to(np.asarray(det_fwhm(cen), dtype=float), cen.shape)
+    else:
+        det = np.full_like(cen, 0.0 if det_fwhm is None else float(det_fwhm))
+
+    #: peak windows on the energy axis, flattened as (point, line) pairs
+    halfwin = xwidth * (fwhm + det)
+    istart = np.searchsorted(energy, cen - halfwin, side="left")
+    istop = np.searchsorted(energy, cen + halfwin, side="right")
+    npeak = istop - istart
+    ipeak = np.repeat(np.arange(len(cen)), npeak)
+    ipts = np.arange(npeak.sum()) - np.repeat(np.cumsum(npeak) - npeak, npeak)
+    ipts += istart[ipeak]
+    xpeak = energy[ipts] - cen[ipeak]
+    #: same Lorentzian width as fluo_spectrum
+    sig = fwhm2sigma(fwhm)[ipeak]
+    if np.any(det > 0):
+        from scipy.special import voigt_profile
+
+        ypeak = voigt_profile(xpeak, fwhm2sigma(det)[ipeak], sig)
+    else:
+        ypeak = lorentzian(xpeak, amplitude=1.0, center=0.0, sigma=sig)
+    pmat = csr_matrix((ypeak, (ipts, ipeak)), shape=(len(energy), len(cen)))
+
+    if concentrations is None:
+        concentrations = np.ones(len(elements))
+    concentrations = np.asarray(concentrations, dtype=float)
+    weights = concentrations[..., iel] * amp
+    spectra = pmat.dot(np.atleast_2d(weights).T).T
+    if concentrations.ndim == 1:
+        spectra = spectra[0]
+    if retInfo:
+        info = {
+            "el": np.array([ELEMENTS[ELEMENTS_N.index(z)] for z in els[iel, 0]]),
+            "ln": lns[0, iln],
+            "cen": cen,
+            "fwhm": fwhm,
+            "amp": amp,
+            "det": det,
+        }
+        return spectra, info
+    return spectra
+
+
 def fluo_lines(elem, lines, retAll=False, **fluokws):
     """Generate a cumulative emission spectrum of a given element and
     list of lines
 
+    .. note:: see :func:`fluo_synth` for many elements and compositions
+
     Parameters
     ----------
     elem : string or int